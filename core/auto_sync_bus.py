@@ -0,0 +1,20 @@
+"""core.auto_sync_bus
+
+Event bus báo cho các màn hình đang mở khi lượt tự động tải dữ liệu chấm công
+(AutoSyncService, chạy nền) bắt đầu / kết thúc.
+
+Signal được emit từ thread nền: nơi nhận phải là slot của QObject thuộc UI thread
+(Qt tự chuyển thành queued connection), không connect thẳng tới callable thường.
+"""
+
+from __future__ import annotations
+
+from PySide6.QtCore import QObject, Signal
+
+
+class AutoSyncBus(QObject):
+    started = Signal()
+    finished = Signal(bool, str, int)  # ok, msg, count
+
+
+auto_sync_bus = AutoSyncBus()
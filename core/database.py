@@ -3,17 +3,30 @@ Module quản lý kết nối cơ sở dữ liệu MySQL.
 
 Cung cấp:
 - Kết nối đến MySQL qua context manager
+- Connection pool dùng chung toàn app (tái sử dụng kết nối thay vì mở mới mỗi truy vấn)
 - Xử lý lỗi kết nối tự động
 - Logging chi tiết
+- Migrate schema theo phiên bản khi tạo kết nối đầu tiên (core.schema_migrations)
+- Đo đạc truy vấn (thời gian, số dòng, nơi gọi) + log câu chậm (core.db_diagnostics)
+- Nạp dữ liệu lớn (bulk_insert): LOAD DATA LOCAL INFILE nếu được bật, không thì INSERT nhiều dòng
 """
 
 import json
 import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Iterator, Optional
 
 import mysql.connector
 
+from core import schema_migrations
+from core.db_diagnostics import InstrumentedCursor, QueryDiagnostics
 from core.resource import resource_path
 
 
@@ -21,6 +34,274 @@ from core.resource import resource_path
 logger = logging.getLogger(__name__)
 
 
+class _PooledConnection:
+    """Proxy bọc kết nối MySQL thật lấy từ pool.
+
+    - Mọi thuộc tính/method khác được chuyển tiếp sang kết nối thật.
+    - close() / thoát khỏi `with` sẽ trả kết nối về pool thay vì đóng socket.
+    - Cursor tạo qua proxy được đóng khi trả kết nối, để cursor.close() gọi muộn
+      (trong finally của repository) không đụng vào kết nối đã được luồng khác mượn.
+    """
+
+    __slots__ = ("_pool", "_raw", "_cursors")
+
+    def __init__(self, pool: "_ConnectionPool", raw) -> None:
+        self._pool = pool
+        self._raw = raw
+        self._cursors: list = []
+
+    def __getattr__(self, name: str):
+        raw = self._raw
+        if raw is None:
+            raise mysql.connector.errors.OperationalError(
+                "Kết nối đã được trả về pool."
+            )
+        return getattr(raw, name)
+
+    def __enter__(self) -> "_PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        # Lỗi mạng/giao thức => kết nối có thể đã hỏng, bỏ luôn thay vì trả về pool.
+        broken = isinstance(
+            exc,
+            (
+                mysql.connector.errors.OperationalError,
+                mysql.connector.errors.InterfaceError,
+            ),
+        )
+        self._release(discard=broken)
+        return False
+
+    def cursor(self, *args, **kwargs):
+        raw = self._raw
+        if raw is None:
+            raise mysql.connector.errors.OperationalError(
+                "Kết nối đã được trả về pool."
+            )
+        cur = raw.cursor(*args, **kwargs)
+        diag = Database._DIAGNOSTICS
+        if diag.enabled:
+            cur = InstrumentedCursor(cur, diag)
+        self._cursors.append(cur)
+        return cur
+
+    def close(self) -> None:
+        self._release(discard=False)
+
+    def _release(self, *, discard: bool) -> None:
+        raw, self._raw = self._raw, None
+        if raw is None:
+            return
+
+        for cur in self._cursors:
+            try:
+                cur.close()
+            except Exception:
+                discard = True
+        self._cursors.clear()
+
+        self._pool.release(raw, discard=discard)
+
+
+class _UnitOfWork:
+    """Trạng thái của một transaction dùng chung (theo từng thread)."""
+
+    __slots__ = ("conn", "depth", "rollback_only")
+
+    def __init__(self, conn: _PooledConnection) -> None:
+        self.conn = conn
+        self.depth = 1
+        self.rollback_only = False
+
+
+class _SharedConnection:
+    """Proxy kết nối khi repository tham gia một Database.transaction() đang mở.
+
+    - commit() không làm gì: transaction bên ngoài commit một lần khi kết thúc.
+    - rollback() đánh dấu cả transaction phải rollback.
+    - close()/thoát `with` không trả kết nối; transaction bên ngoài sẽ trả.
+    """
+
+    __slots__ = ("_unit",)
+
+    def __init__(self, unit: _UnitOfWork) -> None:
+        self._unit = unit
+
+    def __getattr__(self, name: str):
+        return getattr(self._unit.conn, name)
+
+    def __enter__(self) -> "_SharedConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def cursor(self, *args, **kwargs):
+        return self._unit.conn.cursor(*args, **kwargs)
+
+    def commit(self) -> None:
+        return None
+
+    def rollback(self) -> None:
+        self._unit.rollback_only = True
+
+    def close(self) -> None:
+        return None
+
+
+class _ConnectionPool:
+    """Pool kết nối MySQL (thread-safe) cho một bộ cấu hình kết nối.
+
+    - Giới hạn số kết nối đồng thời (size); hết chỗ thì chờ tối đa acquire_timeout.
+    - Ping trước khi cho mượn nếu kết nối đã nằm idle lâu hơn ping_interval.
+    - Loại bỏ kết nối idle quá max_idle.
+    - Khi trả về: rollback transaction dở + reset session (nếu bật).
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        *,
+        config_key: tuple,
+        size: int,
+        max_idle_seconds: float,
+        ping_interval_seconds: float,
+        acquire_timeout_seconds: float,
+        reset_session: bool,
+    ) -> None:
+        self.config_key = config_key
+        self._config = dict(config)
+        self._size = max(1, int(size))
+        self._max_idle = max(0.0, float(max_idle_seconds))
+        self._ping_interval = max(0.0, float(ping_interval_seconds))
+        self._acquire_timeout = max(0.0, float(acquire_timeout_seconds))
+        self._reset_session = bool(reset_session)
+
+        self._cond = threading.Condition()
+        # (raw_conn, last_used_monotonic); bên phải là kết nối vừa trả (ấm nhất)
+        self._idle: deque[tuple[Any, float]] = deque()
+        self._borrowed = 0
+        self._closed = False
+
+    def _create(self):
+        conn = mysql.connector.connect(**self._config)
+        logger.info("✅ Kết nối MySQL thành công (pool)")
+
+        # Migrate schema (1 lần cho mỗi cấu hình kết nối)
+        Database._run_migrations(conn, self.config_key)
+
+        return conn
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _pop_expired_locked(self, now: float) -> list:
+        expired: list = []
+        if self._max_idle <= 0:
+            return expired
+        while self._idle and now - self._idle[0][1] > self._max_idle:
+            expired.append(self._idle.popleft()[0])
+        return expired
+
+    def acquire(self):
+        deadline = time.monotonic() + self._acquire_timeout
+        raw = None
+        last_used = 0.0
+        expired: list = []
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise mysql.connector.errors.PoolError("Connection pool đã đóng.")
+
+                now = time.monotonic()
+                expired.extend(self._pop_expired_locked(now))
+
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    self._borrowed += 1
+                    break
+
+                if self._borrowed < self._size:
+                    self._borrowed += 1
+                    break
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise mysql.connector.errors.PoolError(
+                        f"Hết kết nối trong pool (size={self._size}). Vui lòng thử lại."
+                    )
+                self._cond.wait(remaining)
+
+        for conn in expired:
+            self._close_quietly(conn)
+
+        try:
+            if raw is not None and time.monotonic() - last_used >= self._ping_interval:
+                try:
+                    raw.ping(reconnect=False)
+                except Exception:
+                    logger.debug("Kết nối idle không còn sống, tạo kết nối mới")
+                    self._close_quietly(raw)
+                    raw = None
+
+            if raw is None:
+                raw = self._create()
+            return raw
+        except Exception:
+            with self._cond:
+                self._borrowed -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, raw, *, discard: bool = False) -> None:
+        if not discard:
+            try:
+                # Không để transaction/snapshot đọc dở dang rò sang lần mượn sau.
+                if getattr(raw, "in_transaction", True):
+                    raw.rollback()
+                if self._reset_session:
+                    raw.reset_session()
+            except Exception:
+                logger.debug("Không thể reset kết nối khi trả về pool", exc_info=True)
+                discard = True
+
+        with self._cond:
+            self._borrowed -= 1
+            keep = not discard and not self._closed
+            if keep:
+                self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+        if not keep:
+            self._close_quietly(raw)
+
+    def close(self) -> None:
+        """Đóng toàn bộ kết nối idle; kết nối đang mượn sẽ bị đóng khi được trả."""
+
+        with self._cond:
+            self._closed = True
+            idle = [c for c, _ts in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self) -> dict[str, int]:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "borrowed": self._borrowed,
+            }
+
+
 class Database:
     """
     Quản lý kết nối MySQL.
@@ -44,67 +325,124 @@ class Database:
         "use_unicode": True,
     }
 
-    # One-time schema sanity checks (best-effort).
-    _SCHEMA_CHECKED: bool = False
+    # Cấu hình connection pool (không truyền vào mysql.connector.connect).
+    # Có thể ghi đè bằng khối "pool" trong database/db_config.json.
+    POOL_CONFIG: dict = {
+        "size": 5,
+        "max_idle_seconds": 300,
+        "ping_interval_seconds": 5,
+        "acquire_timeout_seconds": 15,
+        "reset_session": True,
+    }
+
+    # Đo đạc truy vấn + log câu chậm (log/slow_query.log).
+    # Có thể ghi đè bằng khối "diagnostics" trong database/db_config.json.
+    DIAGNOSTICS_CONFIG: dict = {
+        "enabled": True,
+        "slow_query_ms": 500.0,
+        "sample_size": 512,
+    }
+    _DIAGNOSTICS = QueryDiagnostics()
+
+    # Nạp dữ liệu lớn (bulk_insert). Có thể ghi đè bằng khối "bulk" trong db_config.json.
+    # - local_infile: dùng LOAD DATA LOCAL INFILE (cần bật local_infile trên server);
+    #   server từ chối -> tự chuyển sang INSERT nhiều dòng, không báo lỗi
+    # - chunk_rows: số dòng mỗi câu INSERT nhiều dòng
+    BULK_CONFIG: dict = {
+        "local_infile": False,
+        "chunk_rows": 1000,
+    }
+    # Cấu hình kết nối mà server đã từ chối LOAD DATA LOCAL (không thử lại)
+    _LOCAL_INFILE_REFUSED: set = set()
+    # 1148 ER_NOT_ALLOWED_COMMAND, 2068 CR_LOAD_DATA_LOCAL_INFILE_REJECTED,
+    # 3948 ER_CLIENT_LOCAL_FILES_DISABLED
+    _LOCAL_INFILE_ERRNOS = (1148, 2068, 3948)
+
+    _POOL: Optional[_ConnectionPool] = None
+    _POOL_LOCK = threading.Lock()
+
+    # Transaction dùng chung (unit of work) đang mở trên từng thread.
+    _LOCAL = threading.local()
+
+    # Theo dõi thay đổi db_config.json: connect() chỉ stat file tối đa 1 lần
+    # mỗi CONFIG_CHECK_INTERVAL_SECONDS (0 = không tự kiểm tra, chỉ reload khi
+    # có tín hiệu invalidate_config()/reload_config()).
+    CONFIG_CHECK_INTERVAL_SECONDS: float = 5.0
+    _CONFIG_SIGNATURE: Optional[tuple[int, int]] = None
+    _CONFIG_CHECKED_AT: float = 0.0
+    _CONFIG_DIRTY: bool = False
+
+    # Migrate schema (core.schema_migrations) 1 lần cho mỗi cấu hình kết nối,
+    # khi pool tạo kết nối đầu tiên. Tắt bằng AUTO_MIGRATE = False (lệnh quản trị).
+    # Migrate lỗi: không đánh dấu đã migrate (kết nối mới tạo sau sẽ thử lại) và giữ
+    # thông báo lỗi để UI hiện cho người dùng 1 lần (take_migration_error).
+    AUTO_MIGRATE: bool = True
+    _MIGRATED_KEYS: set = set()
+    _MIGRATE_LOCK = threading.Lock()
+    _MIGRATION_ERRORS: dict = {}
+    _MIGRATION_REPORTED: set = set()
 
     @staticmethod
-    def _ensure_schema(conn) -> None:
-        """Best-effort schema upgrades to keep app compatible across DB versions."""
+    def _run_migrations(conn, config_key: tuple) -> None:
+        """Chạy các bước migrate còn thiếu (không làm app crash nếu thiếu quyền ALTER)."""
 
-        if Database._SCHEMA_CHECKED:
+        if not Database.AUTO_MIGRATE or config_key in Database._MIGRATED_KEYS:
             return
-        Database._SCHEMA_CHECKED = True
 
-        # Ensure new columns exist (do not crash the app if no ALTER permission).
-        cursor = None
-        try:
-            schema_name = str(Database.CONFIG.get("database") or "").strip() or None
-            cursor = Database.get_cursor(conn, dictionary=False)
-
-            # work_shifts.overtime_round_minutes (used by Shift Attendance overtime grace)
-            if schema_name:
-                cursor.execute(
-                    "SELECT COUNT(*) FROM information_schema.COLUMNS "
-                    "WHERE TABLE_SCHEMA=%s AND TABLE_NAME='work_shifts' AND COLUMN_NAME='overtime_round_minutes'",
-                    (schema_name,),
-                )
-            else:
-                cursor.execute(
-                    "SELECT COUNT(*) FROM information_schema.COLUMNS "
-                    "WHERE TABLE_NAME='work_shifts' AND COLUMN_NAME='overtime_round_minutes'",
-                )
-
-            row = cursor.fetchone()
-            exists = False
+        with Database._MIGRATE_LOCK:
+            if config_key in Database._MIGRATED_KEYS:
+                return
             try:
-                exists = bool(row and int(row[0]) > 0)
-            except Exception:
-                exists = False
-
-            if not exists:
-                try:
-                    cursor.execute(
-                        "ALTER TABLE work_shifts "
-                        "ADD COLUMN overtime_round_minutes INT NOT NULL DEFAULT 0"
-                    )
-                    conn.commit()
-                    logger.info(
-                        "✅ Auto-migrate: added work_shifts.overtime_round_minutes"
-                    )
-                except Exception:
-                    logger.warning(
-                        "⚠️ Không thể tự động thêm cột work_shifts.overtime_round_minutes. "
-                        "Vui lòng chạy script cập nhật CSDL (creater_database.SQL).",
-                        exc_info=True,
+                schema_migrations.migrate(conn)
+            except Exception as exc:
+                # Traceback đầy đủ chỉ ghi lần đầu, các lần thử lại sau ghi 1 dòng
+                first = config_key not in Database._MIGRATION_REPORTED
+                logger.warning(
+                    "⚠️ Không thể tự động cập nhật schema CSDL. "
+                    "Vui lòng chạy: python -m core.schema_migrations "
+                    "(hoặc script creater_database.SQL). Lỗi: %s",
+                    exc,
+                    exc_info=first,
+                )
+                if first:
+                    Database._MIGRATION_REPORTED.add(config_key)
+                    Database._MIGRATION_ERRORS[config_key] = (
+                        "Không thể tự động cập nhật cấu trúc CSDL lên phiên bản "
+                        f"{schema_migrations.LATEST_VERSION}; một số chức năng có thể lỗi.\n"
+                        "Vui lòng dùng tài khoản có quyền ALTER/CREATE rồi mở lại phần mềm, "
+                        "hoặc chạy: python -m core.schema_migrations "
+                        "(hoặc script creater_database.SQL).\n"
+                        f"Chi tiết: {exc}"
                     )
-        except Exception:
-            logger.debug("Schema ensure failed", exc_info=True)
-        finally:
-            if cursor is not None:
                 try:
-                    cursor.close()
+                    conn.rollback()
                 except Exception:
                     pass
+                return
+            Database._MIGRATED_KEYS.add(config_key)
+            Database._MIGRATION_ERRORS.pop(config_key, None)
+
+    @staticmethod
+    def take_migration_error() -> Optional[str]:
+        """Lỗi migrate chưa báo cho người dùng (mỗi lỗi chỉ trả về 1 lần), không có thì None."""
+
+        # Không lấy _MIGRATE_LOCK: UI gọi định kỳ, không chờ lượt migrate đang chạy
+        try:
+            return Database._MIGRATION_ERRORS.popitem()[1]
+        except KeyError:
+            return None
+
+    @staticmethod
+    def _default_config_path() -> Path:
+        return Path(resource_path("database/db_config.json"))
+
+    @staticmethod
+    def _file_signature(path: Path) -> Optional[tuple[int, int]]:
+        try:
+            st = path.stat()
+            return (int(st.st_mtime_ns), int(st.st_size))
+        except OSError:
+            return None
 
     @staticmethod
     def load_config_from_file(config_file: str | None = None) -> None:
@@ -113,11 +451,11 @@ class Database:
         Mặc định: database/db_config.json (qua resource_path).
         """
 
-        path = (
-            Path(config_file)
-            if config_file
-            else Path(resource_path("database/db_config.json"))
-        )
+        path = Path(config_file) if config_file else Database._default_config_path()
+        if not config_file:
+            Database._CONFIG_SIGNATURE = Database._file_signature(path)
+            Database._CONFIG_CHECKED_AT = time.monotonic()
+            Database._CONFIG_DIRTY = False
         try:
             if not path.exists() or not path.is_file():
                 return
@@ -148,22 +486,170 @@ class Database:
                     "database": database,
                 }
             )
+
+            Database._merge_options(Database.POOL_CONFIG, data.get("pool"))
+            Database._merge_options(
+                Database.DIAGNOSTICS_CONFIG, data.get("diagnostics")
+            )
+            Database._DIAGNOSTICS.configure(**Database.DIAGNOSTICS_CONFIG)
+
+            Database._merge_options(Database.BULK_CONFIG, data.get("bulk"))
+            if Database.BULK_CONFIG.get("local_infile"):
+                Database.CONFIG["allow_local_infile"] = True
+            else:
+                Database.CONFIG.pop("allow_local_infile", None)
         except Exception as exc:
             logger.debug(f"Không thể load db_config.json: {exc}")
 
+    @staticmethod
+    def _merge_options(target: dict, options: Any) -> None:
+        """Ghi đè các khoá đã biết trong target bằng giá trị từ JSON (ép kiểu theo mặc định)."""
+
+        if not isinstance(options, dict):
+            return
+        for key, default in target.items():
+            if key not in options:
+                continue
+            value = options[key]
+            try:
+                if isinstance(default, bool):
+                    target[key] = (
+                        value
+                        if isinstance(value, bool)
+                        else str(value).strip().lower() in ("1", "true", "yes")
+                    )
+                else:
+                    target[key] = type(default)(value)
+            except Exception:
+                continue
+
+    @staticmethod
+    def invalidate_config() -> None:
+        """Đánh dấu cấu hình cần đọc lại ở lần connect() kế tiếp."""
+
+        Database._CONFIG_DIRTY = True
+
+    @staticmethod
+    def reload_config() -> None:
+        """Đọc lại db_config.json ngay; nếu cấu hình đổi thì dựng lại connection pool."""
+
+        before = Database._pool_key()
+        Database.load_config_from_file()
+        if Database._pool_key() != before:
+            Database.close_pool()
+
+    @staticmethod
+    def _ensure_config_current() -> None:
+        """Reload cấu hình khi file thay đổi (mtime/size) hoặc khi bị invalidate.
+
+        Hot path chỉ so sánh thời gian; stat file tối đa 1 lần mỗi chu kỳ kiểm tra.
+        """
+
+        if not Database._CONFIG_DIRTY:
+            interval = float(Database.CONFIG_CHECK_INTERVAL_SECONDS or 0)
+            if interval <= 0:
+                return
+            if time.monotonic() - Database._CONFIG_CHECKED_AT < interval:
+                return
+
+            Database._CONFIG_CHECKED_AT = time.monotonic()
+            signature = Database._file_signature(Database._default_config_path())
+            if signature == Database._CONFIG_SIGNATURE:
+                return
+
+        logger.info("db_config.json thay đổi, đọc lại cấu hình kết nối")
+        Database.reload_config()
+
+    @staticmethod
+    def _config_key(config: dict) -> tuple:
+        return tuple(sorted((str(k), str(v)) for k, v in (config or {}).items()))
+
+    @staticmethod
+    def _pool_key() -> tuple:
+        return (
+            Database._config_key(Database.CONFIG),
+            Database._config_key(Database.POOL_CONFIG),
+        )
+
+    @staticmethod
+    def _get_pool() -> _ConnectionPool:
+        """Trả về pool ứng với Database.CONFIG hiện tại (tạo lại nếu cấu hình đã đổi)."""
+
+        key = Database._pool_key()
+        with Database._POOL_LOCK:
+            pool = Database._POOL
+            if pool is not None and pool.config_key == key:
+                return pool
+
+            cfg = Database.POOL_CONFIG
+            new_pool = _ConnectionPool(
+                Database.CONFIG,
+                config_key=key,
+                size=cfg.get("size", 5),
+                max_idle_seconds=cfg.get("max_idle_seconds", 300),
+                ping_interval_seconds=cfg.get("ping_interval_seconds", 5),
+                acquire_timeout_seconds=cfg.get("acquire_timeout_seconds", 15),
+                reset_session=cfg.get("reset_session", True),
+            )
+            Database._POOL = new_pool
+
+        if pool is not None:
+            logger.info("Cấu hình CSDL thay đổi, khởi tạo lại connection pool")
+            pool.close()
+        return new_pool
+
+    @staticmethod
+    def close_pool() -> None:
+        """Đóng connection pool (gọi khi thoát phần mềm hoặc đổi cấu hình)."""
+
+        with Database._POOL_LOCK:
+            pool, Database._POOL = Database._POOL, None
+        if pool is not None:
+            pool.close()
+
+    @staticmethod
+    def pool_stats() -> dict[str, int]:
+        pool = Database._POOL
+        if pool is None:
+            return {"size": 0, "idle": 0, "borrowed": 0}
+        return pool.stats()
+
+    @staticmethod
+    def diagnostics() -> dict[str, Any]:
+        """Số liệu truy vấn từ lúc khởi động (hoặc lần reset gần nhất).
+
+        Returns:
+            dict: {"slow_query_ms", "acquire": {...}, "statements": [...]}
+            - statements: theo fingerprint SQL, sắp xếp theo tổng thời gian giảm dần,
+              gồm count/total_ms/p50_ms/p95_ms/max_ms/rows/callers.
+        """
+        return Database._DIAGNOSTICS.snapshot()
+
+    @staticmethod
+    def reset_diagnostics() -> None:
+        Database._DIAGNOSTICS.reset()
+
     @staticmethod
     def connect():
         """
-        Kết nối đến MySQL.
+        Mượn một kết nối MySQL từ connection pool.
+
+        Dùng với `with Database.connect() as conn:`; khi thoát khối `with`
+        (hoặc gọi conn.close()) kết nối được trả về pool, không đóng socket.
 
         Returns:
-            MySQLConnection: Đối tượng kết nối
+            _PooledConnection: Proxy của MySQLConnection
 
         Raises:
             mysql.connector.Error: Nếu kết nối thất bại
         """
-        # Luôn reload cấu hình trước khi kết nối (để thay đổi từ dialog/file có hiệu lực ngay).
-        Database.load_config_from_file()
+        # Đang trong Database.transaction(): dùng chung kết nối của transaction đó.
+        unit = getattr(Database._LOCAL, "unit", None)
+        if unit is not None:
+            return _SharedConnection(unit)
+
+        # Chỉ reload cấu hình khi file thay đổi hoặc có tín hiệu invalidate.
+        Database._ensure_config_current()
 
         # Nếu chưa cấu hình đầy đủ thì báo rõ ràng.
         host = str(Database.CONFIG.get("host") or "").strip()
@@ -175,16 +661,11 @@ class Database:
             )
 
         try:
-            conn = mysql.connector.connect(**Database.CONFIG)
-            logger.info("✅ Kết nối MySQL thành công")
-
-            # Best-effort schema checks (once per process)
-            try:
-                Database._ensure_schema(conn)
-            except Exception:
-                pass
-
-            return conn
+            pool = Database._get_pool()
+            t0 = time.perf_counter()
+            raw = pool.acquire()
+            Database._DIAGNOSTICS.record_acquire((time.perf_counter() - t0) * 1000.0)
+            return _PooledConnection(pool, raw)
         except mysql.connector.Error as err:
             if err.errno == mysql.connector.errorcode.ER_ACCESS_DENIED_ERROR:
                 logger.error("❌ Tên đăng nhập hoặc mật khẩu sai")
@@ -197,6 +678,53 @@ class Database:
             logger.error(f"❌ Lỗi không xác định: {err}")
             raise
 
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """
+        Unit of work: các repository gọi Database.connect() bên trong khối này
+        dùng chung 1 kết nối và 1 transaction (commit 1 lần khi thoát khối,
+        rollback toàn bộ nếu có exception).
+
+        Lồng nhau: khối bên trong tham gia transaction bên ngoài.
+
+        Example:
+            with Database.transaction():
+                repo_a.upsert(...)
+                repo_b.upsert(...)
+        """
+
+        unit = getattr(Database._LOCAL, "unit", None)
+        if unit is not None:
+            unit.depth += 1
+            try:
+                yield _SharedConnection(unit)
+            finally:
+                unit.depth -= 1
+            return
+
+        conn = Database.connect()
+        unit = _UnitOfWork(conn)
+        Database._LOCAL.unit = unit
+        try:
+            yield _SharedConnection(unit)
+            if unit.rollback_only:
+                raise RuntimeError(
+                    "Transaction đã bị rollback bởi một thao tác bên trong."
+                )
+            conn.commit()
+        except BaseException as exc:
+            try:
+                conn.rollback()
+            except Exception:
+                logger.debug("Rollback transaction thất bại", exc_info=True)
+            conn.__exit__(type(exc), exc, exc.__traceback__)
+            raise
+        else:
+            conn.close()
+        finally:
+            Database._LOCAL.unit = None
+
     @staticmethod
     def get_cursor(conn, dictionary: bool = True):
         """
@@ -213,6 +741,61 @@ class Database:
             return conn.cursor(dictionary=True)
         return conn.cursor()
 
+    @staticmethod
+    def stream_query(
+        query: str,
+        params: Optional[tuple] = None,
+        *,
+        batch_size: int = 1000,
+        dictionary: bool = True,
+    ) -> Iterator[list]:
+        """
+        Thực thi SELECT và trả kết quả theo từng lô (không nạp toàn bộ vào RAM).
+
+        Dùng cursor unbuffered + fetchmany(batch_size); kết nối được giữ tới khi
+        đọc hết hoặc generator bị đóng (break/close), sau đó trả về pool.
+
+        Args:
+            query (str): Câu SQL
+            params (tuple): Tham số query (sử dụng %s)
+            batch_size (int): Số dòng tối đa mỗi lô
+            dictionary (bool): True = dict, False = tuple (nhẹ hơn)
+
+        Yields:
+            list: Lô dòng kết quả (list[dict] hoặc list[tuple])
+
+        Example:
+            for batch in Database.stream_query("SELECT * FROM attendance_audit", batch_size=5000):
+                for row in batch:
+                    ...
+        """
+        size = max(1, int(batch_size or 1))
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = conn.cursor(dictionary=bool(dictionary), buffered=False)
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+
+                while True:
+                    batch = cursor.fetchmany(size)
+                    if not batch:
+                        break
+                    yield batch
+        except mysql.connector.Error as err:
+            logger.error(
+                f"❌ Lỗi stream_query: {err}\n   Query: {query}\n   Params: {params}"
+            )
+            raise
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
     @staticmethod
     def execute_query(
         query: str, params: Optional[tuple] = None, fetch: str = "all"
@@ -338,6 +921,95 @@ class Database:
                 except Exception:
                     pass
 
+    @staticmethod
+    def _infile_value(value: Any) -> str:
+        """1 giá trị theo định dạng mặc định của LOAD DATA (tab, \\N = NULL)."""
+
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            return "1" if value else "0"
+        if isinstance(value, datetime):
+            return value.isoformat(sep=" ")
+        if isinstance(value, (date, dt_time)):
+            return value.isoformat()
+        return (
+            str(value)
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+
+    @staticmethod
+    def _load_data_local(cursor, table: str, columns: list[str], rows: list) -> int:
+        fd, path = tempfile.mkstemp(prefix="bulk_", suffix=".tsv")
+        try:
+            # newline="": giữ nguyên \n trên Windows (LINES TERMINATED BY '\n')
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                for row in rows:
+                    f.write("\t".join(Database._infile_value(v) for v in row))
+                    f.write("\n")
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {table} "
+                f"CHARACTER SET utf8mb4 ({', '.join(columns)})",
+                (path,),
+            )
+            return int(cursor.rowcount or 0)
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def bulk_insert(cursor, table: str, columns: list[str], rows: list) -> int:
+        """Nạp nhiều dòng vào table (thường là bảng TEMPORARY để gộp bằng câu SQL tập hợp).
+
+        - BULK_CONFIG["local_infile"] bật: LOAD DATA LOCAL INFILE qua file tạm; server
+          không cho phép -> ghi nhớ theo cấu hình kết nối và chuyển sang INSERT nhiều dòng.
+        - Còn lại: INSERT IGNORE nhiều dòng, mỗi câu BULK_CONFIG["chunk_rows"] dòng.
+        Trùng unique key: bỏ qua dòng mới (như INSERT IGNORE).
+
+        Args:
+            cursor: Cursor của kết nối đang dùng (bảng TEMPORARY chỉ thấy trong kết nối đó)
+            rows: list tuple theo đúng thứ tự columns
+
+        Returns:
+            int: Số dòng đã nạp
+        """
+        if not rows:
+            return 0
+
+        key = Database._pool_key()
+        if (
+            Database.BULK_CONFIG.get("local_infile")
+            and key not in Database._LOCAL_INFILE_REFUSED
+        ):
+            try:
+                return Database._load_data_local(cursor, table, columns, rows)
+            except mysql.connector.Error as err:
+                if err.errno not in Database._LOCAL_INFILE_ERRNOS:
+                    raise
+                Database._LOCAL_INFILE_REFUSED.add(key)
+                logger.warning(
+                    "Server không cho phép LOAD DATA LOCAL INFILE (%s), dùng INSERT nhiều dòng",
+                    err,
+                )
+
+        size = max(1, int(Database.BULK_CONFIG.get("chunk_rows") or 1))
+        row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        head = f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES "
+        loaded = 0
+        for i in range(0, len(rows), size):
+            chunk = rows[i : i + size]
+            cursor.execute(
+                head + ", ".join([row_sql] * len(chunk)),
+                tuple(v for row in chunk for v in row),
+            )
+            loaded += int(cursor.rowcount or 0)
+        return loaded
+
     @staticmethod
     def test_connection() -> bool:
         """
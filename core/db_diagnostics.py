@@ -0,0 +1,353 @@
+"""
+Module đo đạc truy vấn MySQL (diagnostics) cho core.database.
+
+Cung cấp:
+- Cursor proxy đo thời gian execute/fetch, số dòng trả về, hàm repository gọi tới
+- Fingerprint câu SQL (bỏ literal/tham số) để gom nhóm thống kê
+- Thống kê cuộn theo fingerprint (count, p50/p95/max) + thời gian mượn kết nối
+- Ghi câu chậm (vượt ngưỡng) ra logger riêng "slow_query" (file log/slow_query.log)
+"""
+
+import logging
+import re
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+
+# Logger riêng cho câu SQL chậm; main.setup_logging gắn file handler log/slow_query.log
+slow_logger = logging.getLogger("slow_query")
+
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_RE_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_VALUES_LIST = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.I)
+_RE_SPACES = re.compile(r"\s+")
+
+_CALLER_PREFIXES = ("repository.", "services.")
+
+
+def fingerprint(query: str) -> str:
+    """Chuẩn hoá câu SQL: bỏ literal/tham số, gộp IN (...)/VALUES (...) nhiều phần tử."""
+
+    s = str(query or "")
+    s = _RE_STRING.sub("?", s)
+    s = _RE_PLACEHOLDER.sub("?", s)
+    s = _RE_NUMBER.sub("?", s)
+    s = _RE_SPACES.sub(" ", s).strip()
+    s = _RE_IN_LIST.sub("(?+)", s)
+    s = _RE_VALUES_LIST.sub(r"\1", s)
+    return s
+
+
+def _find_caller() -> str:
+    """Tìm hàm repository/service gần nhất trên call stack (vd 'XRepository.list_rows')."""
+
+    frame = sys._getframe(2)
+    fallback = ""
+    while frame is not None:
+        module = str(frame.f_globals.get("__name__") or "")
+        if module.startswith(_CALLER_PREFIXES):
+            code = frame.f_code
+            name = getattr(code, "co_qualname", None) or code.co_name
+            return f"{module}.{name}"
+        if not fallback and not module.startswith(("core.", "contextlib")):
+            fallback = f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = int(round((pct / 100.0) * (len(sorted_values) - 1)))
+    return float(sorted_values[max(0, min(len(sorted_values) - 1, idx))])
+
+
+class _RollingStat:
+    """Thống kê cuộn: tổng số lần, tổng/max và mẫu gần nhất để tính percentile."""
+
+    __slots__ = ("count", "total_ms", "max_ms", "rows", "samples", "callers")
+
+    def __init__(self, sample_size: int) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.samples: deque[float] = deque(maxlen=max(1, int(sample_size)))
+        self.callers: dict[str, int] = {}
+
+    def add(self, elapsed_ms: float, rows: int = 0, caller: str = "") -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        self.rows += max(0, int(rows))
+        self.samples.append(elapsed_ms)
+        if caller:
+            self.callers[caller] = self.callers.get(caller, 0) + 1
+
+    def snapshot(self) -> dict[str, Any]:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "p50_ms": round(_percentile(ordered, 50), 2),
+            "p95_ms": round(_percentile(ordered, 95), 2),
+            "max_ms": round(self.max_ms, 2),
+            "rows": self.rows,
+            "callers": dict(
+                sorted(self.callers.items(), key=lambda kv: kv[1], reverse=True)
+            ),
+        }
+
+
+class QueryDiagnostics:
+    """Bộ thu thập số liệu truy vấn (thread-safe), dùng chung toàn process."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        slow_query_ms: float = 500.0,
+        sample_size: int = 512,
+        max_fingerprints: int = 500,
+    ) -> None:
+        self.enabled = bool(enabled)
+        self.slow_query_ms = float(slow_query_ms)
+        self.sample_size = int(sample_size)
+        self.max_fingerprints = int(max_fingerprints)
+
+        self._lock = threading.Lock()
+        self._statements: dict[str, _RollingStat] = {}
+        self._acquire = _RollingStat(self.sample_size)
+        self._fingerprints: dict[str, str] = {}
+
+    def configure(self, **options: Any) -> None:
+        with self._lock:
+            if "enabled" in options:
+                self.enabled = bool(options["enabled"])
+            if "slow_query_ms" in options:
+                self.slow_query_ms = float(options["slow_query_ms"])
+            if "sample_size" in options:
+                self.sample_size = max(1, int(options["sample_size"]))
+
+    def _fingerprint_cached(self, query: str) -> str:
+        fp = self._fingerprints.get(query)
+        if fp is None:
+            fp = fingerprint(query)
+            if len(self._fingerprints) >= self.max_fingerprints * 4:
+                self._fingerprints.clear()
+            self._fingerprints[query] = fp
+        return fp
+
+    def record_acquire(self, elapsed_ms: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._acquire.add(elapsed_ms)
+
+    def record_statement(
+        self,
+        query: str,
+        elapsed_ms: float,
+        rows: int,
+        caller: str,
+        params: Any = None,
+    ) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            fp = self._fingerprint_cached(query)
+            stat = self._statements.get(fp)
+            if stat is None:
+                if len(self._statements) >= self.max_fingerprints:
+                    # Bỏ fingerprint ít dùng nhất để giữ bộ nhớ cố định
+                    victim = min(self._statements, key=lambda k: self._statements[k].count)
+                    self._statements.pop(victim, None)
+                stat = _RollingStat(self.sample_size)
+                self._statements[fp] = stat
+            stat.add(elapsed_ms, rows, caller)
+            slow_ms = self.slow_query_ms
+
+        if slow_ms > 0 and elapsed_ms >= slow_ms:
+            slow_logger.warning(
+                "%.1f ms | rows=%s | caller=%s | %s | params=%s",
+                elapsed_ms,
+                rows,
+                caller or "?",
+                fp,
+                _short_params(params),
+            )
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            statements = [
+                {"fingerprint": fp, **stat.snapshot()}
+                for fp, stat in self._statements.items()
+            ]
+            acquire = self._acquire.snapshot()
+            acquire.pop("rows", None)
+            acquire.pop("callers", None)
+        statements.sort(key=lambda s: s["total_ms"], reverse=True)
+        return {
+            "slow_query_ms": self.slow_query_ms,
+            "acquire": acquire,
+            "statements": statements,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._acquire = _RollingStat(self.sample_size)
+
+
+def _short_params(params: Any, limit: int = 200) -> str:
+    if params is None:
+        return ""
+    text = repr(params)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class InstrumentedCursor:
+    """Proxy cursor: đo execute + thời gian nằm trong fetch*, đếm số dòng đọc được.
+
+    Một câu lệnh được ghi nhận khi cursor thực thi câu tiếp theo hoặc bị đóng.
+    """
+
+    __slots__ = (
+        "_cursor",
+        "_diag",
+        "_query",
+        "_params",
+        "_caller",
+        "_elapsed",
+        "_rows",
+        "_pending",
+    )
+
+    def __init__(self, cursor, diag: QueryDiagnostics) -> None:
+        self._cursor = cursor
+        self._diag = diag
+        self._query: str = ""
+        self._params: Any = None
+        self._caller: str = ""
+        self._elapsed: float = 0.0
+        self._rows: int = 0
+        self._pending = False
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._rows += 1
+            yield row
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        self._pending = False
+        try:
+            self._diag.record_statement(
+                self._query,
+                self._elapsed * 1000.0,
+                self._rows,
+                self._caller,
+                self._params,
+            )
+        except Exception:
+            pass
+
+    def _begin(self, query: str, params: Any) -> None:
+        self._flush()
+        self._query = str(query or "")
+        self._params = params
+        self._caller = _find_caller()
+        self._elapsed = 0.0
+        self._rows = 0
+        self._pending = True
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._begin(operation, params)
+        t0 = time.perf_counter()
+        try:
+            if params is None and not args and not kwargs:
+                return self._cursor.execute(operation)
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._elapsed += time.perf_counter() - t0
+            self._count_affected()
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._begin(operation, None)
+        t0 = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._elapsed += time.perf_counter() - t0
+            self._count_affected()
+
+    def _count_affected(self) -> None:
+        # INSERT/UPDATE/DELETE: dùng rowcount; SELECT sẽ được đếm khi fetch
+        if getattr(self._cursor, "with_rows", False):
+            return
+        try:
+            rc = int(self._cursor.rowcount)
+            if rc > 0:
+                self._rows = rc
+        except Exception:
+            pass
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        try:
+            row = self._cursor.fetchone()
+        finally:
+            self._elapsed += time.perf_counter() - t0
+        if row is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            rows = self._cursor.fetchmany(*args, **kwargs)
+        finally:
+            self._elapsed += time.perf_counter() - t0
+        self._rows += len(rows or [])
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        try:
+            rows = self._cursor.fetchall()
+        finally:
+            self._elapsed += time.perf_counter() - t0
+        self._rows += len(rows or [])
+        return rows
+
+    def close(self):
+        self._flush()
+        return self._cursor.close()
+
+
+def attach_slow_query_file(path, level: int = logging.WARNING) -> Optional[logging.Handler]:
+    """Gắn file handler cho logger slow_query (không propagate ra debug.log)."""
+
+    try:
+        handler = logging.FileHandler(path, mode="a", encoding="utf-8")
+    except Exception:
+        return None
+
+    handler.setLevel(level)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    slow_logger.handlers.clear()
+    slow_logger.addHandler(handler)
+    slow_logger.setLevel(level)
+    slow_logger.propagate = False
+    return handler
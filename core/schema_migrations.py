@@ -0,0 +1,502 @@
+"""
+Module migrate schema MySQL theo phiên bản.
+
+Cung cấp:
+- Bảng schema_version ghi lại các bước migrate đã chạy
+- Danh sách bước migrate có thứ tự (MIGRATIONS), tương ứng các thay đổi
+  trong creater_database.SQL cho DB cài từ bản cũ
+- migrate(conn): chạy các bước còn thiếu (1 lần khi khởi động, qua pool)
+- Lệnh quản trị: python -m core.schema_migrations [--status]
+
+Sau khi migrate xong, repository coi như schema đã ở phiên bản mới nhất,
+không còn dò information_schema hay thử lại query "Unknown column" lúc chạy.
+
+Thêm bước mới: append Migration(version kế tiếp, ...) vào cuối MIGRATIONS,
+không sửa/đổi số các bước đã phát hành.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+# Tránh 2 máy/2 tiến trình cùng migrate một DB.
+_LOCK_NAME = "attendance_schema_migrate"
+_LOCK_TIMEOUT_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Any], None]
+
+
+# -----------------------------
+# Helpers (chỉ dùng khi đang chạy 1 bước migrate)
+# -----------------------------
+
+
+def _table_exists(cursor, table: str) -> bool:
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    row = cursor.fetchone()
+    return bool(row and int(row[0]) > 0)
+
+
+def _existing_columns(cursor, table: str) -> set[str]:
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return {str(r[0]).strip().lower() for r in (cursor.fetchall() or []) if r and r[0]}
+
+
+def _index_exists(cursor, table: str, index_name: str) -> bool:
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, index_name),
+    )
+    row = cursor.fetchone()
+    return bool(row and int(row[0]) > 0)
+
+
+def _constraint_exists(cursor, table: str, constraint_name: str) -> bool:
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLE_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = %s",
+        (table, constraint_name),
+    )
+    row = cursor.fetchone()
+    return bool(row and int(row[0]) > 0)
+
+
+def _add_missing_columns(cursor, table: str, columns: list[tuple[str, str]]) -> None:
+    """ALTER TABLE 1 lần cho các cột còn thiếu. columns: [(tên cột, định nghĩa)]."""
+
+    existing = _existing_columns(cursor, table)
+    alters = [
+        f"ADD COLUMN {name} {definition}"
+        for name, definition in columns
+        if name.lower() not in existing
+    ]
+    if alters:
+        cursor.execute(f"ALTER TABLE {table} " + ", ".join(alters))
+
+
+# -----------------------------
+# Các bước migrate
+# -----------------------------
+
+
+def _m001_employees_import_columns(cursor) -> None:
+    _add_missing_columns(
+        cursor,
+        "employees",
+        [
+            ("contract1_term", "VARCHAR(50) NULL"),
+            ("sort_order", "INT NULL"),
+            ("mcc_code", "VARCHAR(50) NULL"),
+            ("name_on_mcc", "VARCHAR(255) NULL"),
+            ("employment_status", "VARCHAR(20) NULL"),
+        ],
+    )
+
+
+def _m002_job_titles_department_id(cursor) -> None:
+    _add_missing_columns(
+        cursor, "job_titles", [("department_id", "INT NULL AFTER title_name")]
+    )
+    if not _index_exists(cursor, "job_titles", "idx_job_titles_department_id"):
+        cursor.execute(
+            "CREATE INDEX idx_job_titles_department_id ON job_titles (department_id)"
+        )
+
+
+def _m003_devices_device_type(cursor) -> None:
+    _add_missing_columns(
+        cursor, "devices", [("device_type", "VARCHAR(30) NULL AFTER device_name")]
+    )
+
+
+def _m004_work_shifts_overtime_round_minutes(cursor) -> None:
+    _add_missing_columns(
+        cursor,
+        "work_shifts",
+        [("overtime_round_minutes", "INT NOT NULL DEFAULT 0")],
+    )
+
+
+def _m005_attendance_audit_shift_code(cursor) -> None:
+    _add_missing_columns(
+        cursor,
+        "attendance_audit",
+        [
+            (
+                "shift_code",
+                "VARCHAR(255) NULL COMMENT 'Mã ca đã xác định theo lịch/ca (có thể ghép: HC+CH)' AFTER schedule",
+            )
+        ],
+    )
+
+
+def _m006_arrange_schedule_shift_slots(cursor) -> None:
+    _add_missing_columns(
+        cursor,
+        "arrange_schedule_details",
+        [
+            ("shift4_id", "INT NULL AFTER shift3_id"),
+            ("shift5_id", "INT NULL AFTER shift4_id"),
+        ],
+    )
+    for n in (4, 5):
+        name = f"fk_arrange_schedule_details_shift{n}"
+        if not _constraint_exists(cursor, "arrange_schedule_details", name):
+            cursor.execute(
+                f"ALTER TABLE arrange_schedule_details ADD CONSTRAINT {name} "
+                f"FOREIGN KEY (shift{n}_id) REFERENCES work_shifts (id) "
+                "ON DELETE SET NULL ON UPDATE CASCADE"
+            )
+
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS arrange_schedule_detail_shifts ("
+        "id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+        "schedule_id INT NOT NULL,"
+        "day_key VARCHAR(20) NOT NULL,"
+        "position INT NOT NULL,"
+        "shift_id INT NULL,"
+        "created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        "updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,"
+        "UNIQUE KEY uq_arrange_schedule_detail_shifts_sched_day_pos (schedule_id, day_key, position),"
+        "KEY idx_arrange_schedule_detail_shifts_schedule (schedule_id),"
+        "KEY idx_arrange_schedule_detail_shifts_day_key (day_key),"
+        "CONSTRAINT fk_arrange_schedule_detail_shifts_schedule FOREIGN KEY (schedule_id) "
+        "REFERENCES arrange_schedules (id) ON DELETE CASCADE ON UPDATE CASCADE,"
+        "CONSTRAINT fk_arrange_schedule_detail_shifts_shift FOREIGN KEY (shift_id) "
+        "REFERENCES work_shifts (id) ON DELETE SET NULL ON UPDATE CASCADE"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+def _m007_export_grid_list_settings(cursor) -> None:
+    def text_style(prefix: str) -> list[tuple[str, str]]:
+        return [
+            (f"{prefix}_font_size", "INT NULL"),
+            (f"{prefix}_bold", "TINYINT(1) NOT NULL DEFAULT 0"),
+            (f"{prefix}_italic", "TINYINT(1) NOT NULL DEFAULT 0"),
+            (f"{prefix}_underline", "TINYINT(1) NOT NULL DEFAULT 0"),
+            (f"{prefix}_align", "VARCHAR(10) NOT NULL DEFAULT 'left'"),
+        ]
+
+    columns: list[tuple[str, str]] = [
+        ("export_kind", "VARCHAR(20) NOT NULL DEFAULT 'grid'"),
+        ("time_pairs", "INT NOT NULL DEFAULT 4"),
+        ("company_name", "VARCHAR(255) NULL"),
+        ("company_address", "VARCHAR(255) NULL"),
+        ("company_phone", "VARCHAR(50) NULL"),
+        *text_style("company_name"),
+        *text_style("company_address"),
+        *text_style("company_phone"),
+        ("creator", "VARCHAR(255) NULL"),
+        *text_style("creator"),
+        ("note_text", "TEXT NULL"),
+        *text_style("note"),
+        ("detail_note_text", "TEXT NULL"),
+        *text_style("detail_note"),
+    ]
+
+    if not _table_exists(cursor, "export_grid_list_settings"):
+        cursor.execute(
+            "CREATE TABLE export_grid_list_settings ("
+            "id INT PRIMARY KEY,"
+            + "".join(f"{name} {definition}," for name, definition in columns)
+            + "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+            ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+        )
+        return
+
+    _add_missing_columns(cursor, "export_grid_list_settings", columns)
+
+
+def _m008_device_sync_state(cursor) -> None:
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS device_sync_state ("
+        "device_id INT NOT NULL PRIMARY KEY,"
+        "last_serial INT NOT NULL DEFAULT 0,"
+        "last_record_time DATETIME NULL,"
+        "record_count INT NOT NULL DEFAULT 0,"
+        "covered_from DATE NULL,"
+        "synced_at DATETIME NULL,"
+        "CONSTRAINT fk_device_sync_state_device FOREIGN KEY (device_id) "
+        "REFERENCES devices (id) ON DELETE CASCADE ON UPDATE CASCADE"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+def _m009_attendance_punches(cursor) -> None:
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS attendance_punches ("
+        "id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+        "attendance_code VARCHAR(50) NOT NULL,"
+        "punched_at DATETIME NOT NULL,"
+        "device_no INT NOT NULL,"
+        "device_id INT NULL,"
+        "created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        "UNIQUE KEY uq_attendance_punches_code_time_device (attendance_code, punched_at, device_no),"
+        "KEY idx_attendance_punches_punched_at (punched_at)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+# Bảng lịch: đủ rộng để không phải nạp thêm khi dùng (36.525 dòng)
+_CALENDAR_FROM = "2000-01-01"
+_CALENDAR_DAYS = 36525
+
+_DIGITS_SQL = "(SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9)"
+
+
+def _m010_calendar_days(cursor) -> None:
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS calendar_days ("
+        "day DATE NOT NULL PRIMARY KEY"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+    cursor.execute(
+        "INSERT IGNORE INTO calendar_days (day) "
+        "SELECT DATE_ADD(%s, INTERVAL n DAY) FROM ("
+        "SELECT a.d + b.d * 10 + c.d * 100 + d.d * 1000 + e.d * 10000 AS n "
+        f"FROM {_DIGITS_SQL} a CROSS JOIN {_DIGITS_SQL} b CROSS JOIN {_DIGITS_SQL} c "
+        f"CROSS JOIN {_DIGITS_SQL} d CROSS JOIN {_DIGITS_SQL} e"
+        ") nums WHERE n < %s",
+        (_CALENDAR_FROM, _CALENDAR_DAYS),
+    )
+
+    # Dòng "không chấm công" cũ (toàn NULL) giờ được sinh lúc truy vấn -> bỏ bản lưu.
+    times_null = (
+        "time_in_1 IS NULL AND time_out_1 IS NULL AND time_in_2 IS NULL "
+        "AND time_out_2 IS NULL AND time_in_3 IS NULL AND time_out_3 IS NULL"
+    )
+    cursor.execute(f"DELETE FROM attendance_raw WHERE {times_null}")
+    cursor.execute(f"DELETE FROM download_attendance WHERE {times_null}")
+    cursor.execute(
+        "DELETE FROM attendance_audit WHERE import_locked = 0 "
+        "AND in_1 IS NULL AND out_1 IS NULL AND in_2 IS NULL "
+        "AND out_2 IS NULL AND in_3 IS NULL AND out_3 IS NULL "
+        "AND late IS NULL AND early IS NULL AND hours IS NULL AND work IS NULL "
+        "AND `leave` IS NULL AND hours_plus IS NULL AND work_plus IS NULL "
+        "AND leave_plus IS NULL AND tc1 IS NULL AND tc2 IS NULL AND tc3 IS NULL"
+    )
+
+
+def _m011_device_users(cursor) -> None:
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS device_rosters ("
+        "device_id INT NOT NULL PRIMARY KEY,"
+        "user_count INT NOT NULL DEFAULT 0,"
+        "fingerprint CHAR(40) NOT NULL DEFAULT '',"
+        "synced_at DATETIME NULL,"
+        "CONSTRAINT fk_device_rosters_device FOREIGN KEY (device_id) "
+        "REFERENCES devices (id) ON DELETE CASCADE ON UPDATE CASCADE"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS device_users ("
+        "device_id INT NOT NULL,"
+        "user_id VARCHAR(50) NOT NULL,"
+        "name VARCHAR(255) NULL,"
+        "PRIMARY KEY (device_id, user_id),"
+        "KEY idx_device_users_user_id (user_id),"
+        "CONSTRAINT fk_device_users_device FOREIGN KEY (device_id) "
+        "REFERENCES devices (id) ON DELETE CASCADE ON UPDATE CASCADE"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+def _m012_device_log_rotations(cursor) -> None:
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS device_log_rotations ("
+        "id BIGINT AUTO_INCREMENT PRIMARY KEY,"
+        "device_id INT NULL,"
+        "device_no INT NOT NULL,"
+        "record_count INT NOT NULL DEFAULT 0,"
+        "punch_count INT NOT NULL DEFAULT 0,"
+        "first_record_time DATETIME NULL,"
+        "last_record_time DATETIME NULL,"
+        "checksum CHAR(40) NOT NULL DEFAULT '',"
+        "rotated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        "KEY idx_device_log_rotations_device (device_id, rotated_at)"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+def _m013_attendance_audit_arranged(cursor) -> None:
+    _add_missing_columns(
+        cursor,
+        "attendance_audit",
+        [
+            ("arranged_in_1", "TIME NULL"),
+            ("arranged_out_1", "TIME NULL"),
+            ("arranged_in_2", "TIME NULL"),
+            ("arranged_out_2", "TIME NULL"),
+            ("arranged_in_3", "TIME NULL"),
+            ("arranged_out_3", "TIME NULL"),
+            ("arranged_shift_code", "VARCHAR(255) NULL"),
+            ("arranged_fingerprint", "CHAR(40) NULL"),
+        ],
+    )
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "employees_import_columns", _m001_employees_import_columns),
+    Migration(2, "job_titles_department_id", _m002_job_titles_department_id),
+    Migration(3, "devices_device_type", _m003_devices_device_type),
+    Migration(
+        4,
+        "work_shifts_overtime_round_minutes",
+        _m004_work_shifts_overtime_round_minutes,
+    ),
+    Migration(5, "attendance_audit_shift_code", _m005_attendance_audit_shift_code),
+    Migration(6, "arrange_schedule_shift_slots", _m006_arrange_schedule_shift_slots),
+    Migration(7, "export_grid_list_settings", _m007_export_grid_list_settings),
+    Migration(8, "device_sync_state", _m008_device_sync_state),
+    Migration(9, "attendance_punches", _m009_attendance_punches),
+    Migration(10, "calendar_days", _m010_calendar_days),
+    Migration(11, "device_users", _m011_device_users),
+    Migration(12, "device_log_rotations", _m012_device_log_rotations),
+    Migration(13, "attendance_audit_arranged", _m013_attendance_audit_arranged),
+]
+
+LATEST_VERSION = max(m.version for m in MIGRATIONS)
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+
+
+def _ensure_version_table(cursor) -> None:
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} ("
+        "version INT NOT NULL PRIMARY KEY,"
+        "name VARCHAR(255) NOT NULL,"
+        "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+def current_version(conn) -> int:
+    """Phiên bản schema hiện tại (0 nếu chưa có bảng schema_version)."""
+
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.execute(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_VERSION_TABLE}")
+        except Exception:
+            # errno 1146: bảng chưa tồn tại (DB chưa từng migrate)
+            return 0
+        row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else 0
+    finally:
+        cursor.close()
+
+
+def pending(conn) -> list[Migration]:
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def migrate(conn) -> int:
+    """Chạy các bước migrate còn thiếu theo thứ tự; trả về số bước đã chạy.
+
+    Mỗi bước được ghi vào schema_version ngay sau khi chạy xong, nên nếu dừng
+    giữa chừng thì lần sau chạy tiếp từ bước lỗi. Lỗi (vd thiếu quyền ALTER)
+    được raise cho caller.
+    """
+
+    if not pending(conn):
+        return 0
+
+    cursor = conn.cursor()
+    applied = 0
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (_LOCK_NAME, _LOCK_TIMEOUT_SECONDS))
+        row = cursor.fetchone()
+        if not row or int(row[0] or 0) != 1:
+            raise RuntimeError("Không lấy được khoá migrate schema (đang có tiến trình khác migrate).")
+
+        try:
+            _ensure_version_table(cursor)
+            # Đọc lại sau khi có khoá: tiến trình khác có thể vừa migrate xong.
+            cursor.execute(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_VERSION_TABLE}")
+            row = cursor.fetchone()
+            version = int(row[0]) if row and row[0] is not None else 0
+
+            for step in MIGRATIONS:
+                if step.version <= version:
+                    continue
+                logger.info("Migrate schema v%s: %s", step.version, step.name)
+                step.apply(cursor)
+                cursor.execute(
+                    f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, name) VALUES (%s, %s)",
+                    (step.version, step.name),
+                )
+                conn.commit()
+                applied += 1
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+    if applied:
+        logger.info("✅ Schema đã cập nhật lên v%s (%s bước)", LATEST_VERSION, applied)
+    return applied
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Lệnh quản trị: migrate schema của DB trong database/db_config.json."""
+
+    import argparse
+
+    from core.database import Database
+
+    parser = argparse.ArgumentParser(prog="python -m core.schema_migrations")
+    parser.add_argument(
+        "--status",
+        action="store_true",
+        help="Chỉ hiển thị phiên bản hiện tại và các bước chưa chạy",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+
+    # Không để pool tự migrate khi mở kết nối: lệnh này tự quyết định.
+    Database.AUTO_MIGRATE = False
+
+    with Database.connect() as conn:
+        version = current_version(conn)
+        todo = pending(conn)
+        print(f"Schema version: {version} (mới nhất: {LATEST_VERSION})")
+        for m in todo:
+            print(f"  - chưa chạy: v{m.version} {m.name}")
+        if args.status or not todo:
+            return 0
+        applied = migrate(conn)
+        print(f"Đã chạy {applied} bước migrate.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
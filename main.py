@@ -10,6 +10,8 @@ import os
 from pathlib import Path
 from PySide6.QtWidgets import QApplication
 
+from core.database import Database
+from core.db_diagnostics import attach_slow_query_file
 from core.resource import resource_path
 from ui.main_window import MainWindow
 
@@ -27,7 +29,7 @@ def _user_data_dir() -> Path:
 def setup_logging() -> None:
     """
     Thiết lập hệ thống logging cho ứng dụng.
-    Tạo file log/debug.log khi chạy ứng dụng.
+    Tạo file log/debug.log (và log/slow_query.log) khi chạy ứng dụng.
     """
     # Tránh lỗi Unicode trên Windows console (cp1252/cp932...)
     if hasattr(sys.stdout, "reconfigure"):
@@ -54,6 +56,9 @@ def setup_logging() -> None:
     root_logger.handlers.clear()
     root_logger.addHandler(file_handler)
 
+    # Câu SQL chậm ghi riêng vào log/slow_query.log (ngưỡng: Database.DIAGNOSTICS_CONFIG)
+    attach_slow_query_file(log_path.parent / "slow_query.log")
+
     # Không hiển thị log ra terminal
 
 
@@ -79,7 +84,11 @@ def main() -> None:
     main_window.show()
 
     logger.info("Ứng dụng đã sẵn sàng.")
-    sys.exit(app.exec())
+    exit_code = app.exec()
+
+    # Đóng các kết nối MySQL còn giữ trong pool
+    Database.close_pool()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+"""repository.arranged_dependency_repository
+
+SQL tra phụ thuộc của kết quả ghép giờ đã lưu (attendance_audit.arranged_*):
+- ca (work_shifts.id) -> lịch trình dùng ca (arrange_schedule_details shift1..5 và
+  arrange_schedule_detail_shifts)
+- lịch trình -> nhân viên + khoảng ngày áp dụng (employee_schedule_assignments)
+- tên lịch -> mã chấm công có dòng audit ghi lịch đó (dòng không có phân lịch)
+
+Ghi chú:
+- Repository chỉ làm SQL thuần; gom khoảng ngày / tính lại nằm ở
+  services.arranged_recompute_services.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from core.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+
+class ArrangedDependencyRepository:
+    @staticmethod
+    def _clean_ids(values: list[int] | None) -> list[int]:
+        ids: list[int] = []
+        for v in values or []:
+            try:
+                ids.append(int(v))
+            except Exception:
+                continue
+        return list(dict.fromkeys(ids))
+
+    def list_schedule_ids_by_shift_ids(self, shift_ids: list[int]) -> list[int]:
+        ids = self._clean_ids(shift_ids)
+        if not ids:
+            return []
+
+        placeholders = ",".join(["%s"] * len(ids))
+        slot_where = " OR ".join(
+            f"shift{i}_id IN ({placeholders})" for i in range(1, 6)
+        )
+        query = (
+            "SELECT schedule_id FROM hr_attendance.arrange_schedule_details "
+            f"WHERE {slot_where} "
+            "UNION "
+            "SELECT schedule_id FROM hr_attendance.arrange_schedule_detail_shifts "
+            f"WHERE shift_id IN ({placeholders})"
+        )
+        params = tuple(ids) * 6
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(query, params)
+                return [int(r[0]) for r in (cursor.fetchall() or []) if r and r[0] is not None]
+        except Exception:
+            logger.exception("Lỗi list_schedule_ids_by_shift_ids")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def list_schedule_names(self, schedule_ids: list[int]) -> list[str]:
+        ids = self._clean_ids(schedule_ids)
+        if not ids:
+            return []
+
+        query = (
+            "SELECT schedule_name FROM hr_attendance.arrange_schedules "
+            "WHERE id IN (" + ",".join(["%s"] * len(ids)) + ")"
+        )
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(query, tuple(ids))
+                return [str(r[0]) for r in (cursor.fetchall() or []) if r and r[0]]
+        except Exception:
+            logger.exception("Lỗi list_schedule_names")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def list_assignment_ranges(
+        self,
+        schedule_ids: list[int],
+        *,
+        from_date: str,
+        to_date: str,
+    ) -> list[dict[str, Any]]:
+        """Phân lịch (employee_id, effective_from, effective_to) giao với [from_date, to_date]."""
+
+        ids = self._clean_ids(schedule_ids)
+        if not ids:
+            return []
+
+        query = (
+            "SELECT employee_id, effective_from, effective_to "
+            "FROM hr_attendance.employee_schedule_assignments "
+            "WHERE schedule_id IN (" + ",".join(["%s"] * len(ids)) + ") "
+            "AND effective_from <= %s "
+            "AND (effective_to IS NULL OR effective_to >= %s) "
+            "ORDER BY employee_id ASC, effective_from ASC"
+        )
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=True)
+                cursor.execute(query, (*ids, str(to_date), str(from_date)))
+                return list(cursor.fetchall() or [])
+        except Exception:
+            logger.exception("Lỗi list_assignment_ranges")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def list_codes_by_schedule_names(
+        self,
+        schedule_names: list[str],
+        *,
+        from_date: str,
+        to_date: str,
+    ) -> list[str]:
+        """Mã chấm công có dòng audit ghi tên lịch (cột schedule) trong khoảng ngày."""
+
+        names = [str(n or "").strip() for n in schedule_names or []]
+        names = list(dict.fromkeys(n for n in names if n))
+        if not names:
+            return []
+
+        query = (
+            "SELECT DISTINCT attendance_code FROM hr_attendance.attendance_audit "
+            "WHERE work_date >= %s AND work_date <= %s "
+            "AND schedule IN (" + ",".join(["%s"] * len(names)) + ")"
+        )
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(query, (str(from_date), str(to_date), *names))
+                return [str(r[0]) for r in (cursor.fetchall() or []) if r and r[0]]
+        except Exception:
+            logger.exception("Lỗi list_codes_by_schedule_names")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
@@ -3,14 +3,17 @@
 SQL layer cho bảng attendance_audit.
 
 Bảng này dùng để UI (Shift Attendance - MainContent2) gọi lại dữ liệu đã tổng hợp từ DB.
+Tải lượng lớn: dòng tổng hợp nạp vào bảng TEMPORARY tmp_audit_rows rồi gộp bằng câu SQL
+tập hợp (begin_bulk / stage_rows / merge_staged_rows).
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Any
+from typing import Any, Iterator
 
 from core.database import Database
+from repository.calendar_repository import CalendarRepository
 
 
 logger = logging.getLogger(__name__)
@@ -18,17 +21,39 @@ logger = logging.getLogger(__name__)
 
 class AttendanceAuditRepository:
     TABLE = "attendance_audit"
-
-    def upsert_from_download_rows(self, rows: list[dict[str, Any]]) -> int:
+    _TABLE_STAGE = "tmp_audit_rows"
+    _STAGE_COLUMNS = [
+        "attendance_code", "name_on_mcc", "work_date",
+        "in_1", "out_1", "in_2", "out_2", "in_3", "out_3",
+        "device_id", "device_name",
+    ]
+
+    # Thứ tự cột của iter_rows (dùng cho phần dòng ảo UNION ALL)
+    _ROW_COLUMNS = [
+        "id", "attendance_code", "employee_code", "full_name", "date", "weekday",
+        "in_1", "out_1", "in_2", "out_2", "in_3", "out_3",
+        "late", "early", "hours", "work", "leave", "hours_plus", "work_plus", "leave_plus",
+        "total", "tc1", "tc2", "tc3", "schedule",
+    ]
+
+    def upsert_from_download_rows(
+        self, rows: list[dict[str, Any]], overwrite_times: bool = False
+    ) -> int:
         """Upsert audit rows directly from DownloadAttendanceService built rows.
 
         - Inserts if not exists.
         - Updates existing rows only when import_locked = 0.
+        - overwrite_times=False: giờ NULL không xóa giờ đã có; True: ghi đè cả 6 cột giờ
+          (rows là kết quả đầy đủ của (mã, ngày), vd dòng tổng hợp mọi máy).
         """
 
         if not rows:
             return 0
 
+        def _time_update(col: str) -> str:
+            new = f"VALUES({col})" if overwrite_times else f"COALESCE(VALUES({col}), {col})"
+            return f"{col} = IF(import_locked = 1, {col}, {new}), "
+
         query = (
             f"INSERT INTO {self.TABLE} ("
             "attendance_code, device_no, device_id, device_name, "
@@ -52,13 +77,11 @@ class AttendanceAuditRepository:
             "employee_code = IF(import_locked = 1, employee_code, VALUES(employee_code)), "
             "full_name = IF(import_locked = 1, full_name, VALUES(full_name)), "
             "weekday = IF(import_locked = 1, weekday, VALUES(weekday)), "
-            "in_1 = IF(import_locked = 1, in_1, COALESCE(VALUES(in_1), in_1)), "
-            "out_1 = IF(import_locked = 1, out_1, COALESCE(VALUES(out_1), out_1)), "
-            "in_2 = IF(import_locked = 1, in_2, COALESCE(VALUES(in_2), in_2)), "
-            "out_2 = IF(import_locked = 1, out_2, COALESCE(VALUES(out_2), out_2)), "
-            "in_3 = IF(import_locked = 1, in_3, COALESCE(VALUES(in_3), in_3)), "
-            "out_3 = IF(import_locked = 1, out_3, COALESCE(VALUES(out_3), out_3)), "
-            "device_id = IF(import_locked = 1, device_id, VALUES(device_id)), "
+            + "".join(
+                _time_update(col)
+                for col in ("in_1", "out_1", "in_2", "out_2", "in_3", "out_3")
+            )
+            + "device_id = IF(import_locked = 1, device_id, VALUES(device_id)), "
             "device_name = IF(import_locked = 1, device_name, VALUES(device_name))"
         )
 
@@ -144,6 +167,215 @@ class AttendanceAuditRepository:
             if cursor is not None:
                 cursor.close()
 
+    def replace_with_merged_rows(
+        self, rows: list[dict[str, Any]], merged_device_no: int = 0
+    ) -> int:
+        """Ghi dòng tổng hợp mọi máy (device_no = merged_device_no) và bỏ dòng riêng từng máy.
+
+        - Upsert rows như upsert_from_download_rows.
+        - Xóa dòng của máy khác cùng (attendance_code, work_date) nếu import_locked = 0.
+        - (mã, ngày) còn dòng đã import ở máy khác: giữ dòng import, xóa dòng tổng hợp.
+        Gọi trong Database.transaction() để không lộ trạng thái ghi dở.
+        """
+
+        if not rows:
+            return 0
+
+        keys = list(
+            dict.fromkeys(
+                (
+                    str(r.get("attendance_code") or "").strip(),
+                    str(r.get("work_date") or "").strip(),
+                )
+                for r in rows
+            )
+        )
+        in_sql = ",".join(["(%s,%s)"] * len(keys))
+        key_params: list[Any] = [v for k in keys for v in k]
+
+        written = self.upsert_from_download_rows(rows, overwrite_times=True)
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(
+                    f"DELETE FROM {self.TABLE} "
+                    "WHERE device_no <> %s AND import_locked = 0 "
+                    f"AND (attendance_code, work_date) IN ({in_sql})",
+                    (int(merged_device_no), *key_params),
+                )
+                cursor.execute(
+                    f"DELETE m FROM {self.TABLE} m "
+                    f"JOIN {self.TABLE} l "
+                    "  ON l.attendance_code = m.attendance_code "
+                    " AND l.work_date = m.work_date "
+                    " AND l.device_no <> m.device_no "
+                    " AND l.import_locked = 1 "
+                    "WHERE m.device_no = %s AND m.import_locked = 0 "
+                    f"AND (m.attendance_code, m.work_date) IN ({in_sql})",
+                    (int(merged_device_no), *key_params),
+                )
+                conn.commit()
+                return written
+        except Exception:
+            logger.exception("Lỗi replace_with_merged_rows")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def begin_bulk(self) -> None:
+        """Tạo (làm rỗng) bảng TEMPORARY tmp_audit_rows.
+
+        Gọi begin_bulk / stage_rows / merge_staged_rows trong cùng 1 Database.transaction()
+        (bảng TEMPORARY chỉ sống trong 1 kết nối).
+        """
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {self._TABLE_STAGE}")
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {self._TABLE_STAGE} ("
+                    "attendance_code VARCHAR(50) NOT NULL, "
+                    "name_on_mcc VARCHAR(255) NULL, "
+                    "work_date DATE NOT NULL, "
+                    "in_1 TIME NULL, out_1 TIME NULL, "
+                    "in_2 TIME NULL, out_2 TIME NULL, "
+                    "in_3 TIME NULL, out_3 TIME NULL, "
+                    "device_id INT NULL, "
+                    "device_name VARCHAR(255) NULL, "
+                    "KEY idx_tmp_audit_rows_code_date (attendance_code, work_date)"
+                    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+                )
+                conn.commit()
+        except Exception:
+            logger.exception("Lỗi begin_bulk attendance_audit")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def stage_rows(self, rows: list[dict[str, Any]]) -> int:
+        """Nạp dòng tổng hợp (cùng dạng rows của replace_with_merged_rows) vào tmp_audit_rows."""
+
+        params = [
+            (
+                str(r.get("attendance_code") or "").strip(),
+                str(r.get("name_on_mcc") or "").strip(),
+                str(r.get("work_date") or "").strip(),
+                r.get("time_in_1"),
+                r.get("time_out_1"),
+                r.get("time_in_2"),
+                r.get("time_out_2"),
+                r.get("time_in_3"),
+                r.get("time_out_3"),
+                (
+                    int(r.get("device_id") or 0)
+                    if r.get("device_id") is not None
+                    else None
+                ),
+                str(r.get("device_name") or ""),
+            )
+            for r in rows or []
+        ]
+        if not params:
+            return 0
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                loaded = Database.bulk_insert(
+                    cursor, self._TABLE_STAGE, self._STAGE_COLUMNS, params
+                )
+                conn.commit()
+                return loaded
+        except Exception:
+            logger.exception("Lỗi stage_rows attendance_audit")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def merge_staged_rows(self, merged_device_no: int = 0) -> int:
+        """Như replace_with_merged_rows cho toàn bộ tmp_audit_rows, mỗi bước 1 câu SQL.
+
+        Tra nhân viên + thứ trong tuần làm ở server; xong thì xóa bảng TEMPORARY.
+        Return số dòng tổng hợp đã nạp.
+        """
+
+        t = self.TABLE
+        lookup = (
+            "FROM hr_attendance.employees e "
+            "WHERE (e.mcc_code = s.attendance_code OR e.employee_code = s.attendance_code) LIMIT 1"
+        )
+        insert_query = (
+            f"INSERT INTO {t} ("
+            "attendance_code, device_no, device_id, device_name, "
+            "employee_id, employee_code, full_name, work_date, weekday, "
+            "in_1, out_1, in_2, out_2, in_3, out_3"
+            ") SELECT "
+            "s.attendance_code, %s, s.device_id, s.device_name, "
+            f"(SELECT e.id {lookup}), "
+            f"COALESCE((SELECT e.employee_code {lookup}), s.attendance_code), "
+            "COALESCE((SELECT COALESCE(NULLIF(e.full_name,''), NULLIF(e.name_on_mcc,'')) "
+            f"{lookup}), s.name_on_mcc, ''), "
+            "s.work_date, "
+            "ELT(WEEKDAY(s.work_date) + 1, "
+            "'Thứ 2', 'Thứ 3', 'Thứ 4', 'Thứ 5', 'Thứ 6', 'Thứ 7', 'Chủ nhật'), "
+            "s.in_1, s.out_1, s.in_2, s.out_2, s.in_3, s.out_3 "
+            f"FROM {self._TABLE_STAGE} s "
+            "ON DUPLICATE KEY UPDATE "
+            + "".join(
+                f"{col} = IF({t}.import_locked = 1, {t}.{col}, VALUES({col})), "
+                for col in (
+                    "employee_id", "employee_code", "full_name", "weekday",
+                    "in_1", "out_1", "in_2", "out_2", "in_3", "out_3", "device_id",
+                )
+            )
+            + f"device_name = IF({t}.import_locked = 1, {t}.device_name, VALUES(device_name))"
+        )
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(f"SELECT COUNT(*) FROM {self._TABLE_STAGE}")
+                row = cursor.fetchone()
+                staged = int(row[0] or 0) if row else 0
+                cursor.execute(insert_query, (int(merged_device_no),))
+                cursor.execute(
+                    f"DELETE a FROM {t} a "
+                    f"JOIN {self._TABLE_STAGE} s "
+                    "  ON s.attendance_code = a.attendance_code AND s.work_date = a.work_date "
+                    "WHERE a.device_no <> %s AND a.import_locked = 0",
+                    (int(merged_device_no),),
+                )
+                cursor.execute(
+                    f"DELETE m FROM {t} m "
+                    f"JOIN {self._TABLE_STAGE} s "
+                    "  ON s.attendance_code = m.attendance_code AND s.work_date = m.work_date "
+                    f"JOIN {t} l "
+                    "  ON l.attendance_code = m.attendance_code "
+                    " AND l.work_date = m.work_date "
+                    " AND l.device_no <> m.device_no "
+                    " AND l.import_locked = 1 "
+                    "WHERE m.device_no = %s AND m.import_locked = 0",
+                    (int(merged_device_no),),
+                )
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {self._TABLE_STAGE}")
+                conn.commit()
+                return staged
+        except Exception:
+            logger.exception("Lỗi merge_staged_rows attendance_audit")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
     def list_rows(
         self,
         *,
@@ -156,6 +388,35 @@ class AttendanceAuditRepository:
         department_id: int | None = None,
         title_id: int | None = None,
     ) -> list[dict[str, Any]]:
+        rows: list[dict[str, Any]] = []
+        for batch in self.iter_rows(
+            from_date=from_date,
+            to_date=to_date,
+            employee_id=employee_id,
+            attendance_code=attendance_code,
+            employee_ids=employee_ids,
+            attendance_codes=attendance_codes,
+            department_id=department_id,
+            title_id=title_id,
+        ):
+            rows.extend(batch)
+        return rows
+
+    def iter_rows(
+        self,
+        *,
+        from_date: str | None = None,
+        to_date: str | None = None,
+        employee_id: int | None = None,
+        attendance_code: str | None = None,
+        employee_ids: list[int] | None = None,
+        attendance_codes: list[str] | None = None,
+        department_id: int | None = None,
+        title_id: int | None = None,
+        batch_size: int = 2000,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Giống list_rows nhưng đọc theo lô (server-side cursor)."""
+
         where: list[str] = []
         params: list[Any] = []
 
@@ -214,9 +475,9 @@ class AttendanceAuditRepository:
 
         where_sql = (" WHERE " + " AND ".join(where)) if where else ""
 
-        query = (
+        base_query = (
             "SELECT "
-            "a.attendance_code, a.employee_code, a.full_name, a.work_date AS date, a.weekday, "
+            "a.id, a.attendance_code, a.employee_code, a.full_name, a.work_date AS date, a.weekday, "
             "a.in_1, a.out_1, a.in_2, a.out_2, a.in_3, a.out_3, "
             "a.late, a.early, a.hours, a.work, a.`leave`, a.hours_plus, a.work_plus, a.leave_plus, "
             "CASE "
@@ -236,110 +497,29 @@ class AttendanceAuditRepository:
             "), a.schedule) AS schedule "
             f"FROM {self.TABLE} a"
             f"{join_sql}"
-            f"{where_sql} "
-            "ORDER BY a.work_date ASC, a.employee_code ASC, a.id ASC"
+            f"{where_sql}"
         )
 
-        cursor = None
-        try:
-            with Database.connect() as conn:
-                cursor = Database.get_cursor(conn, dictionary=True)
-                if params:
-                    cursor.execute(query, tuple(params))
-                else:
-                    cursor.execute(query)
-                return list(cursor.fetchall() or [])
-        except Exception:
-            logger.exception("Lỗi list attendance_audit")
-            raise
-        finally:
-            if cursor is not None:
-                cursor.close()
-
-    def sync_from_attendance_raw(
-        self,
-        *,
-        from_date: str,
-        to_date: str,
-        device_no: int | None = None,
-    ) -> int:
-        """Copy attendance_raw -> attendance_audit for a date range (optionally 1 device).
-
-        Idempotent: uses INSERT .. ON DUPLICATE KEY UPDATE based on
-        (attendance_code, work_date, device_no).
-        """
-
-        where: list[str] = ["ar.work_date >= %s", "ar.work_date <= %s"]
-        params: list[Any] = [str(from_date), str(to_date)]
-        if device_no is not None:
-            where.append("ar.device_no = %s")
-            params.append(int(device_no))
-        where_sql = " AND ".join(where)
-
-        # Vietnamese weekday label
-        weekday_case = (
-            "CASE DAYOFWEEK(ar.work_date) "
-            "WHEN 1 THEN 'Chủ nhật' "
-            "WHEN 2 THEN 'Thứ 2' "
-            "WHEN 3 THEN 'Thứ 3' "
-            "WHEN 4 THEN 'Thứ 4' "
-            "WHEN 5 THEN 'Thứ 5' "
-            "WHEN 6 THEN 'Thứ 6' "
-            "WHEN 7 THEN 'Thứ 7' "
-            "END"
+        # Ngày không chấm công: sinh lúc truy vấn từ calendar_days (không lưu dòng rỗng)
+        absent_query, absent_params = CalendarRepository.absent_audit_rows_sql(
+            self._ROW_COLUMNS,
+            from_date=from_date,
+            to_date=to_date,
+            employee_ids=ids,
+            attendance_codes=codes,
+            department_id=department_id,
+            title_id=title_id,
         )
-
         query = (
-            f"INSERT INTO {self.TABLE} ("
-            "attendance_code, device_no, device_id, device_name, "
-            "employee_id, employee_code, full_name, work_date, weekday, "
-            "schedule, "
-            "in_1, out_1, in_2, out_2, in_3, out_3, "
-            "late, early, hours, work, `leave`, hours_plus, work_plus, leave_plus, "
-            "tc1, tc2, tc3"
-            ") "
-            "SELECT "
-            "ar.attendance_code, ar.device_no, ar.device_id, ar.device_name, "
-            "e.id AS employee_id, "
-            "COALESCE(e.employee_code, ar.attendance_code) AS employee_code, "
-            "COALESCE(NULLIF(e.full_name,''), NULLIF(e.name_on_mcc,''), NULLIF(ar.name_on_mcc,''), '') AS full_name, "
-            "ar.work_date, "
-            f"{weekday_case} AS weekday, "
-            "NULL AS schedule, "
-            "ar.time_in_1, ar.time_out_1, ar.time_in_2, ar.time_out_2, ar.time_in_3, ar.time_out_3, "
-            "NULL AS late, NULL AS early, "
-            "NULL AS hours, NULL AS work, NULL AS `leave`, "
-            "NULL AS hours_plus, NULL AS work_plus, NULL AS leave_plus, "
-            "NULL AS tc1, NULL AS tc2, NULL AS tc3 "
-            "FROM hr_attendance.attendance_raw ar "
-            "LEFT JOIN hr_attendance.employees e "
-            "  ON (e.mcc_code = ar.attendance_code OR e.employee_code = ar.attendance_code) "
-            f"WHERE {where_sql} "
-            "ON DUPLICATE KEY UPDATE "
-            "employee_id = IF(import_locked = 1, employee_id, VALUES(employee_id)), "
-            "employee_code = IF(import_locked = 1, employee_code, VALUES(employee_code)), "
-            "full_name = IF(import_locked = 1, full_name, VALUES(full_name)), "
-            "weekday = IF(import_locked = 1, weekday, VALUES(weekday)), "
-            "in_1 = IF(import_locked = 1, in_1, VALUES(in_1)), "
-            "out_1 = IF(import_locked = 1, out_1, VALUES(out_1)), "
-            "in_2 = IF(import_locked = 1, in_2, VALUES(in_2)), "
-            "out_2 = IF(import_locked = 1, out_2, VALUES(out_2)), "
-            "in_3 = IF(import_locked = 1, in_3, VALUES(in_3)), "
-            "out_3 = IF(import_locked = 1, out_3, VALUES(out_3)), "
-            "device_id = IF(import_locked = 1, device_id, VALUES(device_id)), "
-            "device_name = IF(import_locked = 1, device_name, VALUES(device_name))"
+            f"SELECT * FROM ({base_query} UNION ALL {absent_query}) u "
+            "ORDER BY u.`date` ASC, u.employee_code ASC, u.id ASC"
         )
+        params.extend(absent_params)
 
-        cursor = None
         try:
-            with Database.connect() as conn:
-                cursor = Database.get_cursor(conn, dictionary=False)
-                cursor.execute(query, tuple(params))
-                conn.commit()
-                return int(cursor.rowcount or 0)
+            yield from Database.stream_query(
+                query, tuple(params) if params else None, batch_size=batch_size
+            )
         except Exception:
-            logger.exception("Lỗi sync attendance_raw -> attendance_audit")
+            logger.exception("Lỗi list attendance_audit")
             raise
-        finally:
-            if cursor is not None:
-                cursor.close()
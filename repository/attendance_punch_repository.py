@@ -0,0 +1,137 @@
+"""repository.attendance_punch_repository
+
+SQL cho bảng attendance_punches (từng lượt chấm, chỉ ghi thêm).
+
+Ghi chú:
+- Mỗi dòng = 1 lượt chấm (attendance_code, punched_at, device_no).
+- INSERT IGNORE theo unique key để tải/import lặp lại không sinh bản trùng.
+- Tải lượng lớn: bulk_insert_punches nạp thẳng bằng Database.bulk_insert
+  (LOAD DATA LOCAL INFILE hoặc INSERT IGNORE nhiều dòng).
+- Các bảng 6 cột giờ (attendance_raw, attendance_audit) được dựng lại từ bảng này ở service.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any, Iterator
+
+from core.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+
+class AttendancePunchRepository:
+    _TABLE = "attendance_punches"
+    _COLUMNS = ["attendance_code", "punched_at", "device_no", "device_id"]
+
+    def insert_punches(self, rows: list[dict[str, Any]]) -> int:
+        """rows: [{attendance_code, punched_at, device_no, device_id}]"""
+
+        if not rows:
+            return 0
+
+        query = (
+            f"INSERT IGNORE INTO {self._TABLE} "
+            "(attendance_code, punched_at, device_no, device_id) "
+            "VALUES (%s, %s, %s, %s)"
+        )
+
+        params = self._punch_params(rows)
+        if not params:
+            return 0
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.executemany(query, params)
+                conn.commit()
+                return int(cursor.rowcount)
+        except Exception:
+            logger.exception("Lỗi insert_punches")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def bulk_insert_punches(self, rows: list[dict[str, Any]]) -> int:
+        """Như insert_punches nhưng nạp theo khối lớn (Database.bulk_insert)."""
+
+        params = self._punch_params(rows or [])
+        if not params:
+            return 0
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                loaded = Database.bulk_insert(cursor, self._TABLE, self._COLUMNS, params)
+                conn.commit()
+                return loaded
+        except Exception:
+            logger.exception("Lỗi bulk_insert_punches")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    @staticmethod
+    def _punch_params(rows: list[dict[str, Any]]) -> list[tuple[Any, ...]]:
+        params: list[tuple[Any, ...]] = []
+        for r in rows:
+            code = str(r.get("attendance_code") or "").strip()
+            punched_at = r.get("punched_at")
+            if not code or punched_at is None:
+                continue
+            params.append(
+                (
+                    code,
+                    punched_at,
+                    int(r.get("device_no") or 0),
+                    (
+                        int(r.get("device_id") or 0)
+                        if r.get("device_id") is not None
+                        else None
+                    ),
+                )
+            )
+        return params
+
+    def iter_punches(
+        self,
+        *,
+        from_dt: datetime,
+        to_dt: datetime,
+        device_no: int | None = None,
+        attendance_codes: list[str] | None = None,
+        batch_size: int = 5000,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Đọc lượt chấm trong [from_dt, to_dt] theo lô, sắp theo (mã, máy, thời điểm)."""
+
+        where: list[str] = ["punched_at >= %s", "punched_at <= %s"]
+        params: list[Any] = [from_dt, to_dt]
+
+        if device_no is not None:
+            where.append("device_no = %s")
+            params.append(int(device_no))
+
+        codes = [str(c or "").strip() for c in (attendance_codes or [])]
+        codes = list(dict.fromkeys(c for c in codes if c))
+        if codes:
+            where.append("attendance_code IN (" + ",".join(["%s"] * len(codes)) + ")")
+            params.extend(codes)
+
+        query = (
+            "SELECT attendance_code, punched_at, device_no, device_id "
+            f"FROM {self._TABLE} "
+            "WHERE " + " AND ".join(where) + " "
+            "ORDER BY attendance_code ASC, device_no ASC, punched_at ASC"
+        )
+
+        try:
+            yield from Database.stream_query(query, tuple(params), batch_size=batch_size)
+        except Exception:
+            logger.exception("Lỗi iter_punches")
+            raise
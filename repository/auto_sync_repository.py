@@ -0,0 +1,45 @@
+"""repository.auto_sync_repository
+
+Lưu cấu hình tự động tải dữ liệu chấm công chạy nền:
+- bật/tắt, chu kỳ (phút)
+- khung giờ nghỉ (không tải)
+- số ngày lùi lại khi tải
+- live_capture: nhận lượt chấm trực tiếp thay cho tải định kỳ
+- punch_debounce_seconds: gộp lượt quẹt lặp khi tổng hợp attendance_audit
+- log_rotation_*: xóa log trên máy sau khi đã lưu đủ (DeviceLogRotationService)
+
+Lưu ra JSON trong database/.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+from core.resource import resource_path
+
+
+class AutoSyncRepository:
+    def __init__(self, settings_file: str | None = None) -> None:
+        self._path = (
+            Path(settings_file)
+            if settings_file
+            else Path(resource_path("database/auto_sync_settings.json"))
+        )
+
+    def load_settings(self) -> dict[str, Any]:
+        try:
+            if not self._path.exists():
+                return {}
+            raw = self._path.read_text(encoding="utf-8")
+            data = json.loads(raw) if raw.strip() else {}
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+
+    def save_settings(self, data: dict[str, Any]) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._path.write_text(
+            json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
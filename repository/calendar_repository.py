@@ -0,0 +1,134 @@
+"""repository.calendar_repository
+
+SQL dựng sẵn cho bảng lịch calendar_days (1 dòng / ngày, 2000-01-01..2099-12-31).
+
+Ngày "không chấm công" không còn được ghi thành dòng rỗng vào download_attendance,
+attendance_raw hay attendance_audit. Chúng được sinh lúc truy vấn:
+calendar_days x danh sách mã chấm công, bỏ các (mã, ngày) đã có dòng thật.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+
+class CalendarRepository:
+    TABLE = "calendar_days"
+
+    # Nhãn thứ giống AttendanceAuditRepository (WEEKDAY: 0=Thứ 2 .. 6=Chủ nhật)
+    @staticmethod
+    def weekday_label_sql(col: str) -> str:
+        return (
+            f"ELT(WEEKDAY({col}) + 1, "
+            "'Thứ 2', 'Thứ 3', 'Thứ 4', 'Thứ 5', 'Thứ 6', 'Thứ 7', 'Chủ nhật')"
+        )
+
+    @classmethod
+    def absent_audit_rows_sql(
+        cls,
+        columns: list[str],
+        *,
+        from_date: str | None = None,
+        to_date: str | None = None,
+        employee_ids: list[int] | None = None,
+        attendance_codes: list[str] | None = None,
+        department_id: int | None = None,
+        title_id: int | None = None,
+    ) -> tuple[str, list[Any]]:
+        """SELECT các dòng ảo (không chấm công) để UNION ALL với SELECT attendance_audit.
+
+        columns: tên cột (alias) theo đúng thứ tự SELECT bên attendance_audit; cột giờ/công
+        của dòng ảo là NULL.
+        Khoảng ngày sinh = ngày nhỏ nhất..lớn nhất đã có dữ liệu trong from_date..to_date
+        (không sinh cho khoảng chưa tải). Danh sách mã = employees.mcc_code + mã có dữ liệu.
+        """
+
+        range_where: list[str] = []
+        range_params: list[Any] = []
+        if from_date:
+            range_where.append("work_date >= %s")
+            range_params.append(str(from_date))
+        if to_date:
+            range_where.append("work_date <= %s")
+            range_params.append(str(to_date))
+        range_sql = (" WHERE " + " AND ".join(range_where)) if range_where else ""
+
+        exprs: dict[str, str] = {
+            "attendance_code": "r.attendance_code",
+            "employee_code": "COALESCE(e.employee_code, r.attendance_code)",
+            "full_name": "COALESCE(NULLIF(e.full_name, ''), NULLIF(e.name_on_mcc, ''), '')",
+            "date": "c.day",
+            "weekday": cls.weekday_label_sql("c.day"),
+            "schedule": (
+                "("
+                "  SELECT s.schedule_name "
+                "  FROM hr_attendance.employee_schedule_assignments esa "
+                "  JOIN hr_attendance.arrange_schedules s ON s.id = esa.schedule_id "
+                "  WHERE esa.employee_id = e.id "
+                "    AND esa.effective_from <= c.day "
+                "    AND (esa.effective_to IS NULL OR esa.effective_to >= c.day) "
+                "  ORDER BY esa.effective_from DESC, esa.id DESC "
+                "  LIMIT 1"
+                ")"
+            ),
+        }
+        select_sql = ", ".join(
+            f"{exprs.get(name, 'NULL')} AS `{name}`" for name in columns
+        )
+
+        where: list[str] = [
+            "NOT EXISTS ("
+            "  SELECT 1 FROM hr_attendance.attendance_audit x "
+            "  WHERE x.attendance_code = r.attendance_code AND x.work_date = c.day"
+            ")"
+        ]
+        params: list[Any] = [*range_params, *range_params]
+
+        ids = list(employee_ids or [])
+        codes = list(attendance_codes or [])
+        if ids or codes:
+            parts: list[str] = []
+            if ids:
+                parts.append("e.id IN (" + ",".join(["%s"] * len(ids)) + ")")
+                params.extend(ids)
+            if codes:
+                parts.append(
+                    "r.attendance_code IN (" + ",".join(["%s"] * len(codes)) + ")"
+                )
+                params.extend(codes)
+            where.append("(" + " OR ".join(parts) + ")")
+        if department_id is not None:
+            where.append("e.department_id = %s")
+            params.append(int(department_id))
+        if title_id is not None:
+            where.append("e.title_id = %s")
+            params.append(int(title_id))
+
+        query = (
+            f"SELECT {select_sql} "
+            f"FROM hr_attendance.{cls.TABLE} c "
+            "JOIN ("
+            "  SELECT MIN(work_date) AS lo, MAX(work_date) AS hi "
+            f"  FROM hr_attendance.attendance_audit{range_sql}"
+            ") b ON c.day BETWEEN b.lo AND b.hi "
+            "JOIN ("
+            "  SELECT mcc_code AS attendance_code FROM hr_attendance.employees "
+            "  WHERE mcc_code IS NOT NULL AND mcc_code <> '' "
+            "  UNION "
+            f"  SELECT DISTINCT attendance_code FROM hr_attendance.attendance_audit{range_sql}"
+            ") r "
+            # mã -> nhân viên (id nhỏ nhất khớp mcc_code hoặc employee_code): gom 1 lần rồi
+            # join, không tra employees theo OR cho từng dòng ảo
+            "LEFT JOIN ("
+            "  SELECT m.code, MIN(m.id) AS employee_id FROM ("
+            "    SELECT mcc_code AS code, id FROM hr_attendance.employees "
+            "    WHERE mcc_code IS NOT NULL "
+            "    UNION ALL "
+            "    SELECT employee_code AS code, id FROM hr_attendance.employees "
+            "    WHERE employee_code IS NOT NULL"
+            "  ) m GROUP BY m.code"
+            ") em ON em.code = r.attendance_code "
+            "LEFT JOIN hr_attendance.employees e ON e.id = em.employee_id "
+            "WHERE " + " AND ".join(where)
+        )
+        return query, params
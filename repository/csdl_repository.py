@@ -71,7 +71,19 @@ class CSDLRepository:
 
     def save(self, config: CSDLConfig) -> None:
         self._path.parent.mkdir(parents=True, exist_ok=True)
-        data: dict[str, Any] = asdict(config)
+        data: dict[str, Any] = {}
+
+        # Giữ lại các khối cấu hình khác trong file (vd "pool")
+        try:
+            if self._path.exists():
+                raw = self._path.read_text(encoding="utf-8")
+                existing = json.loads(raw) if raw.strip() else {}
+                if isinstance(existing, dict):
+                    data.update(existing)
+        except Exception:
+            pass
+
+        data.update(asdict(config))
         self._path.write_text(
             json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
         )
@@ -27,34 +27,12 @@ class DeclareWorkShiftRepository:
             "FROM work_shifts ORDER BY id ASC"
         )
 
-        query_legacy = (
-            "SELECT id, shift_code, time_in, time_out, lunch_start, lunch_end, "
-            "total_minutes, work_count, in_window_start, in_window_end, "
-            "out_window_start, out_window_end "
-            "FROM work_shifts ORDER BY id ASC"
-        )
-
         cursor = None
         try:
             with Database.connect() as conn:
                 cursor = Database.get_cursor(conn, dictionary=True)
-                try:
-                    cursor.execute(query)
-                    rows = list(cursor.fetchall() or [])
-                except Exception as exc:
-                    msg = str(exc)
-                    if "overtime_round_minutes" in msg and "Unknown column" in msg:
-                        cursor.execute(query_legacy)
-                        rows = list(cursor.fetchall() or [])
-                    else:
-                        raise
-
-                for r in rows:
-                    try:
-                        r.setdefault("overtime_round_minutes", 0)
-                    except Exception:
-                        pass
-                return rows
+                cursor.execute(query)
+                return list(cursor.fetchall() or [])
         except Exception:
             logger.exception("Lỗi list_work_shifts")
             raise
@@ -70,34 +48,12 @@ class DeclareWorkShiftRepository:
             "FROM work_shifts WHERE id = %s LIMIT 1"
         )
 
-        query_legacy = (
-            "SELECT id, shift_code, time_in, time_out, lunch_start, lunch_end, "
-            "total_minutes, work_count, in_window_start, in_window_end, "
-            "out_window_start, out_window_end "
-            "FROM work_shifts WHERE id = %s LIMIT 1"
-        )
-
         cursor = None
         try:
             with Database.connect() as conn:
                 cursor = Database.get_cursor(conn, dictionary=True)
-                try:
-                    cursor.execute(query, (int(shift_id),))
-                    row = cursor.fetchone()
-                except Exception as exc:
-                    msg = str(exc)
-                    if "overtime_round_minutes" in msg and "Unknown column" in msg:
-                        cursor.execute(query_legacy, (int(shift_id),))
-                        row = cursor.fetchone()
-                    else:
-                        raise
-
-                if row is not None:
-                    try:
-                        row.setdefault("overtime_round_minutes", 0)
-                    except Exception:
-                        pass
-                return row
+                cursor.execute(query, (int(shift_id),))
+                return cursor.fetchone()
         except Exception:
             logger.exception("Lỗi get_work_shift")
             raise
@@ -0,0 +1,83 @@
+"""repository.device_log_rotation_repository
+
+SQL cho bảng device_log_rotations (lịch sử xóa log chấm công trên máy).
+
+Ghi chú:
+- Repository chỉ làm SQL thuần; điều kiện/đối chiếu trước khi xóa log nằm ở service.
+- Bảng (MySQL):
+    device_log_rotations(
+        id BIGINT PRIMARY KEY,
+        device_id INT, device_no INT,
+        record_count INT,            -- số bản ghi trên máy lúc xóa
+        punch_count INT,             -- số lượt chấm khác nhau đã đối chiếu với attendance_punches
+        first_record_time DATETIME, last_record_time DATETIME,
+        checksum CHAR(40),           -- sha1 các lượt chấm đã lưu
+        rotated_at DATETIME
+    )
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from core.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceLogRotationRepository:
+    _TABLE = "device_log_rotations"
+
+    def insert_rotation(self, row: dict[str, Any]) -> int:
+        query = (
+            f"INSERT INTO {self._TABLE} ("
+            "device_id, device_no, record_count, punch_count, "
+            "first_record_time, last_record_time, checksum, rotated_at"
+            ") VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())"
+        )
+        params = (
+            int(row["device_id"]) if row.get("device_id") is not None else None,
+            int(row.get("device_no") or 0),
+            int(row.get("record_count") or 0),
+            int(row.get("punch_count") or 0),
+            row.get("first_record_time"),
+            row.get("last_record_time"),
+            str(row.get("checksum") or ""),
+        )
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(query, params)
+                conn.commit()
+                return int(cursor.lastrowid or 0)
+        except Exception:
+            logger.exception("Lỗi insert_rotation")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def list_rotations(self, device_id: int, limit: int = 50) -> list[dict[str, Any]]:
+        query = (
+            "SELECT id, device_id, device_no, record_count, punch_count, "
+            "first_record_time, last_record_time, checksum, rotated_at "
+            f"FROM {self._TABLE} WHERE device_id = %s "
+            "ORDER BY rotated_at DESC, id DESC LIMIT %s"
+        )
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=True)
+                cursor.execute(query, (int(device_id), int(limit)))
+                return list(cursor.fetchall() or [])
+        except Exception:
+            logger.exception("Lỗi list_rotations")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
@@ -9,6 +9,7 @@ Ghi chú:
         id INT AUTO_INCREMENT PRIMARY KEY,
         device_no INT,
         device_name VARCHAR(255),
+        device_type VARCHAR(30),
         ip_address VARCHAR(50),
         password VARCHAR(50),
         port INT
@@ -27,47 +28,7 @@ logger = logging.getLogger(__name__)
 
 
 class DeviceRepository:
-    _schema_checked: bool = False
-    _has_device_type: bool = False
-
-    def ensure_schema(self) -> None:
-        """Ensure devices.device_type exists.
-
-        device_type dùng để chọn đúng module/driver khi có nhiều dòng máy.
-        """
-
-        if DeviceRepository._schema_checked:
-            return
-
-        try:
-            with Database.connect() as conn:
-                cursor = Database.get_cursor(conn, dictionary=True)
-                cursor.execute(
-                    """
-                    SELECT COLUMN_NAME
-                    FROM INFORMATION_SCHEMA.COLUMNS
-                    WHERE TABLE_SCHEMA = DATABASE()
-                      AND TABLE_NAME = 'devices'
-                      AND COLUMN_NAME = 'device_type'
-                    """
-                )
-                DeviceRepository._has_device_type = bool(cursor.fetchone())
-
-                if not DeviceRepository._has_device_type:
-                    cur2 = Database.get_cursor(conn, dictionary=False)
-                    cur2.execute(
-                        "ALTER TABLE devices ADD COLUMN device_type VARCHAR(30) NULL AFTER device_name"
-                    )
-                    conn.commit()
-                    DeviceRepository._has_device_type = True
-        except Exception:
-            # Nếu thiếu quyền INFORMATION_SCHEMA/ALTER, vẫn cho app chạy
-            DeviceRepository._has_device_type = False
-
-        DeviceRepository._schema_checked = True
-
     def list_devices(self) -> list[dict[str, Any]]:
-        self.ensure_schema()
         query = (
             "SELECT id, device_no, device_name, device_type, ip_address, password, port "
             "FROM devices ORDER BY id ASC"
@@ -87,7 +48,6 @@ class DeviceRepository:
                 cursor.close()
 
     def get_device(self, device_id: int) -> dict[str, Any] | None:
-        self.ensure_schema()
         query = (
             "SELECT id, device_no, device_name, device_type, ip_address, password, port "
             "FROM devices WHERE id = %s LIMIT 1"
@@ -115,7 +75,6 @@ class DeviceRepository:
         password: str,
         port: int,
     ) -> int:
-        self.ensure_schema()
         query = (
             "INSERT INTO devices (device_no, device_name, device_type, ip_address, password, port) "
             "VALUES (%s, %s, %s, %s, %s, %s)"
@@ -155,7 +114,6 @@ class DeviceRepository:
         password: str,
         port: int,
     ) -> int:
-        self.ensure_schema()
         query = (
             "UPDATE devices SET device_no = %s, device_name = %s, device_type = %s, ip_address = %s, "
             "password = %s, port = %s WHERE id = %s"
@@ -0,0 +1,91 @@
+"""repository.device_sync_state_repository
+
+SQL cho bảng device_sync_state (mốc đồng bộ log chấm công theo từng máy).
+
+Ghi chú:
+- Repository chỉ làm SQL thuần; quyết định tải tăng dần/toàn bộ nằm ở service.
+- Bảng (MySQL):
+    device_sync_state(
+        device_id INT PRIMARY KEY,
+        last_serial INT,            -- số bản ghi đầu log đã xử lý xong
+        last_record_time DATETIME,  -- giờ chấm của bản ghi thứ last_serial (dùng đối chiếu)
+        record_count INT,           -- tổng số bản ghi trên máy lúc đồng bộ
+        covered_from DATE,          -- ngày bắt đầu vùng dữ liệu đã đồng bộ
+        synced_at DATETIME
+    )
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from core.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceSyncStateRepository:
+    _TABLE = "device_sync_state"
+
+    def get_state(self, device_id: int) -> dict[str, Any] | None:
+        query = (
+            "SELECT device_id, last_serial, last_record_time, record_count, covered_from, synced_at "
+            f"FROM {self._TABLE} WHERE device_id = %s LIMIT 1"
+        )
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=True)
+                cursor.execute(query, (int(device_id),))
+                return cursor.fetchone()
+        except Exception:
+            logger.exception("Lỗi get_state")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def upsert_states(self, states: list[dict[str, Any]]) -> int:
+        if not states:
+            return 0
+
+        query = (
+            f"INSERT INTO {self._TABLE} ("
+            "device_id, last_serial, last_record_time, record_count, covered_from, synced_at"
+            ") VALUES (%s, %s, %s, %s, %s, NOW()) "
+            "ON DUPLICATE KEY UPDATE "
+            "last_serial = VALUES(last_serial), "
+            "last_record_time = VALUES(last_record_time), "
+            "record_count = VALUES(record_count), "
+            "covered_from = VALUES(covered_from), "
+            "synced_at = VALUES(synced_at)"
+        )
+
+        params: list[tuple[Any, ...]] = []
+        for s in states:
+            params.append(
+                (
+                    int(s.get("device_id") or 0),
+                    int(s.get("last_serial") or 0),
+                    s.get("last_record_time"),
+                    int(s.get("record_count") or 0),
+                    s.get("covered_from"),
+                )
+            )
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.executemany(query, params)
+                conn.commit()
+                return int(cursor.rowcount)
+        except Exception:
+            logger.exception("Lỗi upsert_states")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
@@ -0,0 +1,133 @@
+"""repository.device_user_repository
+
+SQL cho danh sách user trên từng máy chấm công (device_users) và dấu vân tay
+của danh sách đó (device_rosters).
+
+Ghi chú:
+- Repository chỉ làm SQL thuần; quyết định khi nào tải lại danh sách nằm ở service.
+- Bảng (MySQL):
+    device_rosters(
+        device_id INT PRIMARY KEY,
+        user_count INT,          -- số user trên máy lúc lưu (read_sizes, so sánh rẻ)
+        fingerprint CHAR(40),    -- sha1 của (user_id, tên) đã sắp xếp
+        synced_at DATETIME
+    )
+    device_users(
+        device_id INT, user_id VARCHAR(50), name VARCHAR(255),
+        PRIMARY KEY (device_id, user_id)
+    )
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from core.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceUserRepository:
+    _TABLE = "device_users"
+    _TABLE_ROSTER = "device_rosters"
+
+    def get_roster(self, device_id: int) -> dict[str, Any] | None:
+        """Return {device_id, user_count, fingerprint, synced_at, users: {user_id: name}} hoặc None."""
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=True)
+                cursor.execute(
+                    "SELECT device_id, user_count, fingerprint, synced_at "
+                    f"FROM {self._TABLE_ROSTER} WHERE device_id = %s LIMIT 1",
+                    (int(device_id),),
+                )
+                roster = cursor.fetchone()
+                if not roster:
+                    return None
+                cursor.execute(
+                    f"SELECT user_id, name FROM {self._TABLE} WHERE device_id = %s",
+                    (int(device_id),),
+                )
+                roster["users"] = {
+                    str(r.get("user_id") or ""): str(r.get("name") or "")
+                    for r in cursor.fetchall() or []
+                }
+                return roster
+        except Exception:
+            logger.exception("Lỗi get_roster")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def replace_roster(
+        self,
+        device_id: int,
+        user_count: int,
+        fingerprint: str,
+        users: dict[str, str],
+    ) -> int:
+        """Ghi đè danh sách user của 1 máy (gọi trong Database.transaction() để không ghi dở)."""
+
+        params = [
+            (int(device_id), str(uid), str(name or ""))
+            for uid, name in (users or {}).items()
+            if str(uid or "").strip()
+        ]
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(
+                    f"DELETE FROM {self._TABLE} WHERE device_id = %s", (int(device_id),)
+                )
+                if params:
+                    cursor.executemany(
+                        f"INSERT INTO {self._TABLE} (device_id, user_id, name) "
+                        "VALUES (%s, %s, %s)",
+                        params,
+                    )
+                cursor.execute(
+                    f"INSERT INTO {self._TABLE_ROSTER} "
+                    "(device_id, user_count, fingerprint, synced_at) "
+                    "VALUES (%s, %s, %s, NOW()) "
+                    "ON DUPLICATE KEY UPDATE "
+                    "user_count = VALUES(user_count), "
+                    "fingerprint = VALUES(fingerprint), "
+                    "synced_at = VALUES(synced_at)",
+                    (int(device_id), int(user_count), str(fingerprint)),
+                )
+                conn.commit()
+                return len(params)
+        except Exception:
+            logger.exception("Lỗi replace_roster")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def touch_roster(self, device_id: int, user_count: int) -> int:
+        """Danh sách không đổi: chỉ cập nhật user_count + synced_at."""
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(
+                    f"UPDATE {self._TABLE_ROSTER} SET user_count = %s, synced_at = NOW() "
+                    "WHERE device_id = %s",
+                    (int(user_count), int(device_id)),
+                )
+                conn.commit()
+                return int(cursor.rowcount)
+        except Exception:
+            logger.exception("Lỗi touch_roster")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
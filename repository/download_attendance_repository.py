@@ -8,7 +8,10 @@ Yêu cầu nghiệp vụ:
 - Sau khi tải, ghi vào download_attendance
 - Đồng thời sao chép (upsert) vào attendance_raw
 - Nếu trùng các trường khóa (attendance_code, work_date, device_no) thì ghi đè để tránh clone
+  (tên trên máy rỗng thì giữ tên đã lưu)
 - download_attendance sẽ được xóa khi đóng phần mềm (handled ở service/controller)
+- Tải lượng lớn: nạp dòng vào bảng TEMPORARY tmp_download_rows (Database.bulk_insert)
+  rồi gộp vào 2 bảng bằng INSERT ... SELECT (begin_bulk / stage_rows / merge_staged_rows)
 """
 
 from __future__ import annotations
@@ -17,6 +20,7 @@ import logging
 from typing import Any
 
 from core.database import Database
+from repository.calendar_repository import CalendarRepository
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +29,12 @@ logger = logging.getLogger(__name__)
 class DownloadAttendanceRepository:
     _TABLE_TEMP = "download_attendance"
     _TABLE_RAW = "attendance_raw"
+    _TABLE_STAGE = "tmp_download_rows"
+    _COLUMNS = [
+        "attendance_code", "name_on_mcc", "work_date",
+        "time_in_1", "time_out_1", "time_in_2", "time_out_2", "time_in_3", "time_out_3",
+        "device_no", "device_id", "device_name",
+    ]
 
     def list_download_attendance(
         self,
@@ -32,6 +42,14 @@ class DownloadAttendanceRepository:
         to_date: str | None = None,
         device_no: int | None = None,
     ) -> list[dict[str, Any]]:
+        """Đọc bảng tạm; có đủ from_date + to_date thì kèm dòng ảo cho ngày không chấm công.
+
+        Tên trên máy lấy từ device_users (danh sách user đã lưu của máy) khi dòng không có tên.
+        Dòng ảo = calendar_days x mã chấm công (mã có trong bảng tạm + user của máy trong
+        device_users), bỏ các (mã, ngày) đã có dòng thật. Chỉ sinh khi bảng tạm có dữ liệu
+        trong phạm vi.
+        """
+
         where: list[str] = []
         params: list[Any] = []
 
@@ -47,18 +65,64 @@ class DownloadAttendanceRepository:
 
         where_sql = (" WHERE " + " AND ".join(where)) if where else ""
 
-        query = (
+        base_query = (
             "SELECT "
             "t.attendance_code, "
-            "COALESCE(t.name_on_mcc, e.name_on_mcc, e.full_name, '') AS name_on_mcc, "
+            "COALESCE(NULLIF(t.name_on_mcc, ''), du.name, '') AS name_on_mcc, "
             "t.work_date, t.time_in_1, t.time_out_1, t.time_in_2, t.time_out_2, t.time_in_3, t.time_out_3, "
             "t.device_name "
             f"FROM {self._TABLE_TEMP} t "
-            "LEFT JOIN employees e ON (e.mcc_code = t.attendance_code OR e.employee_code = t.attendance_code) "
-            f"{where_sql} "
-            "ORDER BY t.work_date ASC, t.attendance_code ASC"
+            "LEFT JOIN device_users du "
+            "  ON du.device_id = t.device_id AND du.user_id = t.attendance_code"
+            f"{where_sql}"
         )
 
+        if from_date and to_date:
+            scope_sql = f"FROM {self._TABLE_TEMP}{where_sql}"
+            roster_device_sql = " WHERE d.device_no = %s" if device_no is not None else ""
+            absent_query = (
+                "SELECT "
+                "r.attendance_code, "
+                "COALESCE(r.name_on_mcc, '') AS name_on_mcc, "
+                "c.day AS work_date, "
+                "NULL, NULL, NULL, NULL, NULL, NULL, "
+                "COALESCE(r.device_name, '') AS device_name "
+                f"FROM {CalendarRepository.TABLE} c "
+                "JOIN ("
+                "  SELECT attendance_code, MAX(name_on_mcc) AS name_on_mcc, "
+                "    MAX(device_name) AS device_name "
+                "  FROM ("
+                "    SELECT attendance_code, NULLIF(name_on_mcc, '') AS name_on_mcc, device_name "
+                f"    {scope_sql} "
+                "    UNION ALL "
+                "    SELECT du.user_id, NULLIF(du.name, ''), d.device_name "
+                "    FROM device_users du JOIN devices d ON d.id = du.device_id"
+                f"{roster_device_sql}"
+                "  ) x GROUP BY attendance_code"
+                ") r "
+                "WHERE c.day >= %s AND c.day <= %s "
+                f"AND EXISTS (SELECT 1 {scope_sql}) "
+                "AND NOT EXISTS ("
+                f"  SELECT 1 FROM {self._TABLE_TEMP} t2 "
+                "  WHERE t2.attendance_code = r.attendance_code AND t2.work_date = c.day"
+                + (" AND t2.device_no = %s" if device_no is not None else "")
+                + ")"
+            )
+            absent_params: list[Any] = [*params]
+            if device_no is not None:
+                absent_params.append(int(device_no))
+            absent_params.extend([str(from_date), str(to_date), *params])
+            if device_no is not None:
+                absent_params.append(int(device_no))
+
+            query = (
+                f"SELECT * FROM ({base_query} UNION ALL {absent_query}) u "
+                "ORDER BY u.work_date ASC, u.attendance_code ASC"
+            )
+            params = [*params, *absent_params]
+        else:
+            query = f"{base_query} ORDER BY t.work_date ASC, t.attendance_code ASC"
+
         cursor = None
         try:
             with Database.connect() as conn:
@@ -97,11 +161,48 @@ class DownloadAttendanceRepository:
     def upsert_attendance_raw(self, rows: list[dict[str, Any]]) -> int:
         return self._upsert_many(self._TABLE_RAW, rows)
 
-    def insert_ignore_download_attendance(self, rows: list[dict[str, Any]]) -> int:
-        return self._insert_ignore_many(self._TABLE_TEMP, rows)
+    def copy_raw_to_download(
+        self, device_no: int, from_date: str, to_date: str
+    ) -> int:
+        """Nạp lại bảng tạm từ attendance_raw cho 1 máy + khoảng ngày.
+
+        Dùng khi tải tăng dần: dữ liệu cũ không được tải lại từ máy nhưng màn hình
+        vẫn cần hiển thị đủ khoảng ngày đã chọn.
+        """
+
+        cols = (
+            "attendance_code, name_on_mcc, work_date, time_in_1, time_out_1, time_in_2, time_out_2, "
+            "time_in_3, time_out_3, device_no, device_id, device_name"
+        )
+        query = (
+            f"INSERT INTO {self._TABLE_TEMP} ({cols}) "
+            f"SELECT {cols} FROM {self._TABLE_RAW} "
+            "WHERE device_no = %s AND work_date >= %s AND work_date <= %s "
+            "ON DUPLICATE KEY UPDATE "
+            "name_on_mcc = VALUES(name_on_mcc), "
+            "time_in_1 = VALUES(time_in_1), "
+            "time_out_1 = VALUES(time_out_1), "
+            "time_in_2 = VALUES(time_in_2), "
+            "time_out_2 = VALUES(time_out_2), "
+            "time_in_3 = VALUES(time_in_3), "
+            "time_out_3 = VALUES(time_out_3), "
+            "device_id = VALUES(device_id), "
+            "device_name = VALUES(device_name)"
+        )
 
-    def insert_ignore_attendance_raw(self, rows: list[dict[str, Any]]) -> int:
-        return self._insert_ignore_many(self._TABLE_RAW, rows)
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(query, (int(device_no), str(from_date), str(to_date)))
+                conn.commit()
+                return int(cursor.rowcount)
+        except Exception:
+            logger.exception("Lỗi copy_raw_to_download")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
 
     def _upsert_many(self, table: str, rows: list[dict[str, Any]]) -> int:
         if not rows:
@@ -114,7 +215,7 @@ class DownloadAttendanceRepository:
             ") VALUES ("
             "%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s"
             ") ON DUPLICATE KEY UPDATE "
-            "name_on_mcc = VALUES(name_on_mcc), "
+            "name_on_mcc = COALESCE(NULLIF(VALUES(name_on_mcc), ''), name_on_mcc), "
             "time_in_1 = VALUES(time_in_1), "
             "time_out_1 = VALUES(time_out_1), "
             "time_in_2 = VALUES(time_in_2), "
@@ -125,28 +226,7 @@ class DownloadAttendanceRepository:
             "device_name = VALUES(device_name)"
         )
 
-        params: list[tuple[Any, ...]] = []
-        for r in rows:
-            params.append(
-                (
-                    str(r.get("attendance_code") or ""),
-                    str(r.get("name_on_mcc") or ""),
-                    str(r.get("work_date") or ""),
-                    r.get("time_in_1"),
-                    r.get("time_out_1"),
-                    r.get("time_in_2"),
-                    r.get("time_out_2"),
-                    r.get("time_in_3"),
-                    r.get("time_out_3"),
-                    int(r.get("device_no") or 0),
-                    (
-                        int(r.get("device_id") or 0)
-                        if r.get("device_id") is not None
-                        else None
-                    ),
-                    str(r.get("device_name") or ""),
-                )
-            )
+        params = [self._row_params(r) for r in rows]
 
         cursor = None
         try:
@@ -162,57 +242,116 @@ class DownloadAttendanceRepository:
             if cursor is not None:
                 cursor.close()
 
-    def _insert_ignore_many(self, table: str, rows: list[dict[str, Any]]) -> int:
-        """Insert rows but never overwrite existing ones.
+    @staticmethod
+    def _row_params(r: dict[str, Any]) -> tuple[Any, ...]:
+        return (
+            str(r.get("attendance_code") or ""),
+            str(r.get("name_on_mcc") or ""),
+            str(r.get("work_date") or ""),
+            r.get("time_in_1"),
+            r.get("time_out_1"),
+            r.get("time_in_2"),
+            r.get("time_out_2"),
+            r.get("time_in_3"),
+            r.get("time_out_3"),
+            int(r.get("device_no") or 0),
+            (int(r.get("device_id") or 0) if r.get("device_id") is not None else None),
+            str(r.get("device_name") or ""),
+        )
 
-        Used for generating 'no-punch' placeholder rows: we must not wipe real punches
-        that may already exist for the same (attendance_code, work_date, device_no).
+    def begin_bulk(self) -> None:
+        """Tạo (làm rỗng) bảng TEMPORARY tmp_download_rows.
+
+        Bảng TEMPORARY chỉ sống trong 1 kết nối: begin_bulk / stage_rows / merge_staged_rows
+        phải gọi trong cùng 1 Database.transaction(). CREATE/DROP TEMPORARY không tự commit.
         """
 
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {self._TABLE_STAGE}")
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {self._TABLE_STAGE} ("
+                    "attendance_code VARCHAR(50) NOT NULL, "
+                    "name_on_mcc VARCHAR(255) NULL, "
+                    "work_date DATE NOT NULL, "
+                    "time_in_1 TIME NULL, time_out_1 TIME NULL, "
+                    "time_in_2 TIME NULL, time_out_2 TIME NULL, "
+                    "time_in_3 TIME NULL, time_out_3 TIME NULL, "
+                    "device_no INT NOT NULL, "
+                    "device_id INT NULL, "
+                    "device_name VARCHAR(255) NULL"
+                    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+                )
+                conn.commit()
+        except Exception:
+            logger.exception("Lỗi begin_bulk")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def stage_rows(self, rows: list[dict[str, Any]]) -> int:
+        """Nạp dòng ngày công vào tmp_download_rows (chưa ghi bảng thật)."""
+
         if not rows:
             return 0
 
-        query = (
-            f"INSERT IGNORE INTO {table} ("
-            "attendance_code, name_on_mcc, work_date, time_in_1, time_out_1, time_in_2, time_out_2, time_in_3, time_out_3, "
-            "device_no, device_id, device_name"
-            ") VALUES ("
-            "%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s"
-            ")"
-        )
-
-        params: list[tuple[Any, ...]] = []
-        for r in rows:
-            params.append(
-                (
-                    str(r.get("attendance_code") or ""),
-                    str(r.get("name_on_mcc") or ""),
-                    str(r.get("work_date") or ""),
-                    r.get("time_in_1"),
-                    r.get("time_out_1"),
-                    r.get("time_in_2"),
-                    r.get("time_out_2"),
-                    r.get("time_in_3"),
-                    r.get("time_out_3"),
-                    int(r.get("device_no") or 0),
-                    (
-                        int(r.get("device_id") or 0)
-                        if r.get("device_id") is not None
-                        else None
-                    ),
-                    str(r.get("device_name") or ""),
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                loaded = Database.bulk_insert(
+                    cursor,
+                    self._TABLE_STAGE,
+                    self._COLUMNS,
+                    [self._row_params(r) for r in rows],
                 )
-            )
+                conn.commit()
+                return loaded
+        except Exception:
+            logger.exception("Lỗi stage_rows")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def merge_staged_rows(self) -> int:
+        """Gộp tmp_download_rows vào download_attendance + attendance_raw (mỗi bảng 1 câu).
 
+        Cùng quy tắc với upsert_download_attendance / upsert_attendance_raw; xong thì xóa
+        bảng TEMPORARY. Return số dòng đã nạp.
+        """
+
+        cols = ", ".join(self._COLUMNS)
         cursor = None
         try:
             with Database.connect() as conn:
                 cursor = Database.get_cursor(conn, dictionary=False)
-                cursor.executemany(query, params)
+                cursor.execute(f"SELECT COUNT(*) FROM {self._TABLE_STAGE}")
+                row = cursor.fetchone()
+                staged = int(row[0] or 0) if row else 0
+                for table in (self._TABLE_TEMP, self._TABLE_RAW):
+                    cursor.execute(
+                        f"INSERT INTO {table} ({cols}) "
+                        f"SELECT {cols} FROM {self._TABLE_STAGE} "
+                        "ON DUPLICATE KEY UPDATE "
+                        f"name_on_mcc = COALESCE(NULLIF(VALUES(name_on_mcc), ''), {table}.name_on_mcc), "
+                        "time_in_1 = VALUES(time_in_1), "
+                        "time_out_1 = VALUES(time_out_1), "
+                        "time_in_2 = VALUES(time_in_2), "
+                        "time_out_2 = VALUES(time_out_2), "
+                        "time_in_3 = VALUES(time_in_3), "
+                        "time_out_3 = VALUES(time_out_3), "
+                        "device_id = VALUES(device_id), "
+                        "device_name = VALUES(device_name)"
+                    )
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {self._TABLE_STAGE}")
                 conn.commit()
-                return int(cursor.rowcount)
+                return staged
         except Exception:
-            logger.exception("Lỗi insert_ignore_many (%s)", table)
+            logger.exception("Lỗi merge_staged_rows")
             raise
         finally:
             if cursor is not None:
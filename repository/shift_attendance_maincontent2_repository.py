@@ -7,23 +7,43 @@ Trách nhiệm:
 - Trả về dữ liệu dạng dict để UI/controller render.
 
 Lưu ý:
-- Không xử lý nghiệp vụ sắp xếp in/out ở đây (thuộc Service layer).
+- Không xử lý nghiệp vụ sắp xếp in/out ở đây (thuộc Service layer); chỉ đọc/ghi kết quả
+  ghép giờ đã lưu (arranged_*).
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Any
+from typing import Any, Iterator
 
 from core.database import Database
+from repository.calendar_repository import CalendarRepository
 
 
 logger = logging.getLogger(__name__)
 
 
+# Kết quả ghép giờ đã lưu (service so arranged_fingerprint để biết dòng cần tính lại)
+ARRANGED_COLUMNS = (
+    "arranged_in_1", "arranged_out_1", "arranged_in_2", "arranged_out_2",
+    "arranged_in_3", "arranged_out_3", "arranged_shift_code", "arranged_fingerprint",
+)
+
+
 class ShiftAttendanceMainContent2Repository:
     TABLE = "attendance_audit"
 
+    # Thứ tự cột của iter_rows (dùng cho phần dòng ảo UNION ALL)
+    _ROW_COLUMNS = [
+        "id", "attendance_code", "employee_code", "full_name", "date", "weekday",
+        "in_1", "out_1", "in_2", "out_2", "in_3", "out_3",
+        "late", "early", "hours", "work", "leave", "kh", "hours_plus", "work_plus",
+        "leave_plus", "total", "tc1", "tc2", "tc3", "shift_code_db", "schedule",
+        *ARRANGED_COLUMNS, "import_locked",
+    ]
+
+    _TABLE_TIMESHEET_STAGE = "tmp_timesheet_rows"
+
     def update_shift_codes(self, items: list[tuple[int, str | None]]) -> int:
         """Batch update shift_code by attendance_audit.id.
 
@@ -69,6 +89,83 @@ class ShiftAttendanceMainContent2Repository:
             if cursor is not None:
                 cursor.close()
 
+    def update_arranged(self, items: list[tuple[Any, ...]]) -> int:
+        """Lưu kết quả ghép giờ theo attendance_audit.id.
+
+        items: (audit_id, in_1, out_1, in_2, out_2, in_3, out_3, shift_code, fingerprint).
+        """
+
+        params = [(*item[1:], int(item[0])) for item in items or []]
+        if not params:
+            return 0
+
+        query = (
+            f"UPDATE {self.TABLE} SET "
+            + ", ".join(f"{c} = %s" for c in ARRANGED_COLUMNS)
+            + " WHERE id = %s"
+        )
+
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.executemany(query, params)
+                conn.commit()
+                return int(cursor.rowcount or 0)
+        except Exception:
+            logger.exception("Lỗi update_arranged")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def update_timesheet(self, items: list[tuple[Any, ...]]) -> int:
+        """Lưu công đã tính theo attendance_audit.id (bỏ qua dòng import_locked).
+
+        items: (audit_id, late, early, hours, work, hours_plus, work_plus, tc1, tc2, tc3).
+        Nạp vào bảng TEMPORARY tmp_timesheet_rows rồi cập nhật bằng 1 câu UPDATE JOIN.
+        """
+
+        columns = [
+            "id", "late", "early", "hours", "work", "hours_plus", "work_plus",
+            "tc1", "tc2", "tc3",
+        ]
+        params = [tuple(item) for item in items or [] if item and item[0] is not None]
+        if not params:
+            return 0
+
+        stage = self._TABLE_TIMESHEET_STAGE
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=False)
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage}")
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {stage} ("
+                    "id BIGINT NOT NULL PRIMARY KEY, "
+                    "late VARCHAR(20) NULL, early VARCHAR(20) NULL, "
+                    "hours DECIMAL(10,2) NULL, work DECIMAL(10,2) NULL, "
+                    "hours_plus DECIMAL(10,2) NULL, work_plus DECIMAL(10,2) NULL, "
+                    "tc1 VARCHAR(50) NULL, tc2 VARCHAR(50) NULL, tc3 VARCHAR(50) NULL"
+                    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+                )
+                Database.bulk_insert(cursor, stage, columns, params)
+                cursor.execute(
+                    f"UPDATE {self.TABLE} a JOIN {stage} s ON s.id = a.id SET "
+                    + ", ".join(f"a.{c} = s.{c}" for c in columns[1:])
+                    + " WHERE a.import_locked = 0"
+                )
+                written = int(cursor.rowcount or 0)
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage}")
+                conn.commit()
+                return written
+        except Exception:
+            logger.exception("Lỗi update_timesheet")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
     def list_holiday_dates(
         self,
         *,
@@ -190,6 +287,35 @@ class ShiftAttendanceMainContent2Repository:
             if cursor is not None:
                 cursor.close()
 
+    def get_work_shifts_version(self) -> tuple[int, int, str]:
+        """Phiên bản bảng work_shifts: (số ca, tổng id, updated_at mới nhất).
+
+        Thêm/xóa ca đổi số ca/tổng id; sửa ca đổi updated_at (ON UPDATE CURRENT_TIMESTAMP).
+        """
+
+        query = (
+            "SELECT COUNT(*) AS cnt, COALESCE(SUM(id), 0) AS id_sum, "
+            "MAX(updated_at) AS last_updated "
+            "FROM hr_attendance.work_shifts"
+        )
+        cursor = None
+        try:
+            with Database.connect() as conn:
+                cursor = Database.get_cursor(conn, dictionary=True)
+                cursor.execute(query)
+                row = cursor.fetchone() or {}
+                return (
+                    int(row.get("cnt") or 0),
+                    int(row.get("id_sum") or 0),
+                    str(row.get("last_updated") or ""),
+                )
+        except Exception:
+            logger.exception("Lỗi get_work_shifts_version")
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+
     def get_work_shifts_by_ids(self, shift_ids: list[int]) -> dict[int, dict[str, Any]]:
         ids: list[int] = []
         for v in shift_ids or []:
@@ -209,33 +335,12 @@ class ShiftAttendanceMainContent2Repository:
             "FROM hr_attendance.work_shifts "
             f"WHERE id IN ({placeholders})"
         )
-        query_legacy = (
-            "SELECT id, shift_code, time_in, time_out, lunch_start, lunch_end, "
-            "total_minutes, work_count, in_window_start, in_window_end, "
-            "out_window_start, out_window_end "
-            "FROM hr_attendance.work_shifts "
-            f"WHERE id IN ({placeholders})"
-        )
-
         cursor = None
         try:
             with Database.connect() as conn:
                 cursor = Database.get_cursor(conn, dictionary=True)
-                try:
-                    cursor.execute(query, tuple(ids))
-                    rows = list(cursor.fetchall() or [])
-                except Exception as exc:
-                    msg = str(exc)
-                    if "overtime_round_minutes" in msg and "Unknown column" in msg:
-                        cursor.execute(query_legacy, tuple(ids))
-                        rows = list(cursor.fetchall() or [])
-                        for r in rows:
-                            try:
-                                r.setdefault("overtime_round_minutes", 0)
-                            except Exception:
-                                pass
-                    else:
-                        raise
+                cursor.execute(query, tuple(ids))
+                rows = list(cursor.fetchall() or [])
 
                 out: dict[int, dict[str, Any]] = {}
                 for r in rows:
@@ -266,6 +371,35 @@ class ShiftAttendanceMainContent2Repository:
         department_id: int | None = None,
         title_id: int | None = None,
     ) -> list[dict[str, Any]]:
+        rows: list[dict[str, Any]] = []
+        for batch in self.iter_rows(
+            from_date=from_date,
+            to_date=to_date,
+            employee_id=employee_id,
+            attendance_code=attendance_code,
+            employee_ids=employee_ids,
+            attendance_codes=attendance_codes,
+            department_id=department_id,
+            title_id=title_id,
+        ):
+            rows.extend(batch)
+        return rows
+
+    def iter_rows(
+        self,
+        *,
+        from_date: str | None = None,
+        to_date: str | None = None,
+        employee_id: int | None = None,
+        attendance_code: str | None = None,
+        employee_ids: list[int] | None = None,
+        attendance_codes: list[str] | None = None,
+        department_id: int | None = None,
+        title_id: int | None = None,
+        batch_size: int = 2000,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Giống list_rows nhưng đọc theo lô (server-side cursor), RAM không tăng theo số dòng."""
+
         where: list[str] = []
         params: list[Any] = []
 
@@ -321,7 +455,7 @@ class ShiftAttendanceMainContent2Repository:
 
         where_sql = (" WHERE " + " AND ".join(where)) if where else ""
 
-        query = (
+        base_query = (
             "SELECT "
             "a.id, "
             "a.attendance_code, a.employee_code, a.full_name, a.work_date AS date, a.weekday, "
@@ -342,60 +476,34 @@ class ShiftAttendanceMainContent2Repository:
             "    AND (esa.effective_to IS NULL OR esa.effective_to >= a.work_date) "
             "  ORDER BY esa.effective_from DESC, esa.id DESC "
             "  LIMIT 1"
-            "), a.schedule) AS schedule "
+            "), a.schedule) AS schedule, "
+            + ", ".join(f"a.{c}" for c in ARRANGED_COLUMNS)
+            + ", a.import_locked "
             f"FROM {self.TABLE} a"
             f"{join_sql}"
-            f"{where_sql} "
-            "ORDER BY a.work_date ASC, a.employee_code ASC, a.id ASC"
+            f"{where_sql}"
         )
 
-        query_legacy = (
-            "SELECT "
-            "a.id, "
-            "a.attendance_code, a.employee_code, a.full_name, a.work_date AS date, a.weekday, "
-            "a.in_1, a.out_1, a.in_2, a.out_2, a.in_3, a.out_3, "
-            "a.late, a.early, a.hours, a.work, a.`leave`, a.`leave` AS kh, a.hours_plus, a.work_plus, a.leave_plus, "
-            "CASE "
-            "  WHEN a.work IS NULL AND a.work_plus IS NULL THEN NULL "
-            "  ELSE (COALESCE(a.work, 0) + COALESCE(a.work_plus, 0)) "
-            "END AS total, "
-            "a.tc1, a.tc2, a.tc3, "
-            "COALESCE(("
-            "  SELECT s.schedule_name "
-            "  FROM hr_attendance.employee_schedule_assignments esa "
-            "  JOIN hr_attendance.arrange_schedules s ON s.id = esa.schedule_id "
-            "  WHERE esa.employee_id = e.id "
-            "    AND esa.effective_from <= a.work_date "
-            "    AND (esa.effective_to IS NULL OR esa.effective_to >= a.work_date) "
-            "  ORDER BY esa.effective_from DESC, esa.id DESC "
-            "  LIMIT 1"
-            "), a.schedule) AS schedule "
-            f"FROM {self.TABLE} a"
-            f"{join_sql}"
-            f"{where_sql} "
-            "ORDER BY a.work_date ASC, a.employee_code ASC, a.id ASC"
+        # Ngày không chấm công: sinh lúc truy vấn từ calendar_days (không lưu dòng rỗng)
+        absent_query, absent_params = CalendarRepository.absent_audit_rows_sql(
+            self._ROW_COLUMNS,
+            from_date=from_date,
+            to_date=to_date,
+            employee_ids=ids,
+            attendance_codes=codes,
+            department_id=department_id,
+            title_id=title_id,
+        )
+        query = (
+            f"SELECT * FROM ({base_query} UNION ALL {absent_query}) u "
+            "ORDER BY u.`date` ASC, u.employee_code ASC, u.id ASC"
         )
+        params.extend(absent_params)
 
-        cursor = None
         try:
-            with Database.connect() as conn:
-                cursor = Database.get_cursor(conn, dictionary=True)
-                try:
-                    cursor.execute(query, tuple(params))
-                except Exception as exc:
-                    msg = str(exc)
-                    if "shift_code" in msg and "Unknown column" in msg:
-                        cursor.execute(query_legacy, tuple(params))
-                    else:
-                        raise
-
-                rows = list(cursor.fetchall() or [])
-                for r in rows:
-                    r.setdefault("shift_code_db", None)
-                return rows
+            yield from Database.stream_query(
+                query, tuple(params), batch_size=batch_size
+            )
         except Exception:
             logger.exception("Lỗi list_rows (shift_attendance_maincontent2)")
             raise
-        finally:
-            if cursor is not None:
-                cursor.close()
@@ -4,6 +4,8 @@ Service layer cho module "Sắp xếp ca theo lịch trình":
 - Validate dữ liệu cơ bản
 - Gọi repository
 - Trả về (ok, message) thân thiện cho UI
+- Sửa/xóa lịch trình: đưa các dòng phụ thuộc vào hàng đợi tính lại kết quả ghép giờ
+  (ArrangedRecomputeJob)
 """
 
 from __future__ import annotations
@@ -12,6 +14,10 @@ import logging
 from dataclasses import dataclass
 
 from repository.arrange_schedule_repository import ArrangeScheduleRepository
+from services.arranged_recompute_services import (
+    ArrangedRecomputeJob,
+    ArrangedRecomputeService,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -293,6 +299,8 @@ class ArrangeScheduleService:
                 self._repo.replace_schedule_day_shifts(
                     int(saved_id), dt.day_key, list(shifts or [])
                 )
+            if schedule_id:
+                ArrangedRecomputeJob.notify_schedules_changed([int(saved_id)])
             return True, "Lưu thành công.", int(saved_id)
         except Exception as exc:
             # Duplicate schedule name
@@ -305,10 +313,21 @@ class ArrangeScheduleService:
         if not schedule_id:
             return False, "Vui lòng chọn lịch trình cần xóa."
 
+        # Xóa lịch xóa luôn phân lịch (CASCADE): tra dòng phụ thuộc trước khi xóa
+        targets = []
+        try:
+            targets = ArrangedRecomputeService().collect_schedule_targets(
+                [int(schedule_id)]
+            )
+        except Exception:
+            logger.exception("Không thể tra dòng phụ thuộc lịch trình %s", schedule_id)
+
         try:
             affected = self._repo.delete_schedule(int(schedule_id))
             if affected <= 0:
                 return False, "Không tìm thấy lịch trình cần xóa."
+            if targets:
+                ArrangedRecomputeJob.enqueue(targets)
             return True, "Xóa thành công."
         except Exception as exc:
             logger.exception("delete_schedule thất bại")
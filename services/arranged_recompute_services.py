@@ -0,0 +1,240 @@
+"""services.arranged_recompute_services
+
+Tính lại kết quả ghép giờ đã lưu (attendance_audit.arranged_*) khi sửa ca / lịch trình /
+ngày lễ, chỉ cho các dòng phụ thuộc, chạy nền (không chờ tới lúc mở màn hình).
+
+Chỉ mục phụ thuộc (tra lúc chạy, repository.arranged_dependency_repository):
+- ca (work_shifts.id) -> lịch trình dùng ca -> nhân viên + khoảng ngày phân lịch
+  (employee_schedule_assignments) + mã chấm công có dòng audit ghi tên lịch
+- lịch trình -> như trên
+- ngày lễ -> mọi dòng của ngày đó (day_key = 'holiday')
+
+Ghi chú:
+- Chỉ tính lại trong LOOKBACK_DAYS ngày gần nhất; tháng cũ hơn vẫn đúng nhờ fingerprint
+  (mở màn hình thì tự ghép lại dòng đã đổi).
+- Xóa lịch trình xóa luôn phân lịch (ON DELETE CASCADE): phải tra phụ thuộc TRƯỚC khi xóa
+  (collect_schedule_targets) rồi đưa vào hàng đợi sau khi xóa thành công.
+- Ghép lại cũng lưu shift_code và công (fingerprint gồm đầu vào tính công), xem
+  ShiftAttendanceMainContent2Service.refresh_arranged.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from repository.arranged_dependency_repository import ArrangedDependencyRepository
+from services.shift_attendance_maincontent2_services import (
+    ShiftAttendanceMainContent2Service,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RecomputeTarget:
+    """Tập dòng cần ghép lại: khoảng ngày + nhân viên/mã chấm công (cả hai None = mọi dòng)."""
+
+    from_date: date
+    to_date: date
+    employee_ids: tuple[int, ...] | None = None
+    attendance_codes: tuple[str, ...] | None = None
+
+
+class ArrangedRecomputeService:
+    LOOKBACK_DAYS = 93
+    # Số nhân viên / mã chấm công tối đa trong 1 lượt refresh (độ dài mệnh đề IN)
+    CHUNK_SIZE = 500
+
+    def __init__(
+        self,
+        repo: ArrangedDependencyRepository | None = None,
+        arranged_service: ShiftAttendanceMainContent2Service | None = None,
+    ) -> None:
+        self._repo = repo or ArrangedDependencyRepository()
+        self._arranged_service = arranged_service or ShiftAttendanceMainContent2Service()
+
+    @classmethod
+    def window(cls, today: date | None = None) -> tuple[date, date]:
+        to_date = today or date.today()
+        return to_date - timedelta(days=cls.LOOKBACK_DAYS), to_date
+
+    @staticmethod
+    def _as_date(value: object | None) -> date | None:
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return None
+
+    def _chunks(self, values: list) -> Iterable[tuple]:
+        for i in range(0, len(values), self.CHUNK_SIZE):
+            yield tuple(values[i : i + self.CHUNK_SIZE])
+
+    def collect_schedule_targets(
+        self, schedule_ids: list[int], today: date | None = None
+    ) -> list[RecomputeTarget]:
+        """Lịch trình -> các tập dòng phụ thuộc trong cửa sổ tính lại."""
+
+        if not schedule_ids:
+            return []
+        win_from, win_to = self.window(today)
+
+        # Gom nhân viên cùng khoảng ngày (sau khi cắt theo cửa sổ) vào chung 1 lượt
+        by_range: dict[tuple[date, date], list[int]] = {}
+        for r in self._repo.list_assignment_ranges(
+            schedule_ids, from_date=win_from.isoformat(), to_date=win_to.isoformat()
+        ):
+            start = self._as_date(r.get("effective_from")) or win_from
+            end = self._as_date(r.get("effective_to")) or win_to
+            start, end = max(start, win_from), min(end, win_to)
+            if start > end or r.get("employee_id") is None:
+                continue
+            by_range.setdefault((start, end), []).append(int(r["employee_id"]))
+
+        targets: list[RecomputeTarget] = []
+        for (start, end), emp_ids in sorted(by_range.items()):
+            for chunk in self._chunks(list(dict.fromkeys(emp_ids))):
+                targets.append(RecomputeTarget(start, end, employee_ids=chunk))
+
+        # Dòng không có phân lịch: lấy lịch theo cột attendance_audit.schedule
+        names = self._repo.list_schedule_names(schedule_ids)
+        codes = self._repo.list_codes_by_schedule_names(
+            names, from_date=win_from.isoformat(), to_date=win_to.isoformat()
+        )
+        for chunk in self._chunks(list(dict.fromkeys(codes))):
+            targets.append(RecomputeTarget(win_from, win_to, attendance_codes=chunk))
+        return targets
+
+    def collect_shift_targets(
+        self, shift_ids: list[int], today: date | None = None
+    ) -> list[RecomputeTarget]:
+        schedule_ids = self._repo.list_schedule_ids_by_shift_ids(shift_ids)
+        return self.collect_schedule_targets(schedule_ids, today)
+
+    def collect_holiday_targets(
+        self, dates: Iterable[object], today: date | None = None
+    ) -> list[RecomputeTarget]:
+        win_from, win_to = self.window(today)
+        days = {self._as_date(d) for d in dates}
+        return [
+            RecomputeTarget(d, d)
+            for d in sorted(d for d in days if d is not None and win_from <= d <= win_to)
+        ]
+
+    def refresh(self, targets: Iterable[RecomputeTarget]) -> int:
+        """Ghép lại các tập dòng (bỏ trùng); return tổng số dòng đã ghép lại."""
+
+        total = 0
+        for t in dict.fromkeys(targets):
+            total += self._arranged_service.refresh_arranged(
+                from_date=t.from_date.isoformat(),
+                to_date=t.to_date.isoformat(),
+                employee_ids=list(t.employee_ids) if t.employee_ids else None,
+                attendance_codes=list(t.attendance_codes) if t.attendance_codes else None,
+            )
+        return total
+
+
+class ArrangedRecomputeJob:
+    """Hàng đợi tính lại dùng chung toàn app (thread nền daemon, gom các lần sửa liên tiếp)."""
+
+    # Chờ sau lần sửa cuối trước khi chạy (sửa nhiều ca liền nhau chỉ tính 1 lượt)
+    DEBOUNCE_SECONDS = 2.0
+
+    _lock = threading.Lock()
+    _wake = threading.Event()
+    _stop = threading.Event()
+    _thread: threading.Thread | None = None
+    _shift_ids: set[int] = set()
+    _schedule_ids: set[int] = set()
+    _targets: list[RecomputeTarget] = []
+
+    @classmethod
+    def notify_shifts_changed(cls, shift_ids: Iterable[int]) -> None:
+        with cls._lock:
+            cls._shift_ids.update(int(i) for i in shift_ids)
+        cls._ensure_started()
+
+    @classmethod
+    def notify_schedules_changed(cls, schedule_ids: Iterable[int]) -> None:
+        with cls._lock:
+            cls._schedule_ids.update(int(i) for i in schedule_ids)
+        cls._ensure_started()
+
+    @classmethod
+    def enqueue(cls, targets: Iterable[RecomputeTarget]) -> None:
+        with cls._lock:
+            cls._targets.extend(targets)
+        cls._ensure_started()
+
+    @classmethod
+    def _ensure_started(cls) -> None:
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._stop.clear()
+                cls._thread = threading.Thread(
+                    target=cls._loop, name="arranged-recompute", daemon=True
+                )
+                cls._thread.start()
+        cls._wake.set()
+
+    @classmethod
+    def _drain(cls) -> tuple[list[int], list[int], list[RecomputeTarget]]:
+        with cls._lock:
+            shift_ids, cls._shift_ids = sorted(cls._shift_ids), set()
+            schedule_ids, cls._schedule_ids = sorted(cls._schedule_ids), set()
+            targets, cls._targets = cls._targets, []
+        return shift_ids, schedule_ids, targets
+
+    @classmethod
+    def run_pending(cls, service: ArrangedRecomputeService | None = None) -> int:
+        shift_ids, schedule_ids, targets = cls._drain()
+        if not (shift_ids or schedule_ids or targets):
+            return 0
+        service = service or ArrangedRecomputeService()
+        targets.extend(service.collect_shift_targets(shift_ids))
+        targets.extend(service.collect_schedule_targets(schedule_ids))
+        count = service.refresh(targets)
+        logger.info(
+            "Tính lại ghép giờ: %s ca, %s lịch, %s lượt, %s dòng",
+            len(shift_ids),
+            len(schedule_ids),
+            len(targets),
+            count,
+        )
+        return count
+
+    @classmethod
+    def _loop(cls) -> None:
+        while not cls._stop.is_set():
+            cls._wake.wait()
+            cls._wake.clear()
+            if cls._stop.wait(cls.DEBOUNCE_SECONDS):
+                return
+            try:
+                cls.run_pending()
+            except Exception:
+                # Không để lỗi làm dừng thread nền; fingerprint vẫn đảm bảo đúng khi mở màn hình
+                logger.exception("Tính lại ghép giờ: lỗi không mong đợi")
+
+    @classmethod
+    def stop(cls, timeout: float | None = 5.0) -> None:
+        """Dừng thread nền; việc còn trong hàng đợi bỏ qua (fingerprint tự tính lại khi mở)."""
+
+        cls._stop.set()
+        cls._wake.set()
+        with cls._lock:
+            thread = cls._thread
+            cls._thread = None
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
@@ -0,0 +1,411 @@
+"""services.attendance_punch_services
+
+Service cho kho lượt chấm attendance_punches (nguồn gốc của dữ liệu giờ vào/ra).
+
+Trách nhiệm:
+- DayPunchGroups: gom lượt chấm theo (mã, ngày) dạng gọn khi đọc log (không giữ list datetime)
+- project_day_slots: chiếu lượt chấm -> 6 cột giờ/ngày (in/out 1..3) như attendance_raw
+- merge_to_audit: gộp lượt chấm của mọi máy cho 1 (mã, ngày), bỏ lượt quẹt lặp trong
+  debounce_seconds giây -> 1 dòng attendance_audit duy nhất (device_no = MERGED_DEVICE_NO)
+- rebuild_slots: dựng lại attendance_raw + attendance_audit từ attendance_punches
+  (không cần tải lại từ máy chấm công; lệnh quản trị: python -m tools.rebuild_slots)
+"""
+
+from __future__ import annotations
+
+import logging
+from array import array
+from datetime import date, datetime, time, timedelta
+from typing import Any, Iterable, Iterator
+
+from core.database import Database
+from repository.attendance_audit_repository import AttendanceAuditRepository
+from repository.auto_sync_repository import AutoSyncRepository
+from repository.attendance_punch_repository import AttendancePunchRepository
+from repository.device_repository import DeviceRepository
+from repository.download_attendance_repository import DownloadAttendanceRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+class DayPunchGroups:
+    """Lượt chấm gom theo (mã, ngày), thêm dần khi đọc log.
+
+    Mỗi (mã, ngày) giữ 1 array số giây trong ngày (4 byte/lượt) thay vì list datetime;
+    mã chấm công được dùng chung 1 chuỗi. Thứ tự (mã, ngày) theo lần xuất hiện đầu tiên.
+    """
+
+    __slots__ = ("_groups", "_codes", "_count")
+
+    def __init__(self) -> None:
+        self._groups: dict[tuple[str, date], array] = {}
+        self._codes: dict[str, str] = {}
+        self._count = 0
+
+    def add(self, code: str, ts: datetime) -> None:
+        code = self._codes.setdefault(code, code)
+        key = (code, ts.date())
+        seconds = self._groups.get(key)
+        if seconds is None:
+            seconds = self._groups[key] = array("I")
+        seconds.append(ts.hour * 3600 + ts.minute * 60 + ts.second)
+        self._count += 1
+
+    def add_seconds(self, code: str, day: date, second_of_day: int) -> None:
+        """Như add nhưng nhận sẵn (ngày, số giây trong ngày) - parser file log không tạo datetime."""
+
+        code = self._codes.setdefault(code, code)
+        key = (code, day)
+        seconds = self._groups.get(key)
+        if seconds is None:
+            seconds = self._groups[key] = array("I")
+        seconds.append(second_of_day)
+        self._count += 1
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._groups
+
+    @property
+    def punch_count(self) -> int:
+        return self._count
+
+    def keys(self) -> list[tuple[str, date]]:
+        return list(self._groups)
+
+    @staticmethod
+    def debounce(seconds: list[int], window: int) -> list[int]:
+        """Bỏ lượt cách lượt đã giữ trước đó <= window giây (seconds đã sắp xếp)."""
+
+        if window <= 0 or len(seconds) < 2:
+            return seconds
+        kept = [seconds[0]]
+        for s in seconds[1:]:
+            if s - kept[-1] > window:
+                kept.append(s)
+        return kept
+
+    def slots(
+        self, key: tuple[str, date], count: int, debounce_seconds: int = 0
+    ) -> list[time | None]:
+        """count giờ đầu tiên (đã sắp xếp) của (mã, ngày), thiếu thì None.
+
+        debounce_seconds > 0: gộp các lượt quẹt lặp (xem debounce) trước khi lấy.
+        """
+
+        seconds = self.debounce(
+            sorted(self._groups.get(key) or ()), int(debounce_seconds or 0)
+        )[:count]
+        out: list[time | None] = [
+            time(s // 3600, (s // 60) % 60, s % 60) for s in seconds
+        ]
+        out.extend([None] * (count - len(out)))
+        return out
+
+    def seconds(self, key: tuple[str, date]) -> list[int]:
+        """Số giây trong ngày của các lượt chấm (đã sắp xếp, bỏ trùng)."""
+
+        return sorted(set(self._groups.get(key) or ()))
+
+    def punches(self, key: tuple[str, date]) -> Iterator[datetime]:
+        base = datetime.combine(key[1], time.min)
+        for s in sorted(self._groups.get(key) or ()):
+            yield base + timedelta(seconds=s)
+
+    def iter_batches(self, size: int) -> Iterator[list[tuple[str, date]]]:
+        batch: list[tuple[str, date]] = []
+        for key in self._groups:
+            batch.append(key)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class AttendancePunchService:
+    # Số cột giờ của bảng 6 cột (time_in_1..time_out_3 / in_1..out_3)
+    SLOT_COUNT = 6
+    # Số (mã, ngày) ghi mỗi lô khi dựng lại
+    PERSIST_BATCH_SIZE = 2000
+    # Dòng attendance_audit tổng hợp mọi máy (1 dòng / mã / ngày) dùng số máy này
+    MERGED_DEVICE_NO = 0
+    # Lượt quẹt cách lượt trước <= số giây này (cùng máy hoặc máy bên cạnh) tính là 1 lượt.
+    # Ghi đè bằng "punch_debounce_seconds" trong database/auto_sync_settings.json.
+    DEFAULT_DEBOUNCE_SECONDS = 60
+
+    def __init__(
+        self,
+        repo: AttendancePunchRepository | None = None,
+        raw_repo: DownloadAttendanceRepository | None = None,
+        device_repo: DeviceRepository | None = None,
+        debounce_seconds: int | None = None,
+    ) -> None:
+        self._repo = repo or AttendancePunchRepository()
+        self._raw_repo = raw_repo or DownloadAttendanceRepository()
+        self._device_repo = device_repo or DeviceRepository()
+        self._audit_repo = AttendanceAuditRepository()
+        self._debounce_seconds = (
+            int(debounce_seconds)
+            if debounce_seconds is not None
+            else self._load_debounce_seconds()
+        )
+
+    @classmethod
+    def _load_debounce_seconds(cls) -> int:
+        try:
+            value = AutoSyncRepository().load_settings().get("punch_debounce_seconds")
+            return max(0, int(value)) if value is not None else cls.DEFAULT_DEBOUNCE_SECONDS
+        except (TypeError, ValueError):
+            return cls.DEFAULT_DEBOUNCE_SECONDS
+
+    @classmethod
+    def project_day_slots(
+        cls, punches: Iterable[tuple[str, datetime]]
+    ) -> dict[tuple[str, date], list[time | None]]:
+        """Gom (mã, thời điểm) theo (mã, ngày) -> SLOT_COUNT giờ đầu tiên đã sắp xếp.
+
+        Giữ thứ tự xuất hiện đầu tiên của từng (mã, ngày).
+        """
+
+        groups = DayPunchGroups()
+        for code, ts in punches:
+            groups.add(code, ts)
+        return {key: groups.slots(key, cls.SLOT_COUNT) for key in groups.keys()}
+
+    @classmethod
+    def batch_rows(
+        cls,
+        groups: DayPunchGroups,
+        keys: list[tuple[str, date]],
+        device_no: int,
+        device_id: int | None,
+        device_name: str,
+        name_by_code: dict[str, str] | None = None,
+        with_punches: bool = True,
+    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """Dòng 6 cột giờ + dòng lượt chấm cho 1 lô (mã, ngày) của groups.
+
+        Dùng để ghi theo lô cố định, không dựng toàn bộ dòng của máy cùng lúc.
+        with_punches=False: không dựng dòng lượt chấm (list rỗng).
+        """
+
+        names = name_by_code or {}
+        slot_rows: list[dict[str, Any]] = []
+        punch_rows: list[dict[str, Any]] = []
+        for key in keys:
+            code, wd = key
+            slot_rows.append(
+                cls.slot_row(
+                    code,
+                    str(names.get(code, "") or ""),
+                    wd,
+                    groups.slots(key, cls.SLOT_COUNT),
+                    device_no,
+                    device_id,
+                    device_name,
+                )
+            )
+            if with_punches:
+                punch_rows.extend(
+                    cls.punch_rows(
+                        ((code, ts) for ts in groups.punches(key)),
+                        device_no,
+                        device_id,
+                    )
+                )
+        return slot_rows, punch_rows
+
+    @staticmethod
+    def slot_row(
+        code: str,
+        name_on_mcc: str,
+        work_date: date,
+        slots: list[time | None],
+        device_no: int,
+        device_id: int | None,
+        device_name: str,
+    ) -> dict[str, Any]:
+        """Dòng dạng attendance_raw/download_attendance từ kết quả project_day_slots."""
+
+        return {
+            "attendance_code": code,
+            "name_on_mcc": str(name_on_mcc or ""),
+            "work_date": work_date.isoformat(),
+            "time_in_1": slots[0],
+            "time_out_1": slots[1],
+            "time_in_2": slots[2],
+            "time_out_2": slots[3],
+            "time_in_3": slots[4],
+            "time_out_3": slots[5],
+            "device_no": int(device_no),
+            "device_id": device_id,
+            "device_name": str(device_name or ""),
+        }
+
+    @staticmethod
+    def punch_rows(
+        punches: Iterable[tuple[str, datetime]],
+        device_no: int,
+        device_id: int | None,
+    ) -> list[dict[str, Any]]:
+        """(mã, thời điểm) -> dòng cho AttendancePunchRepository.insert_punches."""
+
+        return [
+            {
+                "attendance_code": code,
+                "punched_at": ts.replace(microsecond=0),
+                "device_no": int(device_no),
+                "device_id": device_id,
+            }
+            for code, ts in punches
+        ]
+
+    def merge_to_audit(
+        self,
+        keys: Iterable[tuple[str, date]],
+        name_by_code: dict[str, str] | None = None,
+        bulk: bool = False,
+    ) -> int:
+        """Dựng 1 dòng attendance_audit / (mã, ngày) từ lượt chấm của mọi máy.
+
+        Lượt chấm đọc lại từ attendance_punches (gọi sau khi đã ghi lượt mới, cùng
+        transaction), gộp mọi máy rồi bỏ lượt quẹt lặp trong debounce_seconds.
+        Dòng riêng từng máy của các (mã, ngày) này bị thay bằng dòng tổng hợp
+        (device_no = MERGED_DEVICE_NO); dòng đã import (import_locked=1) giữ nguyên.
+        bulk=True (tải lượng lớn, gọi trong Database.transaction()): các lô nạp vào bảng
+        tạm rồi gộp vào attendance_audit 1 lần bằng câu SQL tập hợp.
+        Return số dòng tổng hợp đã ghi.
+        """
+
+        ordered = sorted(set(keys), key=lambda k: (k[1], k[0]))
+        if not ordered:
+            return 0
+        if bulk:
+            self._audit_repo.begin_bulk()
+
+        device_names: dict[int, str] = {}
+        try:
+            for d in self._device_repo.list_devices() or []:
+                device_names.setdefault(
+                    int(d.get("device_no") or 0), str(d.get("device_name") or "")
+                )
+        except Exception:
+            logger.warning("Không đọc được danh sách máy khi gộp lượt chấm")
+
+        names = name_by_code or {}
+        written = 0
+        # Sắp theo ngày để mỗi lô chỉ đọc kho lượt chấm trong vài ngày liền nhau
+        for i in range(0, len(ordered), self.PERSIST_BATCH_SIZE):
+            batch = ordered[i : i + self.PERSIST_BATCH_SIZE]
+            wanted = set(batch)
+            groups = DayPunchGroups()
+            sources: dict[tuple[str, date], set[int]] = {}
+            for rows in self._repo.iter_punches(
+                from_dt=datetime.combine(batch[0][1], time.min),
+                to_dt=datetime.combine(batch[-1][1], time.max),
+                attendance_codes=sorted({code for code, _d in batch}),
+            ):
+                for r in rows:
+                    code = str(r.get("attendance_code") or "")
+                    ts = r.get("punched_at")
+                    if not isinstance(ts, datetime):
+                        continue
+                    key = (code, ts.date())
+                    if key not in wanted:
+                        continue
+                    groups.add(code, ts)
+                    sources.setdefault(key, set()).add(int(r.get("device_no") or 0))
+
+            merged: list[dict[str, Any]] = []
+            for key in groups.keys():
+                code, wd = key
+                device_nos = sorted(sources.get(key) or ())
+                label = " + ".join(
+                    device_names.get(dno) or f"Máy {dno}" for dno in device_nos
+                )
+                merged.append(
+                    self.slot_row(
+                        code,
+                        str(names.get(code, "") or ""),
+                        wd,
+                        groups.slots(key, self.SLOT_COUNT, self._debounce_seconds),
+                        self.MERGED_DEVICE_NO,
+                        None,
+                        label[:255],
+                    )
+                )
+            if bulk:
+                self._audit_repo.stage_rows(merged)
+            else:
+                self._audit_repo.replace_with_merged_rows(merged, self.MERGED_DEVICE_NO)
+            written += len(merged)
+        if bulk:
+            self._audit_repo.merge_staged_rows(self.MERGED_DEVICE_NO)
+        return written
+
+    def rebuild_slots(
+        self,
+        from_date: date,
+        to_date: date,
+        device_no: int | None = None,
+    ) -> tuple[bool, str, int]:
+        """Dựng lại attendance_raw + attendance_audit (6 cột giờ) từ attendance_punches.
+
+        attendance_audit được dựng bằng merge_to_audit (1 dòng tổng hợp mọi máy / mã / ngày).
+        Dòng audit đã import (import_locked=1) được giữ nguyên như khi tải từ máy.
+        Return (ok, message, số dòng ngày công đã ghi).
+        """
+
+        if from_date > to_date:
+            return False, "'Từ ngày' không được lớn hơn 'Đến ngày'.", 0
+
+        try:
+            devices: dict[int, dict[str, Any]] = {}
+            for d in self._device_repo.list_devices() or []:
+                try:
+                    devices.setdefault(int(d.get("device_no") or 0), d)
+                except Exception:
+                    continue
+
+            by_device: dict[int, DayPunchGroups] = {}
+            for batch in self._repo.iter_punches(
+                from_dt=datetime.combine(from_date, time.min),
+                to_dt=datetime.combine(to_date, time.max),
+                device_no=device_no,
+            ):
+                for r in batch:
+                    dno = int(r.get("device_no") or 0)
+                    groups = by_device.get(dno)
+                    if groups is None:
+                        groups = by_device[dno] = DayPunchGroups()
+                    groups.add(str(r.get("attendance_code") or ""), r.get("punched_at"))
+
+            written = 0
+            merged_keys: set[tuple[str, date]] = set()
+            with Database.transaction():
+                for dno, groups in by_device.items():
+                    device = devices.get(dno) or {}
+                    did = device.get("id")
+                    for keys in groups.iter_batches(self.PERSIST_BATCH_SIZE):
+                        # name_on_mcc rỗng: giữ tên đã lưu từ máy (upsert không ghi đè tên rỗng)
+                        rows, _punch_rows = self.batch_rows(
+                            groups,
+                            keys,
+                            dno,
+                            int(did) if did is not None else None,
+                            str(device.get("device_name") or ""),
+                            with_punches=False,
+                        )
+                        self._raw_repo.upsert_attendance_raw(rows)
+                        merged_keys.update(keys)
+                        written += len(rows)
+                self.merge_to_audit(merged_keys)
+
+            return True, f"Đã dựng lại {written} dòng chấm công từ lượt chấm.", written
+        except Exception:
+            logger.exception("rebuild_slots thất bại")
+            return False, "Không thể dựng lại dữ liệu chấm công.", 0
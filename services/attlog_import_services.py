@@ -0,0 +1,210 @@
+"""services.attlog_import_services
+
+Nhập log chấm công xuất ra USB từ máy không có mạng (file attlog .dat / .txt):
+- Mỗi dòng 1 lượt chấm: mã chấm công, ngày giờ, rồi các cột trạng thái/kiểu xác thực
+  (bỏ qua), cách nhau bởi tab / khoảng trắng / dấu phẩy.
+  Ví dụ (ZKTeco 1_attlog.dat): "        1\t2024-01-02 08:00:05\t1\t0\t1\t0"
+- Đọc từng dòng dạng bytes (không nạp cả file), tách ngày bằng cache theo chuỗi ngày,
+  giờ tính thẳng ra số giây; gom vào DayPunchGroups như khi tải từ máy
+- Ghi bằng cùng luồng với tải từ máy (DownloadAttendanceService._persist_rows): lượt chấm,
+  download_attendance, attendance_raw, attendance_audit trong 1 transaction
+- Không đổi mốc đồng bộ của máy (device_sync_state): log trên máy vẫn là nguồn tải tăng dần
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from datetime import date
+from typing import Iterable, Iterator
+
+from services.attendance_punch_services import DayPunchGroups
+from services.download_attendance_services import (
+    DownloadAttendanceService,
+    _DeviceSyncResult,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class AttlogParser:
+    """Parser dòng log chấm công dạng text; đếm số dòng đã đọc / bỏ qua."""
+
+    __slots__ = ("lines", "skipped", "_days")
+
+    def __init__(self) -> None:
+        self.lines = 0
+        self.skipped = 0
+        # Chuỗi ngày -> date (None nếu không đọc được); file chỉ có vài trăm ngày khác nhau
+        self._days: dict[bytes, date | None] = {}
+
+    def _parse_day(self, s: bytes) -> date | None:
+        try:
+            return self._days[s]
+        except KeyError:
+            pass
+        d: date | None = None
+        try:
+            parts = s.replace(b"/", b"-").replace(b".", b"-").split(b"-")
+            if len(parts) == 3:
+                if len(parts[0]) == 4:
+                    d = date(int(parts[0]), int(parts[1]), int(parts[2]))
+                elif len(parts[2]) == 4:
+                    # dd/mm/yyyy
+                    d = date(int(parts[2]), int(parts[1]), int(parts[0]))
+        except ValueError:
+            d = None
+        self._days[s] = d
+        return d
+
+    @staticmethod
+    def _parse_seconds(s: bytes) -> int | None:
+        parts = s.split(b":")
+        if len(parts) not in (2, 3):
+            return None
+        try:
+            h = int(parts[0])
+            m = int(parts[1])
+            sec = int(parts[2]) if len(parts) == 3 else 0
+        except ValueError:
+            return None
+        if not (0 <= h < 24 and 0 <= m < 60 and 0 <= sec < 60):
+            return None
+        return h * 3600 + m * 60 + sec
+
+    def iter_punches(self, lines: Iterable[bytes]) -> Iterator[tuple[str, date, int]]:
+        """Yield (mã chấm công, ngày, số giây trong ngày) cho từng dòng hợp lệ."""
+
+        for line in lines:
+            self.lines += 1
+            if b"," in line:
+                line = line.replace(b",", b" ")
+            tokens = line.split()
+            if not tokens:
+                continue
+            if self.lines == 1 and tokens[0].startswith(b"\xef\xbb\xbf"):
+                tokens[0] = tokens[0][3:]
+                if not tokens[0]:
+                    tokens.pop(0)
+            if len(tokens) < 2:
+                self.skipped += 1
+                continue
+
+            day_tok = tokens[1]
+            if b"T" in day_tok:
+                day_tok, _sep, time_tok = day_tok.partition(b"T")
+            elif len(tokens) >= 3:
+                time_tok = tokens[2]
+            else:
+                self.skipped += 1
+                continue
+
+            day = self._parse_day(day_tok)
+            seconds = self._parse_seconds(time_tok) if day is not None else None
+            if seconds is None:
+                # Dòng tiêu đề / dòng hỏng
+                self.skipped += 1
+                continue
+            try:
+                code = tokens[0].decode("ascii")
+            except UnicodeDecodeError:
+                code = tokens[0].decode("utf-8", "replace")
+            yield code, day, seconds
+
+
+class AttlogImportService:
+    # Báo tiến trình đọc file sau mỗi chừng này dòng
+    PROGRESS_EVERY_LINES = 50_000
+    FILE_FILTER = "Log chấm công (*.dat *.txt *.csv);;Tất cả (*.*)"
+
+    def __init__(self, download_service: DownloadAttendanceService | None = None) -> None:
+        self._download_service = download_service or DownloadAttendanceService()
+
+    def read_file(
+        self,
+        file_path: str,
+        from_date: date | None = None,
+        to_date: date | None = None,
+        progress_cb=None,
+    ) -> tuple[DayPunchGroups, AttlogParser]:
+        """Đọc + gom lượt chấm trong file (lọc theo [from_date, to_date] nếu có)."""
+
+        groups = DayPunchGroups()
+        parser = AttlogParser()
+        total = max(1, os.path.getsize(file_path))
+        with open(file_path, "rb") as f:
+            for code, day, seconds in parser.iter_punches(f):
+                if (from_date is not None and day < from_date) or (
+                    to_date is not None and day > to_date
+                ):
+                    continue
+                groups.add_seconds(code, day, seconds)
+                if progress_cb and parser.lines % self.PROGRESS_EVERY_LINES == 0:
+                    progress_cb(
+                        "download",
+                        f.tell(),
+                        total,
+                        f"Đang đọc file ({parser.lines} dòng)...",
+                    )
+        return groups, parser
+
+    def import_file(
+        self,
+        device_id: int,
+        file_path: str,
+        from_date: date | None = None,
+        to_date: date | None = None,
+        progress_cb=None,
+    ) -> tuple[bool, str, int]:
+        """Nhập file log của 1 máy. Return (ok, message, số dòng ngày công đã ghi).
+
+        progress_cb giống download_from_device: (phase, done, total, message),
+        phase "download" khi đọc file, "save" khi ghi CSDL, "done" khi xong.
+        """
+
+        if not device_id:
+            return False, "Vui lòng chọn máy chấm công của file log.", 0
+        if not file_path or not os.path.isfile(file_path):
+            return False, "Không tìm thấy file log chấm công.", 0
+        if from_date is not None and to_date is not None and from_date > to_date:
+            return False, "'Từ ngày' không được lớn hơn 'Đến ngày'.", 0
+
+        service = self._download_service
+        try:
+            device = service._device_repo.get_device(int(device_id))
+        except Exception:
+            logger.exception("Không đọc được máy chấm công %s", device_id)
+            device = None
+        if not device:
+            return False, "Không tìm thấy máy chấm công.", 0
+
+        try:
+            groups, parser = self.read_file(file_path, from_date, to_date, progress_cb)
+        except OSError as exc:
+            logger.exception("Không đọc được file log %s", file_path)
+            return False, f"Không đọc được file log: {exc}", 0
+
+        if not len(groups):
+            return (
+                False,
+                f"File không có lượt chấm hợp lệ (đã đọc {parser.lines} dòng).",
+                0,
+            )
+
+        roster = service._load_roster(int(device_id)) or {}
+        result = _DeviceSyncResult(device, groups, dict(roster.get("users") or {}))
+        try:
+            if progress_cb:
+                progress_cb("save", 0, len(groups), "Đang lưu vào CSDL...")
+            written = service._persist_rows([result], progress_cb=progress_cb)
+        except Exception:
+            logger.exception("Nhập file log chấm công thất bại")
+            return False, "Không thể lưu dữ liệu. Vui lòng kiểm tra kết nối CSDL.", 0
+
+        if progress_cb:
+            progress_cb("done", written, written, "Hoàn tất")
+        msg = f"Đã nhập {groups.punch_count} lượt chấm ({written} dòng) từ file."
+        if parser.skipped:
+            msg += f" Bỏ qua {parser.skipped} dòng không đọc được."
+        return True, msg, written
@@ -0,0 +1,179 @@
+"""services.auto_sync_services
+
+Tự động tải dữ liệu chấm công chạy nền:
+- Định kỳ (interval_minutes) tải bản ghi mới từ tất cả máy trong bảng devices
+  (DownloadAttendanceService.download_from_devices, tải tăng dần theo mốc từng máy)
+- Không tải trong khung giờ nghỉ (quiet_hours_start..quiet_hours_end, có thể qua nửa đêm)
+- Báo kết quả cho UI qua core.auto_sync_bus
+- Tải xong: tính công (Trễ/Sớm/Giờ/Công/...) cho khoảng ngày vừa tải
+  (ShiftAttendanceMainContent2Service.recompute_timesheets)
+
+Dữ liệu vì vậy luôn gần như mới nhất; cuối tháng bấm tải chỉ còn vài bản ghi.
+Cấu hình đọc lại mỗi chu kỳ (database/auto_sync_settings.json), sửa file không cần
+khởi động lại phần mềm.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from core.auto_sync_bus import auto_sync_bus
+from repository.auto_sync_repository import AutoSyncRepository
+from services.download_attendance_services import (
+    DOWNLOAD_LOCK,
+    DownloadAttendanceService,
+)
+from services.shift_attendance_maincontent2_services import (
+    ShiftAttendanceMainContent2Service,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AutoSyncSettings:
+    enabled: bool = True
+    interval_minutes: int = 15
+    quiet_hours_start: time | None = time(22, 0)
+    quiet_hours_end: time | None = time(6, 0)
+    # Khoảng ngày mỗi lượt tải: hôm nay - lookback_days .. hôm nay
+    lookback_days: int = 31
+    # True: nhận lượt chấm trực tiếp (LiveCaptureService) thay cho tải định kỳ
+    live_capture: bool = False
+
+
+class AutoSyncService:
+    # Chờ sau khi mở phần mềm trước lượt tải đầu tiên (giây)
+    START_DELAY_SECONDS = 60
+    MIN_INTERVAL_MINUTES = 1
+
+    def __init__(
+        self,
+        download_service: DownloadAttendanceService | None = None,
+        repo: AutoSyncRepository | None = None,
+    ) -> None:
+        self._download_service = download_service or DownloadAttendanceService()
+        self._repo = repo or AutoSyncRepository()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @staticmethod
+    def _parse_time(value) -> time | None:
+        s = str(value or "").strip()
+        if not s:
+            return None
+        try:
+            return datetime.strptime(s, "%H:%M").time()
+        except ValueError:
+            return None
+
+    def load_settings(self) -> AutoSyncSettings:
+        data = self._repo.load_settings()
+        default = AutoSyncSettings()
+        try:
+            interval = int(data.get("interval_minutes") or default.interval_minutes)
+        except (TypeError, ValueError):
+            interval = default.interval_minutes
+        try:
+            lookback = int(data.get("lookback_days") or default.lookback_days)
+        except (TypeError, ValueError):
+            lookback = default.lookback_days
+        return AutoSyncSettings(
+            enabled=bool(data.get("enabled", default.enabled)),
+            interval_minutes=max(self.MIN_INTERVAL_MINUTES, interval),
+            quiet_hours_start=(
+                self._parse_time(data["quiet_hours_start"])
+                if "quiet_hours_start" in data
+                else default.quiet_hours_start
+            ),
+            quiet_hours_end=(
+                self._parse_time(data["quiet_hours_end"])
+                if "quiet_hours_end" in data
+                else default.quiet_hours_end
+            ),
+            lookback_days=max(0, lookback),
+            live_capture=bool(data.get("live_capture", default.live_capture)),
+        )
+
+    @staticmethod
+    def is_quiet_time(now: datetime, settings: AutoSyncSettings) -> bool:
+        start, end = settings.quiet_hours_start, settings.quiet_hours_end
+        if start is None or end is None or start == end:
+            return False
+        t = now.time()
+        if start < end:
+            return start <= t < end
+        # Khung giờ qua nửa đêm (vd 22:00..06:00)
+        return t >= start or t < end
+
+    def run_once(
+        self, settings: AutoSyncSettings | None = None, today: date | None = None
+    ) -> tuple[bool, str, int] | None:
+        """Tải 1 lượt từ tất cả máy. Return None nếu bỏ qua (đang có lượt tải khác, ...)."""
+
+        settings = settings or self.load_settings()
+        if not self._download_service.has_zk_library():
+            return None
+        # Đang tải tay (hoặc lượt trước chưa xong): bỏ qua, chu kỳ sau tải tiếp
+        if not DOWNLOAD_LOCK.acquire(blocking=False):
+            logger.info("Tự động tải: đang có lượt tải khác, bỏ qua")
+            return None
+        try:
+            to_date = today or date.today()
+            from_date = to_date - timedelta(days=int(settings.lookback_days))
+            auto_sync_bus.started.emit()
+            try:
+                ok, msg, count = self._download_service.download_from_devices(
+                    None, from_date=from_date, to_date=to_date
+                )
+            except Exception as exc:
+                logger.exception("Tự động tải dữ liệu chấm công thất bại")
+                ok, msg, count = False, f"Không thể tải dữ liệu: {exc}", 0
+            logger.info("Tự động tải: ok=%s, %s dòng. %s", ok, count, msg)
+            if ok and count:
+                try:
+                    written = ShiftAttendanceMainContent2Service().recompute_timesheets(
+                        from_date=from_date.isoformat(), to_date=to_date.isoformat()
+                    )
+                    logger.info("Tự động tải: đã tính công %s dòng", written)
+                except Exception:
+                    logger.exception("Tự động tải: không thể tính công")
+            auto_sync_bus.finished.emit(bool(ok), str(msg or ""), int(count or 0))
+            return ok, msg, count
+        finally:
+            DOWNLOAD_LOCK.release()
+
+    def _loop(self) -> None:
+        wait_seconds = float(self.START_DELAY_SECONDS)
+        while not self._stop.wait(wait_seconds):
+            settings = self.load_settings()
+            wait_seconds = float(settings.interval_minutes * 60)
+            if not settings.enabled or self.is_quiet_time(datetime.now(), settings):
+                continue
+            try:
+                self.run_once(settings)
+            except Exception:
+                # Không để lỗi làm dừng thread nền
+                logger.exception("Tự động tải: lỗi không mong đợi")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="attendance-auto-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """Dừng lịch tải; lượt đang tải dở (thread daemon) không chặn việc thoát app."""
+
+        self._stop.set()
+        thread = self._thread
+        self._thread = None
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
@@ -146,4 +146,7 @@ class CSDLService:
             }
         )
         self._repo.save(config)
+
+        # Đọc lại file vừa lưu + dựng lại pool theo cấu hình mới
+        Database.reload_config()
         return True, "Đã lưu cấu hình và kết nối OK."
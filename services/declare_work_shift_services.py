@@ -3,6 +3,8 @@
 Service layer cho màn "Khai báo Ca làm việc":
 - Validate dữ liệu form
 - CRUD qua DeclareWorkShiftRepository
+- Sửa / xóa ca thì bỏ cache ca đã compile (CompiledShiftCache) dùng khi ghép giờ vào/ra
+  và đưa dòng phụ thuộc vào hàng đợi tính lại kết quả ghép đã lưu (ArrangedRecomputeJob)
 
 Quy ước giờ:
 - Nhập theo HH:MM (24h)
@@ -15,6 +17,11 @@ import logging
 from dataclasses import dataclass
 
 from repository.declare_work_shift_repository import DeclareWorkShiftRepository
+from services.arranged_recompute_services import (
+    ArrangedRecomputeJob,
+    ArrangedRecomputeService,
+)
+from services.shift_matching_services import CompiledShiftCache
 
 
 logger = logging.getLogger(__name__)
@@ -173,6 +180,7 @@ class DeclareWorkShiftService:
 
         try:
             new_id = self._repo.create_work_shift(**parsed)
+            CompiledShiftCache.invalidate()
             return True, "Lưu thành công.", new_id
         except Exception as exc:
             if self._is_duplicate_key(exc):
@@ -192,6 +200,8 @@ class DeclareWorkShiftService:
             affected = self._repo.update_work_shift(int(shift_id), **parsed)
             if affected <= 0:
                 return False, "Không có thay đổi."
+            CompiledShiftCache.invalidate()
+            ArrangedRecomputeJob.notify_shifts_changed([int(shift_id)])
             return True, "Lưu thành công."
         except Exception as exc:
             if self._is_duplicate_key(exc):
@@ -203,10 +213,20 @@ class DeclareWorkShiftService:
         if not shift_id:
             return False, "Vui lòng chọn dòng cần xóa."
 
+        # Xóa ca bỏ ca khỏi lịch trình (ON DELETE SET NULL): tra dòng phụ thuộc trước khi xóa
+        targets = []
+        try:
+            targets = ArrangedRecomputeService().collect_shift_targets([int(shift_id)])
+        except Exception:
+            logger.exception("Không thể tra dòng phụ thuộc ca %s", shift_id)
+
         try:
             affected = self._repo.delete_work_shift(int(shift_id))
             if affected <= 0:
                 return False, "Không tìm thấy dòng cần xóa."
+            CompiledShiftCache.invalidate()
+            if targets:
+                ArrangedRecomputeJob.enqueue(targets)
             return True, "Xóa thành công."
         except Exception:
             logger.exception("Service delete_work_shift thất bại")
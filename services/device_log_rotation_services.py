@@ -0,0 +1,238 @@
+"""services.device_log_rotation_services
+
+Xóa log chấm công trên máy sau khi đã tải + lưu đủ (tùy chọn, mặc định tắt):
+pyzk luôn tải toàn bộ log, máy giữ log càng lâu thì mỗi lần tải càng chậm.
+
+Trình tự (mọi bước lỗi -> không xóa, lần tải sau thử lại):
+1. snapshot: khi tải, log đủ điều kiện (>= min_records bản ghi, bản ghi cũ nhất quá
+   retention_days ngày, mọi bản ghi đọc được) thì gom toàn bộ lượt chấm + checksum
+2. missing_groups: đối chiếu với attendance_punches; lượt chấm chưa lưu (vd ngoài khoảng
+   ngày đã tải) được lưu bổ sung bằng luồng ghi thường, rồi đối chiếu lại
+3. rotate: kết nối máy, tạm khóa máy (disable_device), số bản ghi vẫn đúng như lúc tải
+   thì clear_attendance; ghi device_log_rotations + đưa mốc đồng bộ về 0
+
+Cấu hình trong database/auto_sync_settings.json:
+- log_rotation_enabled (false)
+- log_rotation_min_records: chỉ xóa khi máy có từ chừng này bản ghi
+- log_rotation_retention_days: máy giữ log ít nhất chừng này ngày trước khi xóa
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from core.database import Database
+from repository.attendance_punch_repository import AttendancePunchRepository
+from repository.auto_sync_repository import AutoSyncRepository
+from repository.device_log_rotation_repository import DeviceLogRotationRepository
+from repository.device_sync_state_repository import DeviceSyncStateRepository
+from services.attendance_punch_services import DayPunchGroups
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LogRotationSettings:
+    enabled: bool = False
+    min_records: int = 50000
+    retention_days: int = 90
+
+
+@dataclass
+class DeviceLogSnapshot:
+    record_count: int
+    groups: DayPunchGroups
+    first_record_time: datetime
+    last_record_time: datetime
+    checksum: str
+
+
+class DeviceLogRotationService:
+    CONNECT_TIMEOUT = 15
+
+    def __init__(
+        self,
+        punch_repo: AttendancePunchRepository | None = None,
+        sync_state_repo: DeviceSyncStateRepository | None = None,
+        repo: DeviceLogRotationRepository | None = None,
+        settings_repo: AutoSyncRepository | None = None,
+    ) -> None:
+        self._punch_repo = punch_repo or AttendancePunchRepository()
+        self._sync_state_repo = sync_state_repo or DeviceSyncStateRepository()
+        self._repo = repo or DeviceLogRotationRepository()
+        self._settings_repo = settings_repo or AutoSyncRepository()
+
+    def load_settings(self) -> LogRotationSettings:
+        data = self._settings_repo.load_settings()
+        default = LogRotationSettings()
+        try:
+            min_records = int(data.get("log_rotation_min_records", default.min_records))
+        except (TypeError, ValueError):
+            min_records = default.min_records
+        try:
+            retention = int(
+                data.get("log_rotation_retention_days", default.retention_days)
+            )
+        except (TypeError, ValueError):
+            retention = default.retention_days
+        return LogRotationSettings(
+            enabled=bool(data.get("log_rotation_enabled", default.enabled)),
+            min_records=max(1, min_records),
+            retention_days=max(0, retention),
+        )
+
+    @staticmethod
+    def checksum(groups: DayPunchGroups) -> str:
+        digest = hashlib.sha1()
+        for key in sorted(groups.keys(), key=lambda k: (k[1], k[0])):
+            code, day = key
+            secs = ",".join(str(s) for s in groups.seconds(key))
+            digest.update(f"{code}\x1f{day.isoformat()}\x1f{secs}\x1e".encode("utf-8"))
+        return digest.hexdigest()
+
+    def snapshot(
+        self,
+        punches: Iterable[tuple[str, datetime] | None],
+        record_count: int,
+        settings: LogRotationSettings | None = None,
+        now: datetime | None = None,
+    ) -> DeviceLogSnapshot | None:
+        """Gom toàn bộ log máy nếu đủ điều kiện xóa; None nếu không.
+
+        punches: từng bản ghi log đã chuẩn hoá (None = bản ghi không đọc được).
+        Có bản ghi không đọc được thì không xóa (không đối chiếu được với CSDL).
+        """
+
+        settings = settings or self.load_settings()
+        if not settings.enabled or record_count < settings.min_records:
+            return None
+
+        groups = DayPunchGroups()
+        first: datetime | None = None
+        last: datetime | None = None
+        valid = 0
+        for p in punches:
+            if p is None:
+                continue
+            code, ts = p
+            ts = ts.replace(microsecond=0)
+            groups.add(code, ts)
+            valid += 1
+            if first is None or ts < first:
+                first = ts
+            if last is None or ts > last:
+                last = ts
+
+        if valid != record_count or first is None or last is None:
+            if valid != record_count:
+                logger.info(
+                    "Không xóa log máy: %s/%s bản ghi đọc được", valid, record_count
+                )
+            return None
+        if first > (now or datetime.now()) - timedelta(days=settings.retention_days):
+            return None
+        return DeviceLogSnapshot(record_count, groups, first, last, self.checksum(groups))
+
+    def missing_groups(self, device_no: int, snap: DeviceLogSnapshot) -> DayPunchGroups:
+        """Lượt chấm trong log máy chưa có trong attendance_punches (theo device_no)."""
+
+        stored = DayPunchGroups()
+        for batch in self._punch_repo.iter_punches(
+            from_dt=snap.first_record_time,
+            to_dt=snap.last_record_time,
+            device_no=int(device_no),
+        ):
+            for r in batch:
+                ts = r.get("punched_at")
+                if isinstance(ts, datetime):
+                    stored.add(str(r.get("attendance_code") or ""), ts)
+
+        missing = DayPunchGroups()
+        for key in snap.groups.keys():
+            have = set(stored.seconds(key)) if key in stored else set()
+            for s in snap.groups.seconds(key):
+                if s not in have:
+                    missing.add_seconds(key[0], key[1], s)
+        return missing
+
+    def rotate(self, ZK, device: dict, snap: DeviceLogSnapshot) -> tuple[bool, str]:
+        """Xóa log trên máy (đã đối chiếu đủ); return (ok, message)."""
+
+        device_id = int(device.get("id") or 0)
+        try:
+            password = int(str(device.get("password") or "") or 0)
+        except Exception:
+            password = 0
+
+        zk = ZK(
+            str(device.get("ip_address") or ""),
+            port=int(device.get("port") or 4370),
+            timeout=self.CONNECT_TIMEOUT,
+            password=password,
+        )
+        conn = zk.connect()
+        try:
+            # Khóa máy để không có lượt chấm mới giữa lúc kiểm tra và lúc xóa
+            conn.disable_device()
+            try:
+                conn.read_sizes()
+                records = int(getattr(conn, "records", -1))
+                if records != snap.record_count:
+                    return (
+                        False,
+                        f"Máy có {records} bản ghi (lúc tải {snap.record_count}), chưa xóa log.",
+                    )
+                conn.clear_attendance()
+            finally:
+                conn.enable_device()
+        finally:
+            try:
+                conn.disconnect()
+            except Exception:
+                pass
+
+        state = None
+        try:
+            state = self._sync_state_repo.get_state(device_id)
+        except Exception:
+            logger.warning("Không đọc được device_sync_state cho máy %s", device_id)
+        covered_from = (state or {}).get("covered_from")
+        if isinstance(covered_from, datetime):
+            covered_from = covered_from.date()
+        if not isinstance(covered_from, date):
+            covered_from = snap.first_record_time.date()
+
+        try:
+            with Database.transaction():
+                self._repo.insert_rotation(
+                    {
+                        "device_id": device_id,
+                        "device_no": int(device.get("device_no") or 0),
+                        "record_count": snap.record_count,
+                        "punch_count": snap.groups.punch_count,
+                        "first_record_time": snap.first_record_time,
+                        "last_record_time": snap.last_record_time,
+                        "checksum": snap.checksum,
+                    }
+                )
+                # Log máy đã rỗng: lần tải sau đọc lại từ bản ghi đầu tiên
+                self._sync_state_repo.upsert_states(
+                    [
+                        {
+                            "device_id": device_id,
+                            "last_serial": 0,
+                            "last_record_time": None,
+                            "record_count": 0,
+                            "covered_from": covered_from,
+                        }
+                    ]
+                )
+        except Exception:
+            # Dữ liệu đã lưu đủ trước khi xóa; lần tải sau tự nhận ra log máy đã đổi
+            logger.exception("Đã xóa log máy %s nhưng không ghi được lịch sử", device_id)
+        return True, f"Đã xóa {snap.record_count} bản ghi trên máy (đã lưu đủ vào CSDL)."
@@ -9,6 +9,9 @@ Ghi chú về kết nối:
 - Nhiều thiết bị Ronald Jack/SenseFace dùng giao thức ZKTeco (port thường 4370).
 - Nếu cài thư viện `zk` (pyzk), service sẽ thử connect thật.
 - Nếu chưa có thư viện, service vẫn có thể test TCP port để kiểm tra thiết bị reachable.
+- probe_devices: kiểm tra song song tất cả máy (TCP + handshake ZK tùy chọn), kết quả
+  lưu cache HEALTH_TTL_SECONDS giây để màn thiết bị hiển thị và để tải nhiều máy bỏ qua
+  máy đang không phản hồi thay vì chờ hết các lần retry.
 """
 
 from __future__ import annotations
@@ -16,6 +19,9 @@ from __future__ import annotations
 import importlib.util
 import logging
 import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 from repository.device_repository import DeviceRepository
@@ -35,9 +41,30 @@ class DeviceModel:
     port: int
 
 
+@dataclass(frozen=True)
+class DeviceHealth:
+    device_id: int
+    ip_address: str
+    port: int
+    reachable: bool
+    # None: không thử handshake ZK
+    handshake: bool | None
+    latency_ms: float | None
+    message: str
+    checked_at: float  # time.monotonic()
+    checked_wall: float  # time.time(), để hiển thị
+
+
 class DeviceService:
     DEFAULT_PORT = 4370
 
+    # Cache trạng thái máy (dùng chung mọi instance, mọi thread)
+    HEALTH_TTL_SECONDS = 60.0
+    PROBE_TIMEOUT_SECONDS = 3.0
+    MAX_PARALLEL_PROBES = 16
+    _health_cache: dict[int, DeviceHealth] = {}
+    _health_lock = threading.Lock()
+
     DEVICE_TYPE_X629ID = "X629ID"
     DEVICE_TYPE_SENSEFACE_A4 = "SENSEFACE_A4"
 
@@ -120,6 +147,7 @@ class DeviceService:
 
         try:
             affected = self._repo.update_device(device_id=int(device_id), **parsed)
+            self.forget_health(int(device_id))
             if affected <= 0:
                 return False, "Không có thay đổi."
             return True, "Lưu thành công."
@@ -133,6 +161,7 @@ class DeviceService:
 
         try:
             affected = self._repo.delete_device(int(device_id))
+            self.forget_health(int(device_id))
             if affected <= 0:
                 return False, "Không tìm thấy dòng cần xóa."
             return True, "Xóa thành công."
@@ -220,6 +249,154 @@ class DeviceService:
         except Exception:
             return False
 
+    # -----------------
+    # Health probe (song song + cache)
+    # -----------------
+    @classmethod
+    def get_cached_health(
+        cls, device_id: int, ip: str | None = None, port: int | None = None
+    ) -> DeviceHealth | None:
+        """Trạng thái còn hạn (HEALTH_TTL_SECONDS); None nếu chưa có / hết hạn / đổi IP-port."""
+
+        with cls._health_lock:
+            h = cls._health_cache.get(int(device_id))
+        if h is None:
+            return None
+        if time.monotonic() - h.checked_at > cls.HEALTH_TTL_SECONDS:
+            return None
+        if ip is not None and str(ip).strip() != h.ip_address:
+            return None
+        if port is not None and int(port or cls.DEFAULT_PORT) != h.port:
+            return None
+        return h
+
+    @classmethod
+    def record_health(
+        cls,
+        device_id: int,
+        ip: str,
+        port: int,
+        reachable: bool,
+        message: str = "",
+        handshake: bool | None = None,
+        latency_ms: float | None = None,
+    ) -> DeviceHealth:
+        """Ghi trạng thái vào cache (probe hoặc kết quả tải dữ liệu)."""
+
+        h = DeviceHealth(
+            device_id=int(device_id),
+            ip_address=str(ip or "").strip(),
+            port=int(port or cls.DEFAULT_PORT),
+            reachable=bool(reachable),
+            handshake=handshake,
+            latency_ms=latency_ms,
+            message=str(message or ""),
+            checked_at=time.monotonic(),
+            checked_wall=time.time(),
+        )
+        with cls._health_lock:
+            cls._health_cache[h.device_id] = h
+        return h
+
+    @classmethod
+    def forget_health(cls, device_id: int) -> None:
+        with cls._health_lock:
+            cls._health_cache.pop(int(device_id), None)
+
+    def _probe_one(
+        self, device: dict, timeout: float, handshake: bool
+    ) -> DeviceHealth:
+        device_id = int(device.get("id") or 0)
+        ip = str(device.get("ip_address") or "").strip()
+        try:
+            port = int(device.get("port") or self.DEFAULT_PORT)
+        except Exception:
+            port = self.DEFAULT_PORT
+
+        started = time.perf_counter()
+        if not self.test_connection_tcp(ip, port, timeout=timeout):
+            return self.record_health(
+                device_id, ip, port, False, "Không phản hồi TCP", None, None
+            )
+        latency_ms = (time.perf_counter() - started) * 1000.0
+
+        hs: bool | None = None
+        message = "Đang hoạt động"
+        if handshake and importlib.util.find_spec("zk") is not None:
+            # 1 lần connect với timeout ngắn (không retry như _connect_zkteco)
+            try:
+                from zk import ZK  # type: ignore
+
+                try:
+                    pwd = int(str(device.get("password") or "") or 0)
+                except Exception:
+                    pwd = 0
+                conn = ZK(
+                    ip,
+                    port=port,
+                    timeout=max(1, int(round(timeout))),
+                    password=pwd,
+                    ommit_ping=True,
+                ).connect()
+                try:
+                    conn.disconnect()
+                except Exception:
+                    pass
+                hs = True
+            except Exception as exc:
+                hs = False
+                message = f"TCP OK, handshake ZK lỗi: {exc}"
+        return self.record_health(
+            device_id, ip, port, hs is not False, message, hs, latency_ms
+        )
+
+    def probe_devices(
+        self,
+        devices: list[dict] | None = None,
+        timeout: float | None = None,
+        handshake: bool = False,
+        max_workers: int | None = None,
+        use_cache: bool = False,
+    ) -> dict[int, DeviceHealth]:
+        """Kiểm tra song song nhiều máy; mỗi máy tối đa timeout giây (TCP + handshake).
+
+        devices=None: tất cả máy trong bảng devices (dict như DeviceRepository.list_devices).
+        use_cache=True: máy còn trạng thái trong cache thì không kiểm tra lại.
+        Return {device_id: DeviceHealth}; kết quả cũng được ghi vào cache.
+        """
+
+        if devices is None:
+            devices = list(self._repo.list_devices() or [])
+        t = float(timeout or self.PROBE_TIMEOUT_SECONDS)
+
+        result: dict[int, DeviceHealth] = {}
+        pending: list[dict] = []
+        for d in devices:
+            try:
+                did = int(d.get("id") or 0)
+            except Exception:
+                continue
+            if not did:
+                continue
+            cached = (
+                self.get_cached_health(did, d.get("ip_address"), d.get("port"))
+                if use_cache
+                else None
+            )
+            if cached is not None:
+                result[did] = cached
+            else:
+                pending.append(d)
+
+        if pending:
+            workers = max(1, min(int(max_workers or self.MAX_PARALLEL_PROBES), len(pending)))
+            with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="device-probe"
+            ) as pool:
+                for h in pool.map(lambda d: self._probe_one(d, t, handshake), pending):
+                    result[h.device_id] = h
+        return result
+
     def connect_ronald_jack_x629id(
         self, ip: str, port: int = DEFAULT_PORT, password: str = ""
     ) -> tuple[bool, str]:
@@ -2,28 +2,50 @@
 
 Service cho nghiệp vụ "Tải dữ liệu Máy chấm công":
 - Lấy danh sách máy từ bảng devices
-- Tải log chấm công từ thiết bị (ZKTeco/pyzk nếu có)
+- Tải log chấm công từ thiết bị (ZKTeco/pyzk nếu có), 1 máy hoặc nhiều máy song song
 - Gom nhóm theo (attendance_code, work_date) để tạo tối đa 3 cặp vào/ra
-- Upsert vào download_attendance và attendance_raw
+- Upsert vào download_attendance, attendance_raw (mỗi máy 1 dòng) và attendance_audit
+  (1 dòng tổng hợp mọi máy, bỏ quẹt lặp - AttendancePunchService.merge_to_audit)
+  trong 1 transaction (chỉ ngày có lượt chấm; ngày không chấm công sinh lúc truy vấn
+  từ calendar_days)
 - Xóa bảng download_attendance khi đóng phần mềm (best-effort)
+- Tùy chọn xóa log trên máy sau khi đã lưu đủ (DeviceLogRotationService, mặc định tắt)
 """
 
 from __future__ import annotations
 
+import hashlib
 import importlib.util
 import logging
+import threading
 import time as time_module
-from dataclasses import dataclass
-from datetime import date, datetime, time, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
 
+from core.database import Database
 from repository.device_repository import DeviceRepository
+from repository.device_sync_state_repository import DeviceSyncStateRepository
+from repository.device_user_repository import DeviceUserRepository
 from repository.download_attendance_repository import DownloadAttendanceRepository
-from repository.attendance_audit_repository import AttendanceAuditRepository
-from repository.employee_repository import EmployeeRepository
+from repository.attendance_punch_repository import AttendancePunchRepository
+from services.device_services import DeviceService
+from services.attendance_punch_services import AttendancePunchService, DayPunchGroups
+from services.device_log_rotation_services import (
+    DeviceLogRotationService,
+    DeviceLogSnapshot,
+)
 
 
 logger = logging.getLogger(__name__)
 
+# Giá trị id giả cho mục "Tất cả máy" trong combobox
+ALL_DEVICES_ID = -1
+
+# Mỗi lúc chỉ 1 lượt tải (tải tay trên màn hình hoặc tự động chạy nền - AutoSyncService),
+# tránh 2 lượt cùng kết nối 1 máy và cùng ghi mốc đồng bộ.
+DOWNLOAD_LOCK = threading.Lock()
+
 
 @dataclass(frozen=True)
 class DownloadAttendanceRow:
@@ -41,18 +63,55 @@ class DownloadAttendanceRow:
     device_name: str
 
 
+@dataclass
+class _DeviceSyncResult:
+    device: dict
+    groups: DayPunchGroups = field(default_factory=DayPunchGroups)
+    user_name_by_id: dict[str, str] = field(default_factory=dict)
+    sync_state: dict | None = None
+    incremental: bool = False
+    roster: dict | None = None
+    error: str | None = None
+    # Toàn bộ log máy khi đủ điều kiện xóa log sau khi lưu (None = không xóa)
+    rotation: DeviceLogSnapshot | None = None
+
+
 class DownloadAttendanceService:
+    # Số máy tải song song tối đa ở chế độ "Tất cả máy" (mỗi máy 1 kết nối TCP riêng).
+    MAX_PARALLEL_DEVICES = 4
+    # Số (mã, ngày) dựng dòng + ghi DB mỗi lô; RAM lúc ghi không tăng theo số log.
+    PERSIST_BATCH_SIZE = 2000
+    # Từ số dòng ngày công này trở lên (vd lần tải đầu của máy có nhiều năm log): ghi qua
+    # bảng tạm + câu SQL tập hợp (Database.bulk_insert) thay cho upsert từng dòng.
+    BULK_MIN_ROWS = 20000
+
+    _MSG_DEVICE_TYPE_MISSING = (
+        "Chưa thiết lập loại máy chấm công cho thiết bị này. Vui lòng vào mục 'Thiết bị' "
+        "và chọn đúng loại máy (SenseFace A4 hoặc X629ID) rồi lưu lại."
+    )
+
     def __init__(
         self,
         repo: DownloadAttendanceRepository | None = None,
         device_repo: DeviceRepository | None = None,
+        zk_class=None,
     ) -> None:
         self._repo = repo or DownloadAttendanceRepository()
+        # Thay class ZK của pyzk (vd: tools.zk_simulator) để chạy thử/benchmark không cần máy
+        self._zk_class = zk_class
         self._device_repo = device_repo or DeviceRepository()
-        self._audit_repo = AttendanceAuditRepository()
-        self._employee_repo = EmployeeRepository()
+        self._sync_state_repo = DeviceSyncStateRepository()
+        self._device_user_repo = DeviceUserRepository()
+        self._punch_repo = AttendancePunchRepository()
+        self._device_service = DeviceService(self._device_repo)
+        self._punch_service = AttendancePunchService(
+            self._punch_repo, self._repo, self._device_repo
+        )
+        self._rotation_service = DeviceLogRotationService(
+            self._punch_repo, self._sync_state_repo
+        )
 
-    def list_devices_for_combo(self) -> list[tuple[int, str]]:
+    def list_devices_for_combo(self, include_all: bool = False) -> list[tuple[int, str]]:
         rows = self._device_repo.list_devices()
         result: list[tuple[int, str]] = []
         for r in rows:
@@ -60,10 +119,13 @@ class DownloadAttendanceService:
                 result.append((int(r.get("id")), str(r.get("device_name") or "")))
             except Exception:
                 continue
+        # Mục cuối để không đổi máy được chọn mặc định
+        if include_all and len(result) > 1:
+            result.append((ALL_DEVICES_ID, "Tất cả máy"))
         return result
 
     def get_device_no_by_id(self, device_id: int | None) -> int | None:
-        if not device_id:
+        if not device_id or device_id == ALL_DEVICES_ID:
             return None
         try:
             device = self._device_repo.get_device(int(device_id))
@@ -77,6 +139,8 @@ class DownloadAttendanceService:
             return None
 
     def has_zk_library(self) -> bool:
+        if self._zk_class is not None:
+            return True
         try:
             return importlib.util.find_spec("zk") is not None
         except Exception:
@@ -158,151 +222,114 @@ class DownloadAttendanceService:
             except Exception:
                 continue
 
-        # Nếu có khoảng ngày, sinh thêm các ngày trống (không có log) để UI/export
-        # vẫn hiển thị đủ from_date..to_date.
-        if from_date is None or to_date is None:
-            return result
-        if from_date > to_date:
-            return result
-
-        codes: list[str] = []
-        name_by_code: dict[str, str] = {}
-        device_name_by_code: dict[str, str] = {}
-        by_key: dict[tuple[str, date], DownloadAttendanceRow] = {}
+        # Ngày không chấm công đã được sinh sẵn ở câu truy vấn (calendar_days)
+        return result
 
-        for it in result:
-            code = str(it.attendance_code or "").strip()
-            if not code:
-                continue
-            if code not in name_by_code:
-                name_by_code[code] = str(it.name_on_mcc or "").strip()
-            if code not in device_name_by_code:
-                device_name_by_code[code] = str(it.device_name or "").strip()
-            by_key[(code, it.work_date)] = it
-
-        codes = sorted(name_by_code.keys())
-        if not codes:
-            return result
-
-        days = (to_date - from_date).days
-        filled: list[DownloadAttendanceRow] = []
-        for offset in range(days + 1):
-            d = from_date + timedelta(days=offset)
-            for code in codes:
-                existing = by_key.get((code, d))
-                if existing is not None:
-                    filled.append(existing)
-                    continue
-                filled.append(
-                    DownloadAttendanceRow(
-                        attendance_code=code,
-                        name_on_mcc=str(name_by_code.get(code) or ""),
-                        work_date=d,
-                        time_in_1=None,
-                        time_out_1=None,
-                        time_in_2=None,
-                        time_out_2=None,
-                        time_in_3=None,
-                        time_out_3=None,
-                        device_no=int(device_no or 0),
-                        device_id=None,
-                        device_name=str(device_name_by_code.get(code) or ""),
-                    )
-                )
+    def _import_zk(self):
+        """Return (ZK class, error_message)."""
 
-        # Sắp xếp giống query: ngày tăng dần, mã tăng dần
-        filled.sort(key=lambda x: (x.work_date, str(x.attendance_code or "")))
-        return filled
+        if self._zk_class is not None:
+            return self._zk_class, None
+        if importlib.util.find_spec("zk") is None:
+            return (
+                None,
+                "Chưa cài thư viện 'zk' (pyzk) nên không thể tải dữ liệu từ máy.",
+            )
+        try:
+            from zk import ZK  # type: ignore
+        except Exception:
+            return None, "Không thể import thư viện 'zk'."
+        return ZK, None
 
-    def download_from_device(
+    def _fetch_device_logs(
         self,
-        device_id: int,
-        from_date: date,
-        to_date: date,
+        ZK,
+        device: dict,
         progress_cb=None,
-    ) -> tuple[bool, str, int]:
-        """Tải dữ liệu từ máy và lưu DB.
-
-        progress_cb signature (optional): (phase: str, done: int, total: int, message: str) -> None
-        phase in: "connect", "download", "save", "done" (backward compatible: may emit "fetch")
+        known_serial: int | None = None,
+        cached_roster: dict | None = None,
+    ) -> tuple[dict[str, str], list | None, int, str | None, int | None]:
+        """Kết nối máy (retry + tăng timeout) và tải user + log chấm công.
+
+        Return (user_name_by_id, logs, record_count, error_message, fetched_user_count).
+        error_message is None on success.
+        known_serial: số bản ghi đã đồng bộ lần trước; nếu máy không có bản ghi mới thì
+        bỏ qua bước tải log (logs=None) vì pyzk luôn tải toàn bộ log.
+        cached_roster: danh sách user đã lưu (device_users); nếu số user trên máy vẫn bằng
+        user_count đã lưu thì dùng lại, không gọi get_users(). fetched_user_count là số user
+        trên máy khi đã tải lại danh sách (None nếu dùng lại bản đã lưu).
+        Chỉ làm I/O với thiết bị (không đụng DB) nên chạy song song được nhiều máy.
         """
 
-        if not device_id:
-            return False, "Vui lòng chọn máy chấm công.", 0
-
-        if from_date > to_date:
-            return False, "'Từ ngày' không được lớn hơn 'Đến ngày'.", 0
-
-        device = self._device_repo.get_device(int(device_id))
-        if not device:
-            return False, "Không tìm thấy máy chấm công.", 0
-
-        device_no = int(device.get("device_no") or 0)
-        device_name = str(device.get("device_name") or "")
-        device_type = str(device.get("device_type") or "")
         ip = str(device.get("ip_address") or "")
-        password_raw = str(device.get("password") or "")
         port = int(device.get("port") or 4370)
-
-        expected_kind = self._expected_device_kind(device_type)
-        if expected_kind is None:
-            return (
-                False,
-                "Chưa thiết lập loại máy chấm công cho thiết bị này. Vui lòng vào mục 'Thiết bị' và chọn đúng loại máy (SenseFace A4 hoặc X629ID) rồi lưu lại.",
-                0,
-            )
-
-        if importlib.util.find_spec("zk") is None:
-            return (
-                False,
-                "Chưa cài thư viện 'zk' (pyzk) nên không thể tải dữ liệu từ máy.",
-                0,
-            )
-
+        expected_kind = self._expected_device_kind(str(device.get("device_type") or ""))
         try:
-            from zk import ZK  # type: ignore
+            password = int(str(device.get("password") or "") or 0)
         except Exception:
-            return False, "Không thể import thư viện 'zk'.", 0
+            password = 0
 
         def _is_timeout_error(exc: Exception) -> bool:
             msg = str(exc).lower()
             return "timed out" in msg or "timeout" in msg
 
-        def _fetch_attendance_with_retry() -> tuple[list, str | None]:
-            """Return (logs, error_message). error_message is None on success."""
-            base_timeout = 15
-            max_attempts = 3
-
-            last_err: Exception | None = None
-            for attempt in range(1, max_attempts + 1):
-                timeout = base_timeout + (attempt - 1) * 10
-                if progress_cb:
-                    progress_cb(
-                        "connect",
-                        attempt - 1,
-                        max_attempts,
-                        f"Đang kết nối tới máy... (lần {attempt}/{max_attempts})",
-                    )
+        base_timeout = 15
+        max_attempts = 3
+
+        last_err: Exception | None = None
+        for attempt in range(1, max_attempts + 1):
+            timeout = base_timeout + (attempt - 1) * 10
+            if progress_cb:
+                progress_cb(
+                    "connect",
+                    attempt - 1,
+                    max_attempts,
+                    f"Đang kết nối tới máy... (lần {attempt}/{max_attempts})",
+                )
 
+            try:
+                zk = ZK(ip, port=port, timeout=timeout, password=password)
+                conn = zk.connect()
                 try:
-                    zk = ZK(ip, port=port, timeout=timeout, password=password)
-                    conn = zk.connect()
+                    if progress_cb:
+                        progress_cb(
+                            "connect",
+                            max_attempts,
+                            max_attempts,
+                            "Kết nối thành công.",
+                        )
+
+                    # Số user/bản ghi trên máy (rẻ, không tải dữ liệu)
+                    record_count = -1
+                    user_count = -1
                     try:
-                        if progress_cb:
-                            progress_cb(
-                                "connect",
-                                max_attempts,
-                                max_attempts,
-                                "Kết nối thành công.",
-                            )
-
-                        # Fetch user list (best-effort) to map user_id -> name on device
-                        user_name_by_id: dict[str, str] = {}
+                        fn_sizes = getattr(conn, "read_sizes", None)
+                        if callable(fn_sizes):
+                            fn_sizes()
+                            record_count = int(getattr(conn, "records", -1))
+                            user_count = int(getattr(conn, "users", -1))
+                    except Exception:
+                        record_count = -1
+                        user_count = -1
+
+                    # Danh sách user -> tên trên máy: dùng lại bản đã lưu nếu số user không đổi
+                    user_name_by_id: dict[str, str] = {}
+                    fetched_user_count: int | None = None
+                    if (
+                        cached_roster is not None
+                        and user_count >= 0
+                        and user_count == int(cached_roster.get("user_count") or 0)
+                    ):
+                        user_name_by_id = dict(cached_roster.get("users") or {})
+                    else:
                         try:
                             users = None
                             fn_users = getattr(conn, "get_users", None)
                             if callable(fn_users):
                                 users = fn_users() or []
+                                fetched_user_count = (
+                                    user_count if user_count >= 0 else len(users)
+                                )
                             for u in users or []:
                                 try:
                                     uid = str(getattr(u, "user_id", "") or "").strip()
@@ -313,267 +340,645 @@ class DownloadAttendanceService:
                                     continue
                         except Exception:
                             user_name_by_id = {}
+                            fetched_user_count = None
 
-                        # Nhận dạng thiết bị sau khi connect để tránh chọn nhầm loại máy
-                        info_parts: list[str] = []
-                        try:
-                            for attr in (
-                                "get_device_name",
-                                "get_platform",
-                                "get_serialnumber",
-                                "get_firmware_version",
-                            ):
-                                fn = getattr(conn, attr, None)
-                                if callable(fn):
-                                    v = fn()
-                                    if v:
-                                        info_parts.append(str(v))
-                        except Exception:
-                            pass
+                    # Nhận dạng thiết bị sau khi connect để tránh chọn nhầm loại máy
+                    info_parts: list[str] = []
+                    try:
+                        for attr in (
+                            "get_device_name",
+                            "get_platform",
+                            "get_serialnumber",
+                            "get_firmware_version",
+                        ):
+                            fn = getattr(conn, attr, None)
+                            if callable(fn):
+                                v = fn()
+                                if v:
+                                    info_parts.append(str(v))
+                    except Exception:
+                        pass
+
+                    info = " | ".join(info_parts)
+                    detected_kind = (
+                        self._detect_device_kind_from_info(info) if info else None
+                    )
 
-                        info = " | ".join(info_parts)
-                        detected_kind = (
-                            self._detect_device_kind_from_info(info) if info else None
+                    # Chỉ chặn khi phát hiện chắc chắn đang kết nối nhầm dòng máy
+                    if detected_kind is not None and detected_kind != expected_kind:
+                        return (
+                            {},
+                            [],
+                            0,
+                            "Đang kết nối nhầm loại máy chấm công. "
+                            f"Máy đã chọn: {self._device_kind_label(expected_kind)}; "
+                            f"Thiết bị thực tế: {self._device_kind_label(detected_kind)}. "
+                            f"Thông tin thiết bị: {info}",
+                            None,
                         )
 
-                        # Chỉ chặn khi phát hiện chắc chắn đang kết nối nhầm dòng máy
-                        if detected_kind is not None and detected_kind != expected_kind:
-                            return (
-                                [],
-                                "Đang kết nối nhầm loại máy chấm công. "
-                                f"Máy đã chọn: {self._device_kind_label(expected_kind)}; "
-                                f"Thiết bị thực tế: {self._device_kind_label(detected_kind)}. "
-                                f"Thông tin thiết bị: {info}",
-                            )
-
+                    # Bỏ qua tải log khi máy không có bản ghi mới
+                    if known_serial is not None and record_count == known_serial:
                         if progress_cb:
-                            progress_cb(
-                                "download",
-                                0,
-                                0,
-                                "Đang tải dữ liệu chấm công...",
-                            )
+                            progress_cb("download", 1, 1, "Không có dữ liệu mới trên máy.")
+                        return (
+                            user_name_by_id,
+                            None,
+                            record_count,
+                            None,
+                            fetched_user_count,
+                        )
 
-                        logs = conn.get_attendance() or []
+                    if progress_cb:
+                        progress_cb(
+                            "download",
+                            0,
+                            0,
+                            "Đang tải dữ liệu chấm công...",
+                        )
 
-                        if progress_cb:
-                            progress_cb(
-                                "download",
-                                1,
-                                1,
-                                "Tải dữ liệu thành công.",
-                            )
-                        # Attach mapping to outer scope by returning via closure var
-                        return ([(user_name_by_id, logs)], None)
-                    finally:
-                        try:
-                            conn.disconnect()
-                        except Exception:
-                            pass
-                except Exception as e:
-                    last_err = e
-                    logger.warning(
-                        "Tải dữ liệu từ máy thất bại (lần %s/%s) ip=%s port=%s timeout=%s: %s",
-                        attempt,
-                        max_attempts,
-                        ip,
-                        port,
-                        timeout,
-                        e,
-                    )
+                    logs = conn.get_attendance() or []
 
-                    if attempt < max_attempts:
-                        # backoff nhẹ để tránh spam thiết bị
-                        time_module.sleep(1.0)
-                        continue
+                    if progress_cb:
+                        progress_cb(
+                            "download",
+                            1,
+                            1,
+                            "Tải dữ liệu thành công.",
+                        )
+                    return user_name_by_id, logs, len(logs), None, fetched_user_count
+                finally:
+                    try:
+                        conn.disconnect()
+                    except Exception:
+                        pass
+            except Exception as e:
+                last_err = e
+                logger.warning(
+                    "Tải dữ liệu từ máy thất bại (lần %s/%s) ip=%s port=%s timeout=%s: %s",
+                    attempt,
+                    max_attempts,
+                    ip,
+                    port,
+                    timeout,
+                    e,
+                )
 
-            if last_err is None:
-                return [], "Không thể kết nối tới thiết bị."
+                if attempt < max_attempts:
+                    # backoff nhẹ để tránh spam thiết bị
+                    time_module.sleep(1.0)
+                    continue
 
-            if _is_timeout_error(last_err):
-                return (
-                    [],
-                    f"Thiết bị không phản hồi (timeout) khi tải dữ liệu. Vui lòng kiểm tra mạng/điện/port. (IP: {ip}, Port: {port})",
-                )
+        if last_err is None:
+            return {}, [], 0, "Không thể kết nối tới thiết bị.", None
 
+        if _is_timeout_error(last_err):
             return (
+                {},
                 [],
-                f"Không thể tải dữ liệu từ thiết bị. (IP: {ip}, Port: {port})",
+                0,
+                f"Thiết bị không phản hồi (timeout) khi tải dữ liệu. Vui lòng kiểm tra mạng/điện/port. (IP: {ip}, Port: {port})",
+                None,
             )
 
+        return (
+            {},
+            [],
+            0,
+            f"Không thể tải dữ liệu từ thiết bị. (IP: {ip}, Port: {port})",
+            None,
+        )
+
+    @staticmethod
+    def _log_punch(a) -> tuple[str, datetime] | None:
+        """Chuẩn hoá 1 bản ghi log pyzk -> (user_id, timestamp); None nếu không hợp lệ."""
+
         try:
-            try:
-                password = int(password_raw or 0)
-            except Exception:
-                password = 0
+            user_id = str(getattr(a, "user_id", "") or "")
+            ts = getattr(a, "timestamp", None)
+            if not user_id or ts is None:
+                return None
+            if isinstance(ts, date) and not isinstance(ts, datetime):
+                ts = datetime.combine(ts, time.min)
+            if not isinstance(ts, datetime):
+                return None
+            return user_id, ts
+        except Exception:
+            return None
 
-            # Retry + tăng timeout để giảm lỗi ZKNetworkError: timed out
-            fetched, fetch_err = _fetch_attendance_with_retry()
-            if fetch_err:
-                return False, fetch_err, 0
+    def _load_sync_state(self, device_id: int) -> dict | None:
+        try:
+            return self._sync_state_repo.get_state(int(device_id))
+        except Exception:
+            logger.warning("Không đọc được device_sync_state cho máy %s", device_id)
+            return None
 
-            # unpack closure-returned data
-            user_name_by_id, logs = fetched[0]
+    def _load_roster(self, device_id: int) -> dict | None:
+        try:
+            return self._device_user_repo.get_roster(int(device_id))
+        except Exception:
+            logger.warning("Không đọc được device_users cho máy %s", device_id)
+            return None
 
-            # Filter logs by date range
-            start_dt = datetime.combine(from_date, time.min)
-            end_dt = datetime.combine(to_date, time.max)
+    @staticmethod
+    def _roster_fingerprint(user_name_by_id: dict[str, str]) -> str:
+        digest = hashlib.sha1()
+        for uid in sorted(user_name_by_id):
+            digest.update(f"{uid}\x1f{user_name_by_id[uid]}\x1e".encode("utf-8"))
+        return digest.hexdigest()
 
-            filtered: list[tuple[str, datetime]] = []
-            for a in logs:
-                try:
-                    user_id = str(getattr(a, "user_id", "") or "")
-                    ts = getattr(a, "timestamp", None)
-                    if not user_id or ts is None:
-                        continue
-                    if isinstance(ts, date) and not isinstance(ts, datetime):
-                        ts = datetime.combine(ts, time.min)
-                    if not isinstance(ts, datetime):
-                        continue
-                    if ts < start_dt or ts > end_dt:
-                        continue
-                    filtered.append((user_id, ts))
-                except Exception:
-                    continue
+    @staticmethod
+    def _can_sync_incrementally(
+        state: dict | None, from_date: date, full_resync: bool
+    ) -> bool:
+        """Chỉ tải tăng dần khi vùng đã đồng bộ bao trùm 'Từ ngày' của lần tải này."""
 
-            # Group by (user_id, work_date)
-            groups: dict[tuple[str, date], list[datetime]] = {}
-            for user_id, ts in filtered:
-                key = (user_id, ts.date())
-                groups.setdefault(key, []).append(ts)
-
-            # Build rows (max 6 timestamps -> 3 pairs)
-            built: list[dict] = []
-            built_keys: set[tuple[str, date]] = set()
-            total = len(groups)
-            done = 0
-
-            for (user_id, wd), ts_list in groups.items():
-                ts_list.sort()
-                times = [t.time().replace(microsecond=0) for t in ts_list[:6]]
-
-                def _get(i: int) -> time | None:
-                    return times[i] if i < len(times) else None
-
-                built.append(
-                    {
-                        "attendance_code": user_id,
-                        "name_on_mcc": str(user_name_by_id.get(str(user_id), "") or ""),
-                        "work_date": wd.isoformat(),
-                        "time_in_1": _get(0),
-                        "time_out_1": _get(1),
-                        "time_in_2": _get(2),
-                        "time_out_2": _get(3),
-                        "time_in_3": _get(4),
-                        "time_out_3": _get(5),
-                        "device_no": device_no,
-                        "device_id": int(device_id),
-                        "device_name": device_name,
-                    }
-                )
-                built_keys.add((str(user_id), wd))
+        if full_resync or not state:
+            return False
+        covered_from = state.get("covered_from")
+        if isinstance(covered_from, datetime):
+            covered_from = covered_from.date()
+        if not isinstance(covered_from, date):
+            return False
+        return covered_from <= from_date
+
+    def _select_punches(
+        self,
+        device: dict,
+        logs: list | None,
+        record_count: int,
+        state: dict | None,
+        incremental: bool,
+        from_date: date,
+        to_date: date,
+    ) -> tuple[DayPunchGroups, dict, bool]:
+        """Lọc + gom lượt chấm cần xử lý và tính mốc đồng bộ mới.
 
-                done += 1
-                if progress_cb and total > 0 and done % 50 == 0:
-                    progress_cb("save", done, total, f"Đang xử lý {done}/{total}...")
+        Mốc (last_serial) là số bản ghi đầu log máy đã xử lý xong; log máy chỉ ghi nối
+        thêm nên lần sau chỉ cần xét bản ghi sau mốc. Ngày nào có bản ghi mới thì lấy lại
+        toàn bộ lượt chấm của ngày đó để dựng lại dòng vào/ra cho đúng.
+        Bản ghi sau 'Đến ngày' chưa được xử lý nên mốc dừng trước bản ghi đầu tiên như vậy.
 
-            if progress_cb:
-                progress_cb("save", 0, max(1, len(built)), "Đang lưu vào CSDL...")
+        Bản ghi được lọc theo ngày và gom thẳng vào DayPunchGroups khi duyệt log (tải toàn
+        bộ: 1 lượt duyệt), không tạo list lượt chấm trung gian.
 
-            # Upsert temp + raw
-            self._repo.upsert_download_attendance(built)
-            self._repo.upsert_attendance_raw(built)
+        Return (groups, new_state, incremental).
+        """
 
-            # Persist placeholder rows for days without punches (không chấm công).
-            # Must NOT overwrite existing punch rows, so we insert-ignore.
-            no_punch_rows: list[dict] = []
+        device_id = int(device.get("id") or 0)
+        groups = DayPunchGroups()
+
+        if logs is None and state:
+            # Máy không có bản ghi mới: giữ nguyên mốc
+            new_state = dict(state)
+            new_state["record_count"] = record_count
+            return groups, new_state, True
+
+        logs = logs or []
+        last_serial = 0
+        covered_from = from_date
+        if incremental and state:
+            last_serial = int(state.get("last_serial") or 0)
+            covered_from = state.get("covered_from")
+            if isinstance(covered_from, datetime):
+                covered_from = covered_from.date()
+
+            # Máy đã xóa/ghi lại log -> bản ghi mốc không còn khớp -> xử lý lại từ đầu
+            if last_serial > len(logs):
+                incremental = False
+            elif last_serial > 0 and state.get("last_record_time") is not None:
+                anchor = self._log_punch(logs[last_serial - 1])
+                expected = state.get("last_record_time")
+                if anchor is None or anchor[1].replace(microsecond=0) != expected.replace(
+                    microsecond=0
+                ):
+                    incremental = False
+
+            if not incremental:
+                logger.info(
+                    "Log máy %s không khớp mốc đồng bộ, xử lý lại toàn bộ", device_id
+                )
+                last_serial = 0
+                covered_from = from_date
+
+        lower = datetime.combine(covered_from, time.min)
+        upper = datetime.combine(to_date, time.max)
+
+        # Tải toàn bộ: gom luôn khi duyệt. Tăng dần: chỉ ghi nhận (mã, ngày) bị ảnh hưởng.
+        affected: set[tuple[str, date]] | None = set() if last_serial > 0 else None
+        first_deferred: int | None = None
+        for serial in range(last_serial + 1, len(logs) + 1):
+            p = self._log_punch(logs[serial - 1])
+            if p is None:
+                continue
+            if p[1] > upper:
+                if first_deferred is None:
+                    first_deferred = serial
+                continue
+            if p[1] >= lower:
+                if affected is None:
+                    groups.add(p[0], p[1])
+                else:
+                    affected.add((p[0], p[1].date()))
 
-            # Target codes: prefer employees.mcc_code, but if device user list is available,
-            # restrict to codes existing on device to avoid generating irrelevant rows.
-            code_to_name: dict[str, str] = {}
-            device_codes = {
-                str(k or "").strip() for k in (user_name_by_id or {}).keys()
+        if affected:
+            for a in logs:
+                p = self._log_punch(a)
+                if p is not None and (p[0], p[1].date()) in affected:
+                    groups.add(p[0], p[1])
+
+        new_serial = (first_deferred - 1) if first_deferred else len(logs)
+        anchor = self._log_punch(logs[new_serial - 1]) if new_serial > 0 else None
+        new_state = {
+            "device_id": device_id,
+            "last_serial": new_serial,
+            "last_record_time": anchor[1].replace(microsecond=0) if anchor else None,
+            "record_count": len(logs),
+            "covered_from": covered_from,
+        }
+        return groups, new_state, incremental
+
+    def _sync_device(
+        self,
+        ZK,
+        device: dict,
+        from_date: date,
+        to_date: date,
+        full_resync: bool,
+        progress_cb=None,
+    ) -> _DeviceSyncResult:
+        """Tải + dựng dòng cho 1 máy (chưa ghi DB).
+
+        full_resync cũng tải lại danh sách user trên máy thay vì dùng bản đã lưu.
+        """
+
+        device_id = int(device.get("id") or 0)
+        state = None if full_resync else self._load_sync_state(device_id)
+        incremental = self._can_sync_incrementally(state, from_date, full_resync)
+        known_serial = int(state.get("last_serial") or 0) if incremental and state else None
+        cached_roster = self._load_roster(device_id)
+
+        # Retry + tăng timeout để giảm lỗi ZKNetworkError: timed out
+        user_name_by_id, logs, record_count, fetch_err, fetched_user_count = (
+            self._fetch_device_logs(
+                ZK,
+                device,
+                progress_cb,
+                known_serial,
+                None if full_resync else cached_roster,
+            )
+        )
+        if fetch_err:
+            return _DeviceSyncResult(device, error=fetch_err)
+
+        roster = None
+        if fetched_user_count is not None:
+            fingerprint = self._roster_fingerprint(user_name_by_id)
+            roster = {
+                "device_id": device_id,
+                "user_count": fetched_user_count,
+                "fingerprint": fingerprint,
+                "users": user_name_by_id,
+                "changed": not cached_roster
+                or str(cached_roster.get("fingerprint") or "") != fingerprint,
             }
 
+        groups, sync_state, incremental = self._select_punches(
+            device, logs, record_count, state, incremental, from_date, to_date
+        )
+        rotation = None
+        if logs:
             try:
-                employees = self._employee_repo.list_employees()
+                rotation = self._rotation_service.snapshot(
+                    (self._log_punch(a) for a in logs), len(logs)
+                )
             except Exception:
-                employees = []
+                logger.exception("Không kiểm tra được điều kiện xóa log máy %s", device_id)
+        # Bỏ tham chiếu tới log thô ngay khi đã gom xong
+        del logs
+        return _DeviceSyncResult(
+            device,
+            groups,
+            user_name_by_id,
+            sync_state,
+            incremental,
+            roster,
+            rotation=rotation,
+        )
 
-            for e in employees or []:
-                code = str(e.get("mcc_code") or "").strip()
-                if not code:
-                    continue
-                if device_codes and code not in device_codes:
-                    continue
-                nm = str(e.get("name_on_mcc") or "" or "").strip()
-                if not nm:
-                    nm = str(e.get("full_name") or "").strip()
-                if code not in code_to_name:
-                    code_to_name[code] = nm
-
-            # Fallback: if no employee codes matched, use device users.
-            if not code_to_name and device_codes:
-                for code in device_codes:
-                    if code:
-                        code_to_name[code] = str(
-                            user_name_by_id.get(code) or ""
-                        ).strip()
-
-            # Always include codes that appear in logs.
-            for code, _wd in built_keys:
-                if code and code not in code_to_name:
-                    code_to_name[code] = str(user_name_by_id.get(code) or "").strip()
-
-            if code_to_name and from_date <= to_date:
-                if progress_cb:
-                    progress_cb(
-                        "save",
-                        0,
-                        0,
-                        "Đang tạo dữ liệu không chấm công...",
+    def _rotate_logs(self, ZK, result: _DeviceSyncResult) -> str | None:
+        """Xóa log trên máy sau khi đã lưu (best-effort); return ghi chú cho thông báo.
+
+        Lượt chấm trong log máy chưa có trong attendance_punches (vd ngoài khoảng ngày vừa
+        tải) được lưu bổ sung trước (_save_missing_punches); còn thiếu thì không xóa.
+        """
+
+        snap = result.rotation
+        if snap is None:
+            return None
+        device = result.device
+        device_no = int(device.get("device_no") or 0)
+        try:
+            missing = self._rotation_service.missing_groups(device_no, snap)
+            if len(missing):
+                self._save_missing_punches(device, missing, result.user_name_by_id)
+                missing = self._rotation_service.missing_groups(device_no, snap)
+            if len(missing):
+                logger.warning(
+                    "Máy %s còn %s lượt chấm chưa lưu, không xóa log",
+                    device_no,
+                    missing.punch_count,
+                )
+                return "Chưa xóa log trên máy: dữ liệu trong CSDL chưa khớp với máy."
+            _ok, msg = self._rotation_service.rotate(ZK, device, snap)
+            return msg
+        except Exception:
+            logger.exception("Xóa log máy %s thất bại", device_no)
+            return "Không xóa được log trên máy (lần tải sau sẽ thử lại)."
+
+    def _persist_rows(
+        self,
+        results: list[_DeviceSyncResult],
+        sync_states: list[dict] | None = None,
+        refresh_ranges: list[tuple[int, date, date]] | None = None,
+        rosters: list[dict] | None = None,
+        progress_cb=None,
+        bulk: bool | None = None,
+    ) -> int:
+        """Ghi tất cả bảng trong 1 transaction: 1 lần commit, không để dữ liệu ghi dở.
+
+        Lỗi ở bất kỳ bước nào (kể cả gộp attendance_audit) -> rollback toàn bộ và ném lỗi ra;
+        chỉ mốc đồng bộ (1 câu INSERT) là best-effort.
+
+        Dòng ngày công + lượt chấm (attendance_punches) được dựng và ghi theo lô
+        PERSIST_BATCH_SIZE (mã, ngày), nên RAM lúc ghi không phụ thuộc số log trên máy.
+        sync_states: mốc đồng bộ mới của từng máy (ghi cùng transaction với dữ liệu).
+        refresh_ranges: [(device_no, from_date, to_date)] tải tăng dần, cần nạp lại bảng tạm
+        từ attendance_raw vì dữ liệu cũ không được tải lại từ máy.
+        rosters: danh sách user vừa tải lại từ máy (device_users); chỉ ghi đè khi đổi.
+        bulk: None = tự chọn theo BULK_MIN_ROWS; True = nạp lượt chấm + dòng ngày công vào
+        bảng tạm theo khối lớn rồi gộp vào download_attendance/attendance_raw/attendance_audit
+        mỗi bảng 1 câu SQL (kết quả như upsert từng dòng).
+        Return số dòng ngày công đã ghi.
+        """
+
+        total = sum(len(r.groups) for r in results)
+        if bulk is None:
+            bulk = total >= self.BULK_MIN_ROWS
+        written = 0
+        merged_keys: set[tuple[str, date]] = set()
+        names: dict[str, str] = {}
+
+        with Database.transaction():
+            # Danh sách user trước: bảng tạm đọc tên trên máy từ device_users
+            for roster in rosters or []:
+                if roster.get("changed"):
+                    self._device_user_repo.replace_roster(
+                        roster["device_id"],
+                        roster["user_count"],
+                        roster["fingerprint"],
+                        roster["users"],
+                    )
+                else:
+                    self._device_user_repo.touch_roster(
+                        roster["device_id"], roster["user_count"]
                     )
 
-                days = (to_date - from_date).days
-                for offset in range(days + 1):
-                    d = from_date + timedelta(days=offset)
-                    for code, nm in code_to_name.items():
-                        if (code, d) in built_keys:
-                            continue
-                        no_punch_rows.append(
-                            {
-                                "attendance_code": code,
-                                "name_on_mcc": str(nm or ""),
-                                "work_date": d.isoformat(),
-                                "time_in_1": None,
-                                "time_out_1": None,
-                                "time_in_2": None,
-                                "time_out_2": None,
-                                "time_in_3": None,
-                                "time_out_3": None,
-                                "device_no": device_no,
-                                "device_id": int(device_id),
-                                "device_name": device_name,
-                            }
+            if bulk:
+                self._repo.begin_bulk()
+            for result in results:
+                device = result.device
+                for keys in result.groups.iter_batches(self.PERSIST_BATCH_SIZE):
+                    built, punch_rows = AttendancePunchService.batch_rows(
+                        result.groups,
+                        keys,
+                        int(device.get("device_no") or 0),
+                        int(device.get("id") or 0),
+                        str(device.get("device_name") or ""),
+                        result.user_name_by_id,
+                    )
+                    if bulk:
+                        self._punch_repo.bulk_insert_punches(punch_rows)
+                        self._repo.stage_rows(built)
+                    else:
+                        self._punch_repo.insert_punches(punch_rows)
+                        # Upsert temp + raw
+                        self._repo.upsert_download_attendance(built)
+                        self._repo.upsert_attendance_raw(built)
+
+                    merged_keys.update(keys)
+                    written += len(built)
+                    if progress_cb and total > 0:
+                        progress_cb(
+                            "save", written, total, f"Đang lưu {written}/{total}..."
                         )
 
-                # Insert-ignore into temp + raw so we don't wipe existing punches.
-                if no_punch_rows:
-                    self._repo.insert_ignore_download_attendance(no_punch_rows)
-                    self._repo.insert_ignore_attendance_raw(no_punch_rows)
+            if bulk:
+                self._repo.merge_staged_rows()
 
-            # Copy directly to audit from downloaded data (best-effort)
-            try:
-                self._audit_repo.upsert_from_download_rows(built)
-                if no_punch_rows:
-                    self._audit_repo.upsert_from_download_rows(no_punch_rows)
-            except Exception:
-                logger.exception("Không thể ghi attendance_audit khi tải dữ liệu")
+            # Audit: gộp lượt chấm mọi máy theo (mã, ngày) -> 1 dòng
+            for result in results:
+                names.update(result.user_name_by_id or {})
+            self._punch_service.merge_to_audit(merged_keys, names, bulk=bulk)
+
+            for device_no, d1, d2 in refresh_ranges or []:
+                self._repo.copy_raw_to_download(device_no, d1.isoformat(), d2.isoformat())
+
+            # Mốc đồng bộ (best-effort, 1 câu INSERT nên không ghi dở): lỗi thì lần sau tải
+            # lại toàn bộ, không mất dữ liệu
+            if sync_states:
+                try:
+                    self._sync_state_repo.upsert_states(sync_states)
+                except Exception:
+                    logger.exception("Không thể ghi device_sync_state")
+
+        return written
+
+    def _rebuild_device_rows(
+        self,
+        device: dict,
+        affected: set[tuple[str, date]],
+        user_name_by_id: dict[str, str] | None,
+    ) -> list[dict]:
+        """Dựng lại + ghi attendance_raw của 1 máy cho các (mã, ngày) từ kho lượt chấm.
+
+        Đọc mọi lượt chấm đã lưu của các (mã, ngày) này (không chỉ lô vừa ghi) nên dòng
+        ngày công luôn đủ. Gọi trong Database.transaction() sau khi đã ghi lượt chấm mới.
+        Return các dòng đã dựng (caller ghi thêm download_attendance nếu cần).
+        """
+
+        device_no = int(device.get("device_no") or 0)
+        days = [d for _code, d in affected]
+        groups = DayPunchGroups()
+        for batch in self._punch_repo.iter_punches(
+            from_dt=datetime.combine(min(days), time.min),
+            to_dt=datetime.combine(max(days), time.max),
+            device_no=device_no,
+            attendance_codes=sorted({code for code, _d in affected}),
+        ):
+            for r in batch:
+                code = str(r.get("attendance_code") or "")
+                ts = r.get("punched_at")
+                if isinstance(ts, datetime) and (code, ts.date()) in affected:
+                    groups.add(code, ts)
+
+        built, _punch_rows = AttendancePunchService.batch_rows(
+            groups,
+            groups.keys(),
+            device_no,
+            int(device.get("id") or 0),
+            str(device.get("device_name") or ""),
+            user_name_by_id,
+            with_punches=False,
+        )
+        self._repo.upsert_attendance_raw(built)
+        return built
+
+    def _save_missing_punches(
+        self,
+        device: dict,
+        missing: DayPunchGroups,
+        user_name_by_id: dict[str, str] | None,
+    ) -> None:
+        """Lưu bổ sung lượt chấm có trên máy nhưng chưa có trong attendance_punches.
+
+        Chỉ thêm lượt còn thiếu vào kho lượt chấm, rồi dựng lại attendance_raw +
+        attendance_audit của các (mã, ngày) đó từ kho (gồm lượt đã lưu trước).
+        download_attendance (bảng tạm theo khoảng ngày đang xem) không bị ghi.
+        """
+
+        punches = [
+            (code, ts) for code, day in missing.keys() for ts in missing.punches((code, day))
+        ]
+        affected = set(missing.keys())
+        with Database.transaction():
+            self._punch_repo.insert_punches(
+                AttendancePunchService.punch_rows(
+                    punches,
+                    int(device.get("device_no") or 0),
+                    int(device.get("id") or 0),
+                )
+            )
+            self._rebuild_device_rows(device, affected, user_name_by_id)
+            self._punch_service.merge_to_audit(affected, user_name_by_id)
+
+    def save_live_punches(
+        self,
+        device: dict,
+        punches: list[tuple[str, datetime]],
+        user_name_by_id: dict[str, str] | None = None,
+        sync_state: dict | None = None,
+    ) -> int:
+        """Ghi 1 lô nhỏ lượt chấm nhận trực tiếp từ máy (LiveCaptureService).
+
+        Lượt chấm mới vào attendance_punches trước, rồi dựng lại dòng vào/ra của các
+        (mã, ngày) bị ảnh hưởng từ kho lượt chấm (gồm cả lượt đã lưu trước đó trong ngày).
+        sync_state: mốc đồng bộ mới (đã cộng số bản ghi vừa nhận), ghi cùng transaction.
+        Lỗi gộp attendance_audit -> rollback cả lô, mốc đồng bộ không tăng (kết nối lại thì
+        LiveCaptureService tải bù từ log máy).
+        Return số dòng ngày công đã ghi.
+        """
+
+        device_no = int(device.get("device_no") or 0)
+        device_id = int(device.get("id") or 0)
+        affected = {(code, ts.date()) for code, ts in punches}
+        written = 0
+
+        with Database.transaction():
+            self._punch_repo.insert_punches(
+                AttendancePunchService.punch_rows(punches, device_no, device_id)
+            )
+
+            if affected:
+                built = self._rebuild_device_rows(device, affected, user_name_by_id)
+                self._repo.upsert_download_attendance(built)
+                self._punch_service.merge_to_audit(affected, user_name_by_id)
+                written = len(built)
+
+            if sync_state:
+                try:
+                    self._sync_state_repo.upsert_states([sync_state])
+                except Exception:
+                    logger.exception("Không thể ghi device_sync_state")
+
+        return written
+
+    def download_from_device(
+        self,
+        device_id: int,
+        from_date: date,
+        to_date: date,
+        progress_cb=None,
+        full_resync: bool = False,
+    ) -> tuple[bool, str, int]:
+        """Tải dữ liệu từ máy và lưu DB.
+
+        Mặc định tải tăng dần: chỉ xử lý bản ghi mới sau mốc đồng bộ lần trước của máy
+        (device_sync_state). full_resync=True: xử lý lại toàn bộ log trong khoảng ngày và
+        tải lại danh sách user trên máy (bình thường dùng lại device_users nếu số user không đổi).
+
+        progress_cb signature (optional): (phase: str, done: int, total: int, message: str) -> None
+        phase in: "connect", "download", "save", "done" (backward compatible: may emit "fetch")
+        """
+
+        if not device_id:
+            return False, "Vui lòng chọn máy chấm công.", 0
+
+        if from_date > to_date:
+            return False, "'Từ ngày' không được lớn hơn 'Đến ngày'.", 0
+
+        device = self._device_repo.get_device(int(device_id))
+        if not device:
+            return False, "Không tìm thấy máy chấm công.", 0
+
+        if self._expected_device_kind(str(device.get("device_type") or "")) is None:
+            return False, self._MSG_DEVICE_TYPE_MISSING, 0
+
+        ZK, zk_err = self._import_zk()
+        if zk_err:
+            return False, zk_err, 0
+
+        try:
+            result = self._sync_device(
+                ZK,
+                device,
+                from_date,
+                to_date,
+                full_resync,
+                progress_cb,
+            )
+            if result.error:
+                return False, result.error, 0
 
             if progress_cb:
-                progress_cb("done", len(built), len(built), "Hoàn tất")
+                progress_cb(
+                    "save", 0, max(1, len(result.groups)), "Đang lưu vào CSDL..."
+                )
 
-            return True, "Tải dữ liệu chấm công thành công.", len(built)
+            written = self._persist_rows(
+                [result],
+                [result.sync_state] if result.sync_state else None,
+                (
+                    [(int(device.get("device_no") or 0), from_date, to_date)]
+                    if result.incremental
+                    else None
+                ),
+                [result.roster] if result.roster else None,
+                progress_cb,
+            )
+
+            rotation_note = self._rotate_logs(ZK, result)
+
+            if progress_cb:
+                progress_cb("done", written, written, "Hoàn tất")
+
+            if result.incremental:
+                msg = f"Tải dữ liệu chấm công thành công (chỉ dữ liệu mới: {written} dòng)."
+            else:
+                msg = "Tải dữ liệu chấm công thành công."
+            if rotation_note:
+                msg += "\n" + rotation_note
+            return True, msg, written
         except Exception:
             logger.exception("download_from_device thất bại")
             return (
@@ -581,3 +986,204 @@ class DownloadAttendanceService:
                 "Không thể tải dữ liệu. Vui lòng kiểm tra kết nối thiết bị/CSDL.",
                 0,
             )
+
+    def download_from_devices(
+        self,
+        device_ids: list[int] | None,
+        from_date: date,
+        to_date: date,
+        progress_cb=None,
+        max_workers: int | None = None,
+        full_resync: bool = False,
+        skip_unreachable: bool = True,
+    ) -> tuple[bool, str, int]:
+        """Tải dữ liệu song song từ nhiều máy rồi lưu DB trong 1 transaction.
+
+        - device_ids=None: tất cả máy trong bảng devices.
+        - Tối đa max_workers (mặc định MAX_PARALLEL_DEVICES) máy kết nối cùng lúc.
+        - Máy lỗi không chặn máy khác; dữ liệu của các máy tải được vẫn được lưu.
+        - Tải tăng dần theo mốc từng máy như download_from_device (full_resync để tải lại).
+        - skip_unreachable: bỏ qua máy đang không phản hồi theo cache trạng thái của
+          DeviceService (máy chưa có trạng thái thì kiểm tra TCP nhanh song song), thay vì
+          chờ hết các lần retry kết nối.
+
+        progress_cb: như download_from_device. Trong lúc tải, done/total là số máy
+        đã xong / tổng số máy; message có tiền tố [tên máy] của máy vừa báo tiến trình.
+        """
+
+        if from_date > to_date:
+            return False, "'Từ ngày' không được lớn hơn 'Đến ngày'.", 0
+
+        if device_ids is None:
+            devices = list(self._device_repo.list_devices() or [])
+        else:
+            devices = []
+            for did in dict.fromkeys(int(d) for d in device_ids if d):
+                device = self._device_repo.get_device(did)
+                if device:
+                    devices.append(device)
+        if not devices:
+            return False, "Không tìm thấy máy chấm công.", 0
+
+        ZK, zk_err = self._import_zk()
+        if zk_err:
+            return False, zk_err, 0
+
+        requested_devices = len(devices)
+        failures: list[tuple[str, str]] = []
+        if skip_unreachable:
+            try:
+                health = self._device_service.probe_devices(devices, use_cache=True)
+            except Exception:
+                logger.exception("Không kiểm tra được trạng thái máy")
+                health = {}
+            reachable: list[dict] = []
+            for device in devices:
+                h = health.get(int(device.get("id") or 0))
+                if h is not None and not h.reachable:
+                    name = str(device.get("device_name") or f"Máy {device.get('device_no')}")
+                    failures.append(
+                        (name, f"Máy không phản hồi ({h.message}), đã bỏ qua.")
+                    )
+                else:
+                    reachable.append(device)
+            devices = reachable
+        if not devices:
+            failure_text = "\n".join(f"- {name}: {err}" for name, err in failures)
+            return False, "Không tải được dữ liệu từ máy nào.\n" + failure_text, 0
+
+        total_devices = len(devices)
+        workers = max(1, min(int(max_workers or self.MAX_PARALLEL_DEVICES), total_devices))
+
+        lock = threading.Lock()
+        finished = 0
+
+        def _emit(phase: str, done: int, total: int, message: str) -> None:
+            if not progress_cb:
+                return
+            with lock:
+                try:
+                    progress_cb(phase, done, total, message)
+                except Exception:
+                    logger.debug("progress_cb lỗi", exc_info=True)
+
+        def _device_cb(name: str):
+            def cb(_phase: str, _done: int, _total: int, message: str) -> None:
+                _emit(
+                    "download",
+                    finished,
+                    total_devices,
+                    f"[{name}] {message} ({finished}/{total_devices} máy)",
+                )
+
+            return cb
+
+        def _run(device: dict) -> _DeviceSyncResult:
+            name = str(device.get("device_name") or f"Máy {device.get('device_no')}")
+            if self._expected_device_kind(str(device.get("device_type") or "")) is None:
+                return _DeviceSyncResult(device, error=self._MSG_DEVICE_TYPE_MISSING)
+            return self._sync_device(
+                ZK,
+                device,
+                from_date,
+                to_date,
+                full_resync,
+                _device_cb(name),
+            )
+
+        _emit(
+            "connect",
+            0,
+            total_devices,
+            f"Đang kết nối tới {total_devices} máy (tối đa {workers} máy cùng lúc)...",
+        )
+
+        results: list[_DeviceSyncResult] = []
+        sync_states: list[dict] = []
+        rosters: list[dict] = []
+        refresh_ranges: list[tuple[int, date, date]] = []
+        ok_devices = 0
+
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="device-download"
+        ) as pool:
+            futures = {pool.submit(_run, d): d for d in devices}
+            for fut in as_completed(futures):
+                device = futures[fut]
+                name = str(device.get("device_name") or f"Máy {device.get('device_no')}")
+                try:
+                    result = fut.result()
+                except Exception as exc:
+                    logger.exception("Tải dữ liệu máy %s thất bại", name)
+                    result = _DeviceSyncResult(device, error=str(exc))
+
+                with lock:
+                    finished += 1
+                if result.error:
+                    failures.append((name, result.error))
+                    status = "lỗi"
+                else:
+                    ok_devices += 1
+                    results.append(result)
+                    DeviceService.record_health(
+                        int(device.get("id") or 0),
+                        str(device.get("ip_address") or ""),
+                        int(device.get("port") or 4370),
+                        True,
+                        "Tải dữ liệu thành công",
+                    )
+                    if result.sync_state:
+                        sync_states.append(result.sync_state)
+                    if result.roster:
+                        rosters.append(result.roster)
+                    if result.incremental:
+                        refresh_ranges.append(
+                            (int(device.get("device_no") or 0), from_date, to_date)
+                        )
+                    status = f"{len(result.groups)} dòng"
+                _emit(
+                    "download",
+                    finished,
+                    total_devices,
+                    f"[{name}] Xong ({status}) - {finished}/{total_devices} máy",
+                )
+
+        failure_text = "\n".join(f"- {name}: {err}" for name, err in failures)
+        if ok_devices == 0:
+            return False, "Không tải được dữ liệu từ máy nào.\n" + failure_text, 0
+
+        try:
+            total_rows = sum(len(r.groups) for r in results)
+            _emit("save", 0, max(1, total_rows), "Đang lưu vào CSDL...")
+            written = self._persist_rows(
+                results, sync_states, refresh_ranges, rosters, _emit
+            )
+        except Exception:
+            logger.exception("download_from_devices: lưu CSDL thất bại")
+            return (
+                False,
+                "Không thể lưu dữ liệu đã tải. Vui lòng kiểm tra kết nối CSDL.",
+                0,
+            )
+
+        rotation_notes: list[str] = []
+        for result in results:
+            note = self._rotate_logs(ZK, result)
+            if note:
+                name = str(
+                    result.device.get("device_name")
+                    or f"Máy {result.device.get('device_no')}"
+                )
+                rotation_notes.append(f"- {name}: {note}")
+
+        _emit("done", written, written, "Hoàn tất")
+
+        msg = (
+            f"Tải dữ liệu chấm công thành công từ {ok_devices}/{requested_devices} máy "
+            f"({written} dòng)."
+        )
+        if rotation_notes:
+            msg += "\nXóa log trên máy:\n" + "\n".join(rotation_notes)
+        if failures:
+            msg += "\nMáy không tải được:\n" + failure_text
+        return True, msg, written
@@ -4,6 +4,8 @@ Service layer cho màn "Khai báo Ngày lễ":
 - Validate dữ liệu
 - Gọi repository
 - Trả về (ok, message) thân thiện cho UI
+- Thêm/sửa/xóa ngày lễ: đưa các ngày bị ảnh hưởng vào hàng đợi tính lại kết quả ghép giờ
+  (ArrangedRecomputeJob)
 """
 
 from __future__ import annotations
@@ -14,6 +16,10 @@ from datetime import date
 
 from core.resource import HOLIDAY_INFO_MAX_LENGTH
 from repository.holiday_repository import HolidayRepository
+from services.arranged_recompute_services import (
+    ArrangedRecomputeJob,
+    ArrangedRecomputeService,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -53,6 +59,23 @@ class HolidayService:
                 continue
         return result
 
+    def _holiday_date(self, holiday_id: int) -> str | None:
+        for h in self.list_holidays():
+            if h.id == int(holiday_id):
+                return h.holiday_date
+        return None
+
+    def _recompute_dates(self, dates: list[str | None]) -> None:
+        try:
+            targets = ArrangedRecomputeService().collect_holiday_targets(
+                [d for d in dates if d]
+            )
+        except Exception:
+            logger.exception("Không thể đưa ngày lễ vào hàng đợi tính lại")
+            return
+        if targets:
+            ArrangedRecomputeJob.enqueue(targets)
+
     def create_holiday(
         self, holiday_date: str, holiday_info: str
     ) -> tuple[bool, str, int | None]:
@@ -74,6 +97,7 @@ class HolidayService:
 
         try:
             new_id = self._repo.create_holiday(holiday_date, holiday_info)
+            self._recompute_dates([holiday_date])
             return True, "Thêm mới thành công.", new_id
         except Exception as exc:
             if self._is_duplicate_key(exc):
@@ -97,11 +121,14 @@ class HolidayService:
             return False, f"Thông tin ngày nghỉ tối đa {HOLIDAY_INFO_MAX_LENGTH} ký tự."
 
         try:
+            old_date = self._holiday_date(int(holiday_id))
             affected = self._repo.update_holiday(
                 int(holiday_id), holiday_date, holiday_info
             )
             if affected <= 0:
                 return False, "Không có thay đổi."
+            if old_date != holiday_date:
+                self._recompute_dates([old_date, holiday_date])
             return True, "Sửa đổi thành công."
         except Exception as exc:
             if self._is_duplicate_key(exc):
@@ -114,9 +141,11 @@ class HolidayService:
             return False, "Vui lòng chọn dòng cần xóa."
 
         try:
+            old_date = self._holiday_date(int(holiday_id))
             affected = self._repo.delete_holiday(int(holiday_id))
             if affected <= 0:
                 return False, "Không tìm thấy dòng cần xóa."
+            self._recompute_dates([old_date])
             return True, "Xóa thành công."
         except Exception:
             logger.exception("Service delete_holiday thất bại")
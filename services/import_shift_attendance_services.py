@@ -14,7 +14,9 @@ Rules overwrite/skip (theo yêu cầu):
 Ghi chú:
 - File Excel mẫu/preview theo đúng cột MainContent2 (không có attendance_code/device_no).
 - Khi import: nếu đã có dữ liệu audit theo (employee_code, work_date) thì dùng (attendance_code, device_no) hiện có để upsert.
-- Nếu chưa có: sẽ cố gắng map attendance_code = employees.mcc_code (nếu có) else employee_code; device_no mặc định = 1.
+- Nếu chưa có: sẽ cố gắng map attendance_code = employees.mcc_code (nếu có) else employee_code;
+  device_no = AttendancePunchService.MERGED_DEVICE_NO (cùng dòng tổng hợp mọi máy khi tải).
+- Giờ vào/ra import cũng được ghi thành lượt chấm vào attendance_punches.
 """
 
 from __future__ import annotations
@@ -23,14 +25,17 @@ import logging
 import re
 import unicodedata
 from dataclasses import dataclass
-from datetime import date, datetime, time
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 from pathlib import Path
 from typing import Any, Callable
 
+from core.database import Database
+from repository.attendance_punch_repository import AttendancePunchRepository
 from repository.import_shift_attendance_repository import (
     ImportShiftAttendanceRepository,
 )
+from services.attendance_punch_services import AttendancePunchService
 
 
 logger = logging.getLogger(__name__)
@@ -51,6 +56,56 @@ class ImportShiftAttendanceService:
         self, repository: ImportShiftAttendanceRepository | None = None
     ) -> None:
         self._repo = repository or ImportShiftAttendanceRepository()
+        self._punch_repo = AttendancePunchRepository()
+
+    @staticmethod
+    def _punch_rows_from_payloads(payloads: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Giờ vào/ra đã import -> lượt chấm cho attendance_punches.
+
+        Giờ nhỏ hơn giờ liền trước được coi là đã qua nửa đêm (sang ngày hôm sau).
+        """
+
+        out: list[dict[str, Any]] = []
+        for p in payloads:
+            code = str(p.get("attendance_code") or "").strip()
+            try:
+                wd = date.fromisoformat(str(p.get("work_date") or "")[:10])
+            except Exception:
+                continue
+            if not code:
+                continue
+
+            # 0 (MERGED_DEVICE_NO) là giá trị hợp lệ: không dùng `or`, tránh ghi thành máy 1
+            device_no = p.get("device_no")
+            device_no = (
+                int(device_no)
+                if device_no is not None
+                else AttendancePunchService.MERGED_DEVICE_NO
+            )
+
+            day = wd
+            prev: time | None = None
+            for k in ("in_1", "out_1", "in_2", "out_2", "in_3", "out_3"):
+                t = p.get(k)
+                if isinstance(t, str):
+                    try:
+                        t = time.fromisoformat(t.strip())
+                    except Exception:
+                        t = None
+                if not isinstance(t, time):
+                    continue
+                if prev is not None and t < prev:
+                    day = day + timedelta(days=1)
+                prev = t
+                out.append(
+                    {
+                        "attendance_code": code,
+                        "punched_at": datetime.combine(day, t.replace(microsecond=0)),
+                        "device_no": device_no,
+                        "device_id": p.get("device_id"),
+                    }
+                )
+        return out
 
     @staticmethod
     def _weekday_label(d: date) -> str:
@@ -558,14 +613,19 @@ class ImportShiftAttendanceService:
                 payload["attendance_code"] = (
                     str(existing.get("attendance_code") or "").strip() or emp_code
                 )
-                payload["device_no"] = int(existing.get("device_no") or 1)
+                existing_no = existing.get("device_no")
+                payload["device_no"] = (
+                    int(existing_no)
+                    if existing_no is not None
+                    else AttendancePunchService.MERGED_DEVICE_NO
+                )
                 payload["device_id"] = existing.get("device_id")
                 payload["device_name"] = existing.get("device_name")
             else:
                 emp = emp_lookup.get(emp_code.lower())
                 mcc = str((emp or {}).get("mcc_code") or "").strip()
                 payload["attendance_code"] = mcc or emp_code
-                payload["device_no"] = 1
+                payload["device_no"] = AttendancePunchService.MERGED_DEVICE_NO
                 payload["device_id"] = None
                 payload["device_name"] = ""
 
@@ -642,9 +702,13 @@ class ImportShiftAttendanceService:
             if progress_cb:
                 progress_cb(i, True, emp_code, action)
 
-        # Execute upserts in one batch
+        # Execute upserts in one batch (+ lượt chấm vào attendance_punches, cùng transaction)
         try:
-            self._repo.upsert_import_rows(upsert_payloads)
+            with Database.transaction():
+                self._repo.upsert_import_rows(upsert_payloads)
+                self._punch_repo.insert_punches(
+                    self._punch_rows_from_payloads(upsert_payloads)
+                )
         except Exception as exc:
             # Mark remaining as failed (best-effort)
             logger.exception("Import attendance_audit thất bại")
@@ -0,0 +1,240 @@
+"""services.live_capture_services
+
+Chế độ nhận lượt chấm trực tiếp (live capture) từ máy chấm công:
+- Mỗi máy trong bảng devices 1 thread giữ kết nối mở, nhận sự kiện chấm công
+  (pyzk conn.live_capture) ngay khi nhân viên chấm
+- Gom lô nhỏ (MICRO_BATCH_SIZE lượt hoặc FLUSH_SECONDS giây) rồi ghi DB
+  (DownloadAttendanceService.save_live_punches), mốc đồng bộ tăng theo số bản ghi nhận được
+- Mất kết nối: kết nối lại với thời gian chờ tăng dần (BACKOFF_*); trước mỗi lần nghe
+  tải bù tăng dần các bản ghi phát sinh lúc mất kết nối (máy không có bản ghi mới thì
+  không tải log)
+- Báo UI qua core.auto_sync_bus sau mỗi lô đã ghi
+
+Bật bằng "live_capture": true trong database/auto_sync_settings.json; khi đó thay cho
+lịch tự động tải định kỳ (AutoSyncService).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time as time_module
+from datetime import date, datetime, timedelta
+
+from core.auto_sync_bus import auto_sync_bus
+from repository.device_repository import DeviceRepository
+from services.download_attendance_services import (
+    DOWNLOAD_LOCK,
+    DownloadAttendanceService,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class LiveCaptureService:
+    MICRO_BATCH_SIZE = 200
+    # Thời gian tối đa giữ lượt chấm trong bộ đệm trước khi ghi (cũng là timeout chờ sự kiện)
+    FLUSH_SECONDS = 2.0
+    CONNECT_TIMEOUT = 15
+    BACKOFF_INITIAL_SECONDS = 5.0
+    BACKOFF_MAX_SECONDS = 300.0
+    # Không có sự kiện quá lâu: kết nối lại để phát hiện kết nối chết (pyzk không báo)
+    IDLE_RECONNECT_SECONDS = 600.0
+    # Tải bù lần đầu (máy chưa có mốc đồng bộ): số ngày lùi lại
+    CATCH_UP_DAYS = 31
+
+    def __init__(
+        self,
+        download_service: DownloadAttendanceService | None = None,
+        device_repo: DeviceRepository | None = None,
+    ) -> None:
+        self._download_service = download_service or DownloadAttendanceService()
+        self._device_repo = device_repo or DeviceRepository()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._conns: dict[int, object] = {}
+        self._conns_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Mở 1 listener cho mỗi máy (máy thêm sau khi start cần khởi động lại)."""
+
+        if any(t.is_alive() for t in self._threads):
+            return
+        if not self._download_service.has_zk_library():
+            logger.info("Live capture: chưa cài thư viện zk, không bật")
+            return
+        try:
+            devices = list(self._device_repo.list_devices() or [])
+        except Exception:
+            logger.exception("Live capture: không đọc được danh sách máy")
+            return
+
+        self._stop.clear()
+        self._threads = []
+        for device in devices:
+            if not device.get("id"):
+                continue
+            t = threading.Thread(
+                target=self._run_device,
+                args=(device,),
+                name=f"live-capture-{device.get('id')}",
+                daemon=True,
+            )
+            self._threads.append(t)
+            t.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        with self._conns_lock:
+            conns = list(self._conns.values())
+        # pyzk kết thúc live_capture ở lần timeout kế tiếp (<= FLUSH_SECONDS)
+        for conn in conns:
+            try:
+                conn.end_live_capture = True
+            except Exception:
+                pass
+        deadline = time_module.monotonic() + float(timeout or 0)
+        for t in self._threads:
+            t.join(max(0.0, deadline - time_module.monotonic()))
+        self._threads = []
+
+    def _run_device(self, device: dict) -> None:
+        name = str(device.get("device_name") or f"Máy {device.get('device_no')}")
+        backoff = self.BACKOFF_INITIAL_SECONDS
+        while not self._stop.is_set():
+            started = time_module.monotonic()
+            try:
+                self._capture_session(device)
+            except Exception as exc:
+                logger.warning("Live capture máy %s mất kết nối: %s", name, exc)
+            if self._stop.is_set():
+                break
+            # Phiên đã chạy ổn định một lúc: lỗi lần này coi như lỗi mới, chờ ngắn lại
+            if time_module.monotonic() - started >= self.BACKOFF_MAX_SECONDS:
+                backoff = self.BACKOFF_INITIAL_SECONDS
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.BACKOFF_MAX_SECONDS)
+
+    def _catch_up(self, device: dict) -> None:
+        """Tải bù tăng dần trước khi nghe; lỗi -> raise để listener chờ rồi thử lại."""
+
+        device_id = int(device.get("id") or 0)
+        today = date.today()
+        from_date = today - timedelta(days=self.CATCH_UP_DAYS)
+        state = self._download_service._load_sync_state(device_id)
+        covered_from = (state or {}).get("covered_from")
+        if isinstance(covered_from, datetime):
+            covered_from = covered_from.date()
+        if isinstance(covered_from, date):
+            from_date = max(from_date, covered_from)
+
+        with DOWNLOAD_LOCK:
+            ok, msg, count = self._download_service.download_from_device(
+                device_id, from_date, today
+            )
+        if not ok:
+            raise RuntimeError(msg)
+        if count:
+            auto_sync_bus.finished.emit(True, str(msg or ""), int(count))
+
+    def _capture_session(self, device: dict) -> None:
+        self._catch_up(device)
+        if self._stop.is_set():
+            return
+
+        ZK, zk_err = self._download_service._import_zk()
+        if zk_err:
+            raise RuntimeError(zk_err)
+
+        device_id = int(device.get("id") or 0)
+        try:
+            password = int(str(device.get("password") or "") or 0)
+        except Exception:
+            password = 0
+        roster = self._download_service._load_roster(device_id) or {}
+        names = dict(roster.get("users") or {})
+        state = self._download_service._load_sync_state(device_id)
+
+        zk = ZK(
+            str(device.get("ip_address") or ""),
+            port=int(device.get("port") or 4370),
+            timeout=self.CONNECT_TIMEOUT,
+            password=password,
+        )
+        conn = zk.connect()
+        with self._conns_lock:
+            self._conns[device_id] = conn
+        logger.info("Live capture: đã kết nối máy %s", device_id)
+
+        buffer: list[tuple[str, datetime]] = []
+        received = 0
+        last_ts: datetime | None = None
+        first_at = 0.0
+        last_event = time_module.monotonic()
+        try:
+            for att in conn.live_capture(new_timeout=self.FLUSH_SECONDS):
+                now = time_module.monotonic()
+                if att is not None:
+                    last_event = now
+                    if received == 0:
+                        first_at = now
+                    received += 1
+                    p = DownloadAttendanceService._log_punch(att)
+                    last_ts = p[1] if p is not None else None
+                    if p is not None:
+                        buffer.append(p)
+                if received and (
+                    att is None
+                    or len(buffer) >= self.MICRO_BATCH_SIZE
+                    or now - first_at >= self.FLUSH_SECONDS
+                ):
+                    batch, count, batch_last = buffer, received, last_ts
+                    buffer, received, last_ts = [], 0, None
+                    state = self._flush(device, batch, names, state, count, batch_last)
+                if self._stop.is_set() or now - last_event >= self.IDLE_RECONNECT_SECONDS:
+                    break
+        finally:
+            try:
+                if received:
+                    self._flush(device, buffer, names, state, received, last_ts)
+            finally:
+                with self._conns_lock:
+                    self._conns.pop(device_id, None)
+                try:
+                    conn.end_live_capture = True
+                    conn.disconnect()
+                except Exception:
+                    pass
+
+    def _flush(
+        self,
+        device: dict,
+        punches: list[tuple[str, datetime]],
+        names: dict[str, str],
+        state: dict | None,
+        received: int,
+        last_ts: datetime | None,
+    ) -> dict | None:
+        """Ghi 1 lô; return mốc đồng bộ mới.
+
+        Sự kiện live đến theo đúng thứ tự máy ghi log, nên mốc cộng thêm received bản ghi.
+        Bản ghi cuối không đọc được -> không cập nhật mốc (lần tải sau tự xử lý lại).
+        """
+
+        new_state = None
+        if state and last_ts is not None:
+            new_state = dict(state)
+            new_state["last_serial"] = int(state.get("last_serial") or 0) + received
+            new_state["record_count"] = int(state.get("record_count") or 0) + received
+            new_state["last_record_time"] = last_ts.replace(microsecond=0)
+
+        with DOWNLOAD_LOCK:
+            written = self._download_service.save_live_punches(
+                device, punches, names, new_state
+            )
+        if written:
+            auto_sync_bus.finished.emit(
+                True, f"Đã nhận {len(punches)} lượt chấm trực tiếp.", int(written)
+            )
+        return new_state or state
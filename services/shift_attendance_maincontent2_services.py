@@ -9,86 +9,61 @@ Nghiệp vụ:
   - auto: sắp xếp giờ tăng dần rồi ghép (in_1/out_1/in_2/out_2/in_3/out_3).
   - device: giữ nguyên dữ liệu như audit (theo máy chấm công).
   - first_last: lấy giờ đầu tiên trong ngày làm in_1 và giờ cuối cùng làm out_1, xoá các cặp còn lại.
+- Ghép giờ theo ca cho cả tập dòng 1 lượt (ShiftMatchingEngine - services.shift_matching_services).
+- Kết quả ghép lưu vào attendance_audit (arranged_*) kèm fingerprint dữ liệu đầu vào
+  (giờ chấm + chế độ + ca của lịch theo thứ/ngày lễ): mở lại chỉ tính các dòng đã đổi.
+- Đọc vẫn có thể ghi: dòng chưa có kết quả lưu / fingerprint đã cũ (lần xem đầu, dữ liệu
+  ngoài cửa sổ của ArrangedRecomputeJob) được ghép lại và lưu ngay lúc mở màn hình; các
+  lần mở sau chỉ đọc. shift_code chỉ ghi khi khác giá trị trong DB.
+- Tính công (Trễ/Sớm/Giờ/Công/Giờ +/Công +/TC1..TC3) từ giờ đã ghép (TimesheetEngine -
+  services.timesheet_services): đầu vào tính công nằm trong fingerprint, chỉ dòng có
+  fingerprint đổi (và dòng liền kề do ca Đêm qua ngày) được tính lại và lưu.
 """
 
 from __future__ import annotations
 
 import datetime as _dt
+import hashlib
 import logging
 from typing import Any
 
+from core.database import Database
 from repository.arrange_schedule_repository import ArrangeScheduleRepository
 from repository.shift_attendance_maincontent2_repository import (
+    ARRANGED_COLUMNS,
     ShiftAttendanceMainContent2Repository,
 )
+from services.attendance_symbol_services import AttendanceSymbolService
+from services.shift_matching_services import (
+    CompiledShift,
+    CompiledShiftCache,
+    PAIR_KEYS,
+    ShiftMatchingEngine,
+)
+from services.timesheet_services import TimesheetEngine
 
 
 logger = logging.getLogger(__name__)
 
 
 class ShiftAttendanceMainContent2Service:
+    # Tăng khi đổi quy tắc ghép giờ để kết quả đã lưu được tính lại
+    ARRANGE_VERSION = 1
+    # Số ngày mỗi lượt đọc của refresh_arranged
+    REFRESH_DAYS = 7
+    # Ngày đọc thêm trước/sau khoảng ngày làm ngữ cảnh ca Đêm qua ngày (không lưu)
+    CONTEXT_DAYS_BEFORE = 2
+    CONTEXT_DAYS_AFTER = 1
+
     def __init__(
         self,
         repo: ShiftAttendanceMainContent2Repository | None = None,
         arrange_repo: ArrangeScheduleRepository | None = None,
+        symbol_service: AttendanceSymbolService | None = None,
     ) -> None:
         self._repo = repo or ShiftAttendanceMainContent2Repository()
         self._arrange_repo = arrange_repo or ArrangeScheduleRepository()
-
-    @staticmethod
-    def _time_to_seconds(value: object | None) -> int | None:
-        if value is None:
-            return None
-
-        if isinstance(value, _dt.time):
-            return int(value.hour) * 3600 + int(value.minute) * 60 + int(value.second)
-
-        if isinstance(value, _dt.timedelta):
-            try:
-                sec = int(value.total_seconds())
-                return sec % 86400
-            except Exception:
-                return None
-
-        # Some drivers may return datetime or string
-        if isinstance(value, _dt.datetime):
-            t = value.time()
-            return int(t.hour) * 3600 + int(t.minute) * 60 + int(t.second)
-
-        s = str(value).strip()
-        if not s:
-            return None
-
-        # datetime-like: keep last token
-        if " " in s and ":" in s:
-            s = s.split()[-1].strip()
-
-        # Accept HH:MM or HH:MM:SS
-        parts = [p for p in s.split(":") if p != ""]
-        if len(parts) < 2:
-            return None
-        try:
-            hh = int(float(parts[0]))
-            mm = int(float(parts[1]))
-            ss = int(float(parts[2])) if len(parts) >= 3 else 0
-            if hh < 0 or mm < 0 or ss < 0:
-                return None
-            return hh * 3600 + mm * 60 + ss
-        except Exception:
-            return None
-
-    @classmethod
-    def _collect_sorted_times(cls, row: dict[str, Any]) -> list[object]:
-        keys = ("in_1", "out_1", "in_2", "out_2", "in_3", "out_3")
-        items: list[tuple[int, int, object]] = []
-        for idx, k in enumerate(keys):
-            v = row.get(k)
-            sec = cls._time_to_seconds(v)
-            if sec is None:
-                continue
-            items.append((int(sec), int(idx), v))
-        items.sort(key=lambda t: (t[0], t[1]))
-        return [v for _sec, _idx, v in items]
+        self._symbol_service = symbol_service or AttendanceSymbolService()
 
     @staticmethod
     def _date_to_day_key(value: object | None) -> str:
@@ -127,563 +102,45 @@ class ShiftAttendanceMainContent2Service:
             )
         )
 
-    @classmethod
-    def _pick_time_in_range(
-        cls,
-        values: list[object],
-        *,
-        start_sec: int | None,
-        end_sec: int | None,
-        pick: str,
-    ) -> object | None:
-        if not values:
-            return None
-
-        def _sec_in_range(s: int, start: int | None, end: int | None) -> bool:
-            if start is None and end is None:
-                return True
-            if start is None:
-                return s <= int(end)
-            if end is None:
-                return s >= int(start)
-
-            # Support range that crosses midnight: e.g. 22:00 -> 02:00
-            if int(start) <= int(end):
-                return int(start) <= s <= int(end)
-            return s >= int(start) or s <= int(end)
-
-        def _in_range(v: object) -> bool:
-            s = cls._time_to_seconds(v)
-            if s is None:
-                return False
-            return _sec_in_range(int(s), start_sec, end_sec)
-
-        candidates = [v for v in values if _in_range(v)]
-        if not candidates:
-            return None
-
-        candidates_sorted = sorted(
-            candidates,
-            key=lambda v: (int(cls._time_to_seconds(v) or 0),),
-        )
-        return candidates_sorted[0] if pick == "first" else candidates_sorted[-1]
-
-    @classmethod
-    def _remove_first_occurrence(cls, values: list[object], target: object) -> None:
-        try:
-            values.remove(target)
-        except Exception:
-            # fallback by seconds compare
-            t_sec = cls._time_to_seconds(target)
-            if t_sec is None:
-                return
-            for i, v in enumerate(list(values)):
-                if cls._time_to_seconds(v) == t_sec:
-                    try:
-                        values.pop(i)
-                    except Exception:
-                        pass
-                    return
-
-    @classmethod
-    def _apply_mode_auto_by_shifts(
-        cls,
-        row: dict[str, Any],
-        *,
-        shifts: list[dict[str, Any]],
-    ) -> None:
-        """Auto mode dựa trên danh sách ca (work_shifts) theo thứ tự."""
-
-        punches = cls._collect_sorted_times(row)
-        keys = ("in_1", "out_1", "in_2", "out_2", "in_3", "out_3")
-        for k in keys:
-            row[k] = None
-
-        used_any = False
-        used_night = False
-
-        def _is_overnight_shift(sh: dict[str, Any]) -> bool:
-            tin = cls._time_to_seconds(sh.get("time_in"))
-            tout = cls._time_to_seconds(sh.get("time_out"))
-            if tin is not None and tout is not None and int(tout) < int(tin):
-                return True
-
-            win_in = cls._time_to_seconds(sh.get("in_window_start"))
-            win_out = cls._time_to_seconds(sh.get("out_window_end"))
-            if (
-                win_in is not None
-                and win_out is not None
-                and int(win_out) < int(win_in)
-            ):
-                return True
-
-            return False
-
-        def _pick_out_relaxed(
-            values: list[object],
-            *,
-            shift: dict[str, Any],
-            out_start_sec: int | None,
-            out_end_sec: int | None,
-        ) -> object | None:
-            """Chọn giờ ra để HIỂN THỊ (cho phép ngoài out_window_end => tăng ca).
-
-            Quy tắc:
-            - Ca ngày: lấy lần chấm MUỘN NHẤT từ out_window_start trở đi.
-            - Ca đêm: chỉ lấy giờ buổi sáng (mặc định tới 15:00) để không ăn nhầm punch buổi tối.
-            """
-
-            if not values:
-                return None
-
-            start = int(out_start_sec) if out_start_sec is not None else None
-
-            is_night = _is_overnight_shift(shift)
-            if not is_night:
-                # Day shift: allow any time >= start
-                candidates: list[object] = []
-                for v in values:
-                    s = cls._time_to_seconds(v)
-                    if s is None:
-                        continue
-                    if start is not None and int(s) < int(start):
-                        continue
-                    candidates.append(v)
-                if not candidates:
-                    return None
-                return max(candidates, key=lambda v: int(cls._time_to_seconds(v) or 0))
-
-            # Night shift: out should be morning; allow overtime but cap by 15:00
-            upper = 15 * 3600
-            if out_end_sec is not None:
-                try:
-                    upper = max(int(upper), int(out_end_sec))
-                except Exception:
-                    pass
-            if start is None:
-                start = 0
-
-            candidates2: list[object] = []
-            for v in values:
-                s = cls._time_to_seconds(v)
-                if s is None:
-                    continue
-                if int(s) < int(start):
-                    continue
-                if int(s) > int(upper):
-                    continue
-                candidates2.append(v)
-            if not candidates2:
-                return None
-            return max(candidates2, key=lambda v: int(cls._time_to_seconds(v) or 0))
-
-        def _sec(v: object | None) -> int | None:
-            return cls._time_to_seconds(v)
-
-        pair_idx = 0
-        for sh in shifts:
-            if pair_idx >= 3:
-                break
-
-            in_start = sh.get("in_window_start") or sh.get("time_in")
-            in_end = sh.get("in_window_end") or sh.get("time_in")
-            out_start = sh.get("out_window_start") or sh.get("time_out")
-            out_end = sh.get("out_window_end") or sh.get("time_out")
-
-            in_start_sec = _sec(in_start)
-            in_end_sec = _sec(in_end)
-            out_start_sec = _sec(out_start)
-            out_end_sec = _sec(out_end)
-
-            # Strict match để XÁC ĐỊNH ca
-            in_strict = None
-            if in_start_sec is not None or in_end_sec is not None:
-                in_strict = cls._pick_time_in_range(
-                    punches,
-                    start_sec=in_start_sec,
-                    end_sec=in_end_sec,
-                    pick="first",
-                )
-
-            out_strict = None
-            if out_start_sec is not None or out_end_sec is not None:
-                out_strict = cls._pick_time_in_range(
-                    punches,
-                    start_sec=out_start_sec,
-                    end_sec=out_end_sec,
-                    pick="last",
-                )
-
-            # Nếu không match được gì trong window thì KHÔNG coi là ca này
-            if in_strict is None and out_strict is None:
-                continue
-
-            in_val = in_strict
-            if in_val is not None:
-                cls._remove_first_occurrence(punches, in_val)
-
-            # Out hiển thị: ưu tiên out_strict, nếu không có thì lấy overtime (relaxed)
-            out_val = out_strict
-            if out_val is None:
-                out_val = _pick_out_relaxed(
-                    punches,
-                    shift=sh,
-                    out_start_sec=out_start_sec,
-                    out_end_sec=out_end_sec,
-                )
-            if out_val is not None:
-                cls._remove_first_occurrence(punches, out_val)
-
-            row[f"in_{pair_idx + 1}"] = in_val
-            row[f"out_{pair_idx + 1}"] = out_val
-
-            if in_val is not None or out_val is not None:
-                used_any = True
-                if _is_overnight_shift(sh):
-                    used_night = True
-
-            pair_idx += 1
-
-        if used_any:
-            row["shift_code"] = "Đêm" if used_night else "HC"
-
-    @classmethod
-    def _apply_mode_first_last_by_shifts(
-        cls,
-        row: dict[str, Any],
-        *,
-        shifts: list[dict[str, Any]],
-    ) -> None:
-        punches = cls._collect_sorted_times(row)
-        for k in ("in_1", "out_1", "in_2", "out_2", "in_3", "out_3"):
-            row[k] = None
-        if not punches:
-            return
-
-        def _is_overnight_shift(sh: dict[str, Any]) -> bool:
-            tin = cls._time_to_seconds(sh.get("time_in"))
-            tout = cls._time_to_seconds(sh.get("time_out"))
-            if tin is not None and tout is not None and int(tout) < int(tin):
-                return True
-            win_in = cls._time_to_seconds(sh.get("in_window_start"))
-            win_out = cls._time_to_seconds(sh.get("out_window_end"))
-            if (
-                win_in is not None
-                and win_out is not None
-                and int(win_out) < int(win_in)
-            ):
-                return True
-            return False
-
-        def _sec(v: object | None) -> int | None:
-            return cls._time_to_seconds(v)
-
-        def _match_shift_for_in(punch: object) -> dict[str, Any] | None:
-            ps = cls._time_to_seconds(punch)
-            if ps is None:
-                return None
-
-            best: dict[str, Any] | None = None
-            best_score: int | None = None
-            for sh in shifts or []:
-                in_start = sh.get("in_window_start") or sh.get("time_in")
-                in_end = sh.get("in_window_end") or sh.get("time_in")
-
-                in_start_sec = _sec(in_start)
-                in_end_sec = _sec(in_end)
-                # Không cho match nếu window/time không có (tránh match nhầm mọi punch)
-                if in_start_sec is None and in_end_sec is None:
-                    continue
-                if (
-                    cls._pick_time_in_range(
-                        [punch],
-                        start_sec=in_start_sec,
-                        end_sec=in_end_sec,
-                        pick="first",
-                    )
-                    is None
-                ):
-                    continue
-
-                base = cls._time_to_seconds(sh.get("time_in"))
-                if base is None:
-                    score = 0
-                else:
-                    score = abs(int(ps) - int(base))
-
-                if best_score is None or score < best_score:
-                    best = sh
-                    best_score = score
-
-            return best
-
-        def _match_shift_for_out(punch: object) -> dict[str, Any] | None:
-            ps = cls._time_to_seconds(punch)
-            if ps is None:
-                return None
-
-            best: dict[str, Any] | None = None
-            best_score: int | None = None
-            for sh in shifts or []:
-                out_start = sh.get("out_window_start") or sh.get("time_out")
-                out_end = sh.get("out_window_end") or sh.get("time_out")
-
-                out_start_sec = _sec(out_start)
-                out_end_sec = _sec(out_end)
-                # Không cho match nếu window/time không có (tránh match nhầm mọi punch)
-                if out_start_sec is None and out_end_sec is None:
-                    continue
-                if (
-                    cls._pick_time_in_range(
-                        [punch],
-                        start_sec=out_start_sec,
-                        end_sec=out_end_sec,
-                        pick="first",
-                    )
-                    is None
-                ):
-                    continue
-
-                base = cls._time_to_seconds(sh.get("time_out"))
-                if base is None:
-                    score = 0
-                else:
-                    score = abs(int(ps) - int(base))
-
-                if best_score is None or score < best_score:
-                    best = sh
-                    best_score = score
-
-            return best
-
-        def _pick_out_relaxed(
-            values: list[object],
-            *,
-            shift: dict[str, Any],
-        ) -> object | None:
-            if not values:
-                return None
-
-            out_start = shift.get("out_window_start") or shift.get("time_out")
-            out_end = shift.get("out_window_end") or shift.get("time_out")
-            out_start_sec = cls._time_to_seconds(out_start)
-            out_end_sec = cls._time_to_seconds(out_end)
-
-            start = int(out_start_sec) if out_start_sec is not None else None
-            is_night = _is_overnight_shift(shift)
-            if not is_night:
-                candidates: list[object] = []
-                for v in values:
-                    s = cls._time_to_seconds(v)
-                    if s is None:
-                        continue
-                    if start is not None and int(s) < int(start):
-                        continue
-                    candidates.append(v)
-                if not candidates:
-                    return None
-                return max(candidates, key=lambda v: int(cls._time_to_seconds(v) or 0))
-
-            upper = 15 * 3600
-            if out_end_sec is not None:
-                try:
-                    upper = max(int(upper), int(out_end_sec))
-                except Exception:
-                    pass
-            if start is None:
-                start = 0
-
-            candidates2: list[object] = []
-            for v in values:
-                s = cls._time_to_seconds(v)
-                if s is None:
-                    continue
-                if int(s) < int(start):
-                    continue
-                if int(s) > int(upper):
-                    continue
-                candidates2.append(v)
-            if not candidates2:
-                return None
-            return max(candidates2, key=lambda v: int(cls._time_to_seconds(v) or 0))
-
-        # Pick IN: earliest punch that matches ANY shift in-window
-        punches_sorted = sorted(
-            punches, key=lambda v: int(cls._time_to_seconds(v) or 0)
-        )
-        in_val = None
-        in_shift: dict[str, Any] | None = None
-        for p in punches_sorted:
-            sh = _match_shift_for_in(p)
-            if sh is not None:
-                in_val = p
-                in_shift = sh
-                break
-        if in_val is not None:
-            cls._remove_first_occurrence(punches, in_val)
-
-        # Pick OUT strict: latest punch that matches ANY shift out-window
-        punches_sorted2 = sorted(
-            punches,
-            key=lambda v: int(cls._time_to_seconds(v) or 0),
-            reverse=True,
-        )
-        out_strict = None
-        out_shift: dict[str, Any] | None = None
-        for p in punches_sorted2:
-            sh = _match_shift_for_out(p)
-            if sh is not None:
-                out_strict = p
-                out_shift = sh
-                break
-
-        out_val = out_strict
-        if out_val is not None:
-            cls._remove_first_occurrence(punches, out_val)
-        else:
-            # Relax overtime display: dựa trên shift đã match IN, nếu không có thì dùng shift match OUT (hiếm)
-            base_shift = in_shift or out_shift
-            if base_shift is not None:
-                out_val = _pick_out_relaxed(punches, shift=base_shift)
-                if out_val is not None:
-                    cls._remove_first_occurrence(punches, out_val)
-
-        row["in_1"] = in_val
-        row["out_1"] = out_val
-
-        def _is_overnight_shift(sh: dict[str, Any]) -> bool:
-            tin = cls._time_to_seconds(sh.get("time_in"))
-            tout = cls._time_to_seconds(sh.get("time_out"))
-            if tin is not None and tout is not None and int(tout) < int(tin):
-                return True
-            win_in = cls._time_to_seconds(sh.get("in_window_start"))
-            win_out = cls._time_to_seconds(sh.get("out_window_end"))
-            if (
-                win_in is not None
-                and win_out is not None
-                and int(win_out) < int(win_in)
-            ):
-                return True
-            return False
-
-        # Chỉ set ca khi có match trong window
-        if shifts and (in_shift is not None or out_shift is not None):
-            base = in_shift or out_shift
-            row["shift_code"] = "Đêm" if _is_overnight_shift(base or {}) else "HC"
-
-    @classmethod
-    def _compute_shift_label_from_punches(
-        cls,
+    @staticmethod
+    def _arranged_fingerprint(
+        context: str,
         row: dict[str, Any],
-        *,
-        shifts: list[dict[str, Any]],
-    ) -> str | None:
-        punches = cls._collect_sorted_times(row)
-        if not punches or not shifts:
-            return None
-
-        def _is_overnight_shift(sh: dict[str, Any]) -> bool:
-            tin = cls._time_to_seconds(sh.get("time_in"))
-            tout = cls._time_to_seconds(sh.get("time_out"))
-            if tin is not None and tout is not None and int(tout) < int(tin):
-                return True
-            win_in = cls._time_to_seconds(sh.get("in_window_start"))
-            win_out = cls._time_to_seconds(sh.get("out_window_end"))
-            if (
-                win_in is not None
-                and win_out is not None
-                and int(win_out) < int(win_in)
-            ):
-                return True
-            return False
-
-        def _sec(v: object | None) -> int | None:
-            return cls._time_to_seconds(v)
-
-        used_any = False
-        used_night = False
-
-        for sh in shifts:
-            in_start = sh.get("in_window_start") or sh.get("time_in")
-            in_end = sh.get("in_window_end") or sh.get("time_in")
-            out_start = sh.get("out_window_start") or sh.get("time_out")
-            out_end = sh.get("out_window_end") or sh.get("time_out")
-
-            in_start_sec = _sec(in_start)
-            in_end_sec = _sec(in_end)
-            out_start_sec = _sec(out_start)
-            out_end_sec = _sec(out_end)
-
-            in_hit = None
-            if in_start_sec is not None or in_end_sec is not None:
-                in_hit = cls._pick_time_in_range(
-                    punches,
-                    start_sec=in_start_sec,
-                    end_sec=in_end_sec,
-                    pick="first",
-                )
-
-            out_hit = None
-            if out_start_sec is not None or out_end_sec is not None:
-                out_hit = cls._pick_time_in_range(
-                    punches,
-                    start_sec=out_start_sec,
-                    end_sec=out_end_sec,
-                    pick="first",
-                )
-
-            if in_hit is None and out_hit is None:
-                continue
-
-            used_any = True
-            if _is_overnight_shift(sh):
-                used_night = True
-
-        if not used_any:
-            return None
-        return "Đêm" if used_night else "HC"
-
-    @classmethod
-    def _apply_mode_auto(cls, row: dict[str, Any]) -> None:
-        sorted_vals = cls._collect_sorted_times(row)
-        keys = ("in_1", "out_1", "in_2", "out_2", "in_3", "out_3")
-        for i, k in enumerate(keys):
-            row[k] = sorted_vals[i] if i < len(sorted_vals) else None
-
-    @classmethod
-    def _apply_mode_first_last(cls, row: dict[str, Any]) -> None:
-        sorted_vals = cls._collect_sorted_times(row)
-        # Reset all
-        for k in ("in_1", "out_1", "in_2", "out_2", "in_3", "out_3"):
-            row[k] = None
-        if not sorted_vals:
-            return
-        row["in_1"] = sorted_vals[0]
-        if len(sorted_vals) >= 2:
-            row["out_1"] = sorted_vals[-1]
-
-    def list_attendance_audit_arranged(
+        engine: ShiftMatchingEngine,
+        stored_code: str | None,
+        with_stored_code: bool,
+    ) -> str:
+        """sha1 dữ liệu đầu vào của 1 dòng (context = chế độ + ca đã compile + đầu vào tính công)."""
+
+        parts = [context]
+        for k in PAIR_KEYS:
+            sec = engine.seconds(row.get(k))
+            parts.append("" if sec is None else str(sec))
+        # Bỏ khoá import: công phải tính lại
+        parts.append("1" if int(row.get("import_locked") or 0) else "0")
+        if with_stored_code:
+            # Không có ca: Ca hiển thị chính là shift_code trong DB
+            parts.append(stored_code or "")
+        return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def _arrange_rows(
         self,
+        rows: list[dict[str, Any]],
+        engine: ShiftMatchingEngine,
         *,
-        from_date: str | None = None,
-        to_date: str | None = None,
-        employee_id: int | None = None,
-        attendance_code: str | None = None,
-        employee_ids: list[int] | None = None,
-        attendance_codes: list[str] | None = None,
-        department_id: int | None = None,
-        title_id: int | None = None,
-    ) -> list[dict[str, Any]]:
-        rows = self._repo.list_rows(
-            from_date=from_date,
-            to_date=to_date,
-            employee_id=employee_id,
-            attendance_code=attendance_code,
-            employee_ids=employee_ids,
-            attendance_codes=attendance_codes,
-            department_id=department_id,
-            title_id=title_id,
-        )
+        from_date: str | None,
+        to_date: str | None,
+        timesheet: TimesheetEngine,
+        shifts_by_row: list[tuple[CompiledShift, ...]] | None = None,
+    ) -> tuple[dict[int, str | None], list[int], list[tuple[Any, ...]]]:
+        """Ghép giờ theo mode/ca cho cả tập dòng (dùng lại kết quả đã lưu nếu fingerprint khớp).
+
+        Fingerprint gồm cả đầu vào tính công (timesheet.context(), shift_signature()): dòng
+        khớp fingerprint thì công đã lưu cũng còn đúng. Không ghi DB, không xử lý ca Đêm qua
+        ngày; return (shift_code DB theo audit id, vị trí các dòng đã ghép lại, item
+        update_arranged của các dòng đó).
+        shifts_by_row: nếu truyền vào, nhận bộ ca của từng dòng (cùng thứ tự rows).
+        """
 
         # Holidays map (for day_key = 'holiday')
         holidays: set[str] = set()
@@ -743,23 +200,34 @@ class ShiftAttendanceMainContent2Service:
                     continue
         all_shift_ids = list(dict.fromkeys(all_shift_ids))
 
-        shift_map: dict[int, dict[str, Any]] = {}
+        # Ca đã compile, cache dùng chung giữa các lượt theo phiên bản work_shifts
+        shift_map: dict[int, CompiledShift] = {}
         try:
             if all_shift_ids:
-                shift_map = self._repo.get_work_shifts_by_ids(all_shift_ids)
+                shift_map = CompiledShiftCache.get_shifts(self._repo, all_shift_ids)
         except Exception:
             logger.exception("Không thể tải work_shifts")
             shift_map = {}
 
-        # Persist shift_code after all post-processing.
+        # shift_code DB theo audit id: caller so sánh sau post-process để ghi lại.
         stored_code_by_audit_id: dict[int, str | None] = {}
 
-        for r in rows:
-
-            def _norm_code(v: object | None) -> str | None:
-                s = str(v or "").strip()
-                return s if s else None
-
+        def _norm_code(v: object | None) -> str | None:
+            s = str(v or "").strip()
+            return s if s else None
+
+        # (schedule_id, day_key) -> bộ ca đã compile (shift1..shift5), dùng chung giữa các dòng
+        shifts_by_key: dict[tuple[int, str], tuple[CompiledShift, ...]] = {}
+        # (mode, bộ ca, ngày lễ không có ca) -> chuỗi context cho fingerprint
+        context_by_key: dict[tuple[str, tuple[CompiledShift, ...], bool], str] = {}
+        timesheet_context = timesheet.context()
+        dirty_index: list[int] = []
+        dirty_rows: list[dict[str, Any]] = []
+        dirty_fingerprints: list[str] = []
+        modes: list[str] = []
+        dirty_shifts: list[tuple[CompiledShift, ...]] = []
+
+        for idx, r in enumerate(rows):
             stored_code = _norm_code(r.get("shift_code_db"))
             # Mặc định: hiển thị giá trị DB (device mode), auto/first_last sẽ recompute.
             r["shift_code"] = stored_code
@@ -793,77 +261,239 @@ class ShiftAttendanceMainContent2Service:
                 r["schedule_id"] = None
 
             # Build ordered shifts (shift1..shift5)
-            shifts: list[dict[str, Any]] = []
+            shifts: tuple[CompiledShift, ...] = ()
             if r.get("schedule_id") is not None and day_key:
-                detail = details_map.get((int(r.get("schedule_id")), str(day_key)))
-                if detail is not None:
-                    for k in (
-                        "shift1_id",
-                        "shift2_id",
-                        "shift3_id",
-                        "shift4_id",
-                        "shift5_id",
-                    ):
-                        sid = detail.get(k)
-                        if sid is None:
-                            continue
-                        try:
-                            sh = shift_map.get(int(sid))
-                            if sh is not None:
-                                shifts.append(sh)
-                        except Exception:
-                            continue
-
-            if mode_norm == "auto":
-                if shifts:
-                    # Không dùng lại giá trị DB cũ vì có thể đã bị lưu sai.
-                    r["shift_code"] = None
-                    self._apply_mode_auto_by_shifts(r, shifts=shifts)
-                else:
-                    self._apply_mode_auto(r)
-            elif mode_norm == "first_last":
-                if shifts:
-                    # Không dùng lại giá trị DB cũ vì có thể đã bị lưu sai.
-                    r["shift_code"] = None
-                    self._apply_mode_first_last_by_shifts(r, shifts=shifts)
-                else:
-                    self._apply_mode_first_last(r)
-            else:
-                # device: giữ nguyên giờ nhưng vẫn tính Ca (HC/Đêm) theo work_shifts nếu có
-                if shifts:
-                    r["shift_code"] = self._compute_shift_label_from_punches(
-                        r, shifts=shifts
+                key = (int(r.get("schedule_id")), str(day_key))
+                cached = shifts_by_key.get(key)
+                if cached is None:
+                    ordered: list[CompiledShift] = []
+                    detail = details_map.get(key)
+                    if detail is not None:
+                        for k in (
+                            "shift1_id",
+                            "shift2_id",
+                            "shift3_id",
+                            "shift4_id",
+                            "shift5_id",
+                        ):
+                            sid = detail.get(k)
+                            if sid is None:
+                                continue
+                            try:
+                                sh = shift_map.get(int(sid))
+                                if sh is not None:
+                                    ordered.append(sh)
+                            except Exception:
+                                continue
+                    cached = shifts_by_key[key] = tuple(ordered)
+                shifts = cached
+            if shifts_by_row is not None:
+                shifts_by_row.append(shifts)
+
+            # Không có ca: ngày lễ / ngày thường cho ký hiệu công khác nhau (C10 / C09)
+            ctx_key = (mode_norm, shifts, not shifts and day_key == "holiday")
+            context = context_by_key.get(ctx_key)
+            if context is None:
+                context = repr(
+                    (
+                        self.ARRANGE_VERSION,
+                        mode_norm,
+                        [
+                            (*sh.signature(), *TimesheetEngine.shift_signature(sh))
+                            for sh in shifts
+                        ],
+                        timesheet_context,
+                        ctx_key[2],
                     )
+                )
+                context_by_key[ctx_key] = context
+            fingerprint = self._arranged_fingerprint(
+                context, r, engine, stored_code, not shifts
+            )
+
+            saved = {c: r.pop(c, None) for c in ARRANGED_COLUMNS}
+            if r.get("id") is not None and saved["arranged_fingerprint"] == fingerprint:
+                # Đầu vào không đổi: dùng kết quả đã lưu, không ghép lại
+                for k in PAIR_KEYS:
+                    r[k] = saved[f"arranged_{k}"]
+                r["shift_code"] = _norm_code(saved["arranged_shift_code"])
+                continue
+
+            dirty_index.append(idx)
+            dirty_rows.append(r)
+            dirty_fingerprints.append(fingerprint)
+            modes.append(mode_norm)
+            dirty_shifts.append(shifts)
+
+        engine.arrange(dirty_rows, modes, dirty_shifts)
+        del modes, dirty_shifts
+
+        # Kết quả ghép (trước xử lý ca Đêm qua ngày) của các dòng vừa tính lại
+        arranged_updates: list[tuple[Any, ...]] = []
+        for r, fingerprint in zip(dirty_rows, dirty_fingerprints):
+            if r.get("id") is None:
+                continue
+            try:
+                arranged_updates.append(
+                    (
+                        int(r.get("id")),
+                        *(r.get(k) for k in PAIR_KEYS),
+                        _norm_code(r.get("shift_code")),
+                        fingerprint,
+                    )
+                )
+            except Exception:
+                continue
+        del dirty_rows, dirty_fingerprints
+
+        return stored_code_by_audit_id, dirty_index, arranged_updates
+
+    def list_attendance_audit_arranged(
+        self,
+        *,
+        from_date: str | None = None,
+        to_date: str | None = None,
+        employee_id: int | None = None,
+        attendance_code: str | None = None,
+        employee_ids: list[int] | None = None,
+        attendance_codes: list[str] | None = None,
+        department_id: int | None = None,
+        title_id: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Dòng đã ghép giờ + tính công cho màn hình.
+
+        Không chỉ đọc: dòng có fingerprint khác kết quả đã lưu (lần xem đầu) được ghép lại và
+        lưu (arranged_*, shift_code, công) trong lượt này.
+        """
+
+        rows, _, _ = self._load_arranged(
+            from_date=from_date,
+            to_date=to_date,
+            employee_id=employee_id,
+            attendance_code=attendance_code,
+            employee_ids=employee_ids,
+            attendance_codes=attendance_codes,
+            department_id=department_id,
+            title_id=title_id,
+        )
+        return rows
+
+    @staticmethod
+    def _shift_date(value: str | None, days: int) -> str | None:
+        if not value:
+            return value
+        try:
+            day = _dt.date.fromisoformat(str(value)[:10]) + _dt.timedelta(days=days)
+        except Exception:
+            return value
+        return day.isoformat()
+
+    def _load_arranged(
+        self,
+        *,
+        from_date: str | None = None,
+        to_date: str | None = None,
+        employee_id: int | None = None,
+        attendance_code: str | None = None,
+        employee_ids: list[int] | None = None,
+        attendance_codes: list[str] | None = None,
+        department_id: int | None = None,
+        title_id: int | None = None,
+    ) -> tuple[list[dict[str, Any]], int, int]:
+        """Đọc + ghép giờ + tính công; return (rows, số dòng đã ghép lại, số dòng công đã lưu).
+
+        Đọc thêm CONTEXT_DAYS_BEFORE/AFTER ngày ngoài khoảng ngày làm ngữ cảnh ca Đêm qua ngày
+        (không trả về, không lưu) nên dòng được lưu luôn tính với đủ các ngày liền kề.
+        Công chỉ tính lại cho dòng có fingerprint đổi và dòng liền kề (ca Đêm qua ngày);
+        arranged_*, shift_code và công lưu chung 1 transaction.
+        """
+
+        read_from = self._shift_date(from_date, -self.CONTEXT_DAYS_BEFORE)
+        read_to = self._shift_date(to_date, self.CONTEXT_DAYS_AFTER)
+        rows = self._repo.list_rows(
+            from_date=read_from,
+            to_date=read_to,
+            employee_id=employee_id,
+            attendance_code=attendance_code,
+            employee_ids=employee_ids,
+            attendance_codes=attendance_codes,
+            department_id=department_id,
+            title_id=title_id,
+        )
+
+        day_from = str(from_date)[:10] if from_date else ""
+        day_to = str(to_date)[:10] if to_date else ""
+        in_range: list[bool] = []
+        for r in rows:
+            day = str(r.get("date") or "")[:10]
+            in_range.append(
+                (not day_from or day >= day_from) and (not day_to or day <= day_to)
+            )
+
+        # Không tải được ký hiệu: vẫn hiển thị nhưng không lưu gì (fingerprint gồm ký hiệu)
+        can_save = True
+        symbols: dict[str, str] = {}
+        try:
+            symbols = TimesheetEngine.symbols_from_rows(
+                self._symbol_service.list_rows_by_code()
+            )
+        except Exception:
+            logger.exception("Không thể tải ký hiệu chấm công, bỏ qua lưu kết quả")
+            can_save = False
+
+        engine = ShiftMatchingEngine()
+        timesheet = TimesheetEngine(symbols, engine)
+        shifts_by_row: list[tuple[CompiledShift, ...]] = []
+        stored_code_by_audit_id, dirty_index, arranged_updates = self._arrange_rows(
+            rows,
+            engine,
+            from_date=read_from,
+            to_date=read_to,
+            timesheet=timesheet,
+            shifts_by_row=shifts_by_row,
+        )
+
+        def _norm_code(v: object | None) -> str | None:
+            s = str(v or "").strip()
+            return s if s else None
+
+        def _row_date_key(v: object | None) -> str:
+            if v is None:
+                return ""
+            try:
+                return str(v)
+            except Exception:
+                return ""
+
+        by_emp: dict[str, list[dict[str, Any]]] = {}
+        for r in rows:
+            key = str(
+                r.get("employee_code")
+                or r.get("attendance_code")
+                or r.get("employee_id")
+                or ""
+            ).strip()
+            if not key:
+                continue
+            by_emp.setdefault(key, []).append(r)
+        for items in by_emp.values():
+            items.sort(
+                key=lambda r: (
+                    _row_date_key(r.get("date")),
+                    int(r.get("id") or 0),
+                )
+            )
 
         # Post-process: ca Đêm thường có giờ ra nằm ở ngày kế tiếp (buổi sáng).
         # Nếu ngày kế tiếp chỉ có punch buổi sáng (không có punch trong ngày), coi đó là phần dư của ca Đêm hôm trước
         # và không hiển thị ở ngày kế tiếp.
         try:
-            by_emp: dict[str, list[dict[str, Any]]] = {}
-            for r in rows:
-                key = str(
-                    r.get("employee_code")
-                    or r.get("attendance_code")
-                    or r.get("employee_id")
-                    or ""
-                ).strip()
-                if not key:
-                    continue
-                by_emp.setdefault(key, []).append(r)
-
-            def _row_date_key(v: object | None) -> str:
-                if v is None:
-                    return ""
-                try:
-                    return str(v)
-                except Exception:
-                    return ""
 
             def _row_time_values(row: dict[str, Any]) -> list[object]:
                 out: list[object] = []
                 for k in ("in_1", "out_1", "in_2", "out_2", "in_3", "out_3"):
                     v = row.get(k)
-                    if self._time_to_seconds(v) is None:
+                    if engine.seconds(v) is None:
                         continue
                     out.append(v)
                 return out
@@ -871,13 +501,6 @@ class ShiftAttendanceMainContent2Service:
             MORNING_CUTOFF_SEC = 12 * 3600
 
             for emp_key, items in by_emp.items():
-                items.sort(
-                    key=lambda r: (
-                        _row_date_key(r.get("date")),
-                        int(r.get("id") or 0),
-                    )
-                )
-
                 for i in range(1, len(items)):
                     prev = items[i - 1]
                     cur = items[i]
@@ -888,7 +511,7 @@ class ShiftAttendanceMainContent2Service:
                     if not cur_times:
                         continue
 
-                    secs = [self._time_to_seconds(v) for v in cur_times]
+                    secs = [engine.seconds(v) for v in cur_times]
                     secs2 = [int(s) for s in secs if s is not None]
                     if not secs2:
                         continue
@@ -899,11 +522,11 @@ class ShiftAttendanceMainContent2Service:
 
                     # Lấy punch buổi sáng muộn nhất để bổ sung cho giờ ra ca Đêm hôm trước (nếu cần).
                     best_time = max(
-                        cur_times, key=lambda v: int(self._time_to_seconds(v) or 0)
+                        cur_times, key=lambda v: int(engine.seconds(v) or 0)
                     )
                     prev_out = prev.get("out_1")
-                    prev_out_sec = self._time_to_seconds(prev_out)
-                    best_sec = self._time_to_seconds(best_time)
+                    prev_out_sec = engine.seconds(prev_out)
+                    best_sec = engine.seconds(best_time)
 
                     if best_sec is not None:
                         if prev_out_sec is None or int(best_sec) > int(prev_out_sec):
@@ -916,30 +539,123 @@ class ShiftAttendanceMainContent2Service:
         except Exception:
             logger.exception("Lỗi post-process ca Đêm qua ngày")
 
-        pending_shift_code_updates: list[tuple[int, str | None]] = []
-        for r in rows:
+        # Dòng cần tính lại công: dòng đã ghép lại + dòng mà post-process có thể đổi theo nó
+        # (ngày X phụ thuộc X-2 (X-1 bị xoá hay không), X-1, X+1)
+        # Dòng ảo (ngày không chấm công, không có id) luôn "đổi" nhưng không có giờ chấm nên
+        # không làm đổi dòng liền kề
+        position = {id(r): i for i, r in enumerate(rows)}
+        dirty = {i for i in dirty_index if rows[i].get("id") is not None}
+        touched = set(dirty_index)
+        for items in by_emp.values():
+            for i, r in enumerate(items):
+                if position[id(r)] not in dirty:
+                    continue
+                for j in range(max(0, i - 1), min(len(items), i + 3)):
+                    touched.add(position[id(items[j])])
 
-            def _norm_code2(v: object | None) -> str | None:
-                s = str(v or "").strip()
-                return s if s else None
+        save_ids: set[int] = set()
+        for r, ok in zip(rows, in_range):
+            if ok and r.get("id") is not None:
+                try:
+                    save_ids.add(int(r.get("id")))
+                except Exception:
+                    pass
+        arranged_updates = [u for u in arranged_updates if u[0] in save_ids]
 
+        pending_shift_code_updates: list[tuple[int, str | None]] = []
+        for r in rows:
             try:
                 audit_id = r.get("id")
                 if audit_id is None:
                     continue
                 aid = int(audit_id)
+                if aid not in save_ids:
+                    continue
                 stored_code = stored_code_by_audit_id.get(aid)
-                computed_code = _norm_code2(r.get("shift_code"))
+                computed_code = _norm_code(r.get("shift_code"))
                 if computed_code != stored_code:
                     pending_shift_code_updates.append((aid, computed_code))
             except Exception:
                 pass
 
-        # Batch write shift_code xuống DB (không throw để tránh crash UI)
-        if pending_shift_code_updates:
+        # Tính công từ giờ đã ghép (sau xử lý ca Đêm qua ngày) cho các dòng cần tính lại
+        timesheet_updates: list[tuple[Any, ...]] = []
+        try:
+            recalc = sorted(i for i in touched if in_range[i])
+            timesheet_updates = timesheet.apply(
+                [rows[i] for i in recalc], [shifts_by_row[i] for i in recalc]
+            )
+        except Exception:
+            logger.exception("Không thể tính công")
+            can_save = False
+
+        # Lưu chung 1 transaction: fingerprint đã lưu luôn đi kèm công tương ứng
+        # (không throw để tránh crash UI)
+        timesheet_written = 0
+        if can_save and (arranged_updates or pending_shift_code_updates or timesheet_updates):
             try:
-                self._repo.update_shift_codes(pending_shift_code_updates)
+                with Database.transaction():
+                    if arranged_updates:
+                        self._repo.update_arranged(arranged_updates)
+                    if pending_shift_code_updates:
+                        self._repo.update_shift_codes(pending_shift_code_updates)
+                    if timesheet_updates:
+                        timesheet_written = self._repo.update_timesheet(
+                            timesheet_updates
+                        )
             except Exception:
-                logger.exception("Không thể cập nhật shift_code vào attendance_audit")
+                logger.exception("Không thể lưu kết quả ghép giờ / công vào attendance_audit")
+                timesheet_written = 0
 
-        return rows
+        if not all(in_range):
+            rows = [r for r, ok in zip(rows, in_range) if ok]
+        return rows, len(arranged_updates), timesheet_written
+
+    def recompute_timesheets(
+        self,
+        *,
+        from_date: str,
+        to_date: str,
+        employee_ids: list[int] | None = None,
+        attendance_codes: list[str] | None = None,
+    ) -> int:
+        """Ghép lại + tính công cho dòng có đầu vào đã đổi trong khoảng ngày (không cần mở
+        màn hình); return số dòng công đã lưu."""
+
+        _, _, written = self._load_arranged(
+            from_date=from_date,
+            to_date=to_date,
+            employee_ids=employee_ids,
+            attendance_codes=attendance_codes,
+        )
+        return written
+
+    def refresh_arranged(
+        self,
+        *,
+        from_date: str,
+        to_date: str,
+        employee_ids: list[int] | None = None,
+        attendance_codes: list[str] | None = None,
+    ) -> int:
+        """Ghép lại + lưu arranged_*/shift_code/công cho các dòng có đầu vào đã đổi (chạy nền).
+
+        Đọc theo từng đoạn REFRESH_DAYS ngày nên RAM không tăng theo cả khoảng ngày; mỗi đoạn
+        đọc hết (list_rows, trả kết nối về pool) rồi mới ghi, không giữ stream khi ghi.
+        Return số dòng đã ghép lại.
+        """
+
+        start = _dt.date.fromisoformat(str(from_date)[:10])
+        end = _dt.date.fromisoformat(str(to_date)[:10])
+        recomputed = 0
+        while start <= end:
+            chunk_end = min(end, start + _dt.timedelta(days=self.REFRESH_DAYS - 1))
+            _, n, _ = self._load_arranged(
+                from_date=start.isoformat(),
+                to_date=chunk_end.isoformat(),
+                employee_ids=employee_ids,
+                attendance_codes=attendance_codes,
+            )
+            recomputed += n
+            start = chunk_end + _dt.timedelta(days=1)
+        return recomputed
@@ -0,0 +1,599 @@
+"""services.shift_matching_services
+
+Bộ ghép giờ vào/ra theo ca cho cả tập dòng attendance_audit (MainContent2).
+
+- Giờ chấm (in_1..out_3) và khung giờ ca được đổi sang số giây 1 lần (cache theo giá
+  trị), không parse lại cho từng dòng / từng ca.
+- Ca làm việc được compile 1 lần (CompiledShift: số giây, khung giờ, cờ ca đêm) và cache
+  dùng chung giữa các lượt tính theo phiên bản bảng work_shifts (CompiledShiftCache).
+- Kết quả khớp ca theo giờ chấm (chế độ first_last) được nhớ theo (bộ ca, số giây).
+- Quy tắc ghép giống hệt cách tính từng dòng trước đây:
+  - auto: duyệt ca theo thứ tự, giờ vào = lần chấm sớm nhất trong khung vào, giờ ra =
+    lần chấm muộn nhất trong khung ra (không có thì lấy giờ ra tăng ca).
+  - first_last: giờ vào = lần chấm sớm nhất khớp khung vào của 1 ca, giờ ra = lần chấm
+    muộn nhất khớp khung ra của 1 ca (không có thì giờ ra tăng ca theo ca của giờ vào).
+  - device: giữ nguyên giờ, chỉ tính Ca (HC/Đêm).
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import logging
+import threading
+from typing import Any, Iterable, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+PAIR_KEYS = ("in_1", "out_1", "in_2", "out_2", "in_3", "out_3")
+
+# Ca đêm: giờ ra tăng ca chỉ lấy lần chấm buổi sáng (tới 15:00 hoặc hết khung ra)
+NIGHT_OUT_UPPER_SEC = 15 * 3600
+
+SHIFT_CODE_DAY = "HC"
+SHIFT_CODE_NIGHT = "Đêm"
+
+
+def time_to_seconds(value: object | None) -> int | None:
+    if value is None:
+        return None
+
+    if isinstance(value, _dt.time):
+        return int(value.hour) * 3600 + int(value.minute) * 60 + int(value.second)
+
+    if isinstance(value, _dt.timedelta):
+        try:
+            sec = int(value.total_seconds())
+            return sec % 86400
+        except Exception:
+            return None
+
+    # Some drivers may return datetime or string
+    if isinstance(value, _dt.datetime):
+        t = value.time()
+        return int(t.hour) * 3600 + int(t.minute) * 60 + int(t.second)
+
+    s = str(value).strip()
+    if not s:
+        return None
+
+    # datetime-like: keep last token
+    if " " in s and ":" in s:
+        s = s.split()[-1].strip()
+
+    # Accept HH:MM or HH:MM:SS
+    parts = [p for p in s.split(":") if p != ""]
+    if len(parts) < 2:
+        return None
+    try:
+        hh = int(float(parts[0]))
+        mm = int(float(parts[1]))
+        ss = int(float(parts[2])) if len(parts) >= 3 else 0
+        if hh < 0 or mm < 0 or ss < 0:
+            return None
+        return hh * 3600 + mm * 60 + ss
+    except Exception:
+        return None
+
+
+def sec_in_range(s: int, start: int | None, end: int | None) -> bool:
+    if start is None and end is None:
+        return True
+    if start is None:
+        return s <= end
+    if end is None:
+        return s >= start
+
+    # Support range that crosses midnight: e.g. 22:00 -> 02:00
+    if start <= end:
+        return start <= s <= end
+    return s >= start or s <= end
+
+
+# Trường của CompiledShift dùng khi ghép giờ (signature / fingerprint kết quả ghép)
+_MATCH_FIELDS = (
+    "shift_id",
+    "shift_code",
+    "in_start",
+    "in_end",
+    "out_start",
+    "out_end",
+    "time_in",
+    "time_out",
+    "lunch_start",
+    "lunch_end",
+    "overnight",
+)
+
+
+class CompiledShift:
+    """Ca làm việc đã compile (bất biến): mọi mốc giờ là số giây trong ngày.
+
+    Khung vào/ra đã áp mặc định: không khai báo khung thì dùng time_in/time_out.
+    total_minutes / work_count / overtime_round_minutes chỉ dùng khi tính công
+    (services.timesheet_services), không thuộc signature().
+    """
+
+    __slots__ = (
+        "shift_id",
+        "shift_code",
+        "in_start",
+        "in_end",
+        "out_start",
+        "out_end",
+        "time_in",
+        "time_out",
+        "lunch_start",
+        "lunch_end",
+        "overnight",
+        "total_minutes",
+        "work_count",
+        "overtime_round_minutes",
+    )
+
+    shift_id: int | None
+    shift_code: str
+    in_start: int | None
+    in_end: int | None
+    out_start: int | None
+    out_end: int | None
+    time_in: int | None
+    time_out: int | None
+    lunch_start: int | None
+    lunch_end: int | None
+    overnight: bool
+    total_minutes: int | None
+    work_count: float | None
+    overtime_round_minutes: int
+
+    def __init__(self, **values: Any) -> None:
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} là bất biến")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} là bất biến")
+
+    def __repr__(self) -> str:
+        return f"CompiledShift(id={self.shift_id!r}, code={self.shift_code!r})"
+
+    def signature(self) -> tuple[Any, ...]:
+        """Giá trị ca dùng khi ghép giờ (fingerprint dữ liệu đầu vào khi lưu kết quả ghép)."""
+
+        return tuple(getattr(self, name) for name in _MATCH_FIELDS)
+
+    @classmethod
+    def from_row(cls, row: dict[str, Any]) -> "CompiledShift":
+        """Compile 1 dòng work_shifts (dict như get_work_shifts_by_ids)."""
+
+        sec = time_to_seconds
+        time_in = sec(row.get("time_in"))
+        time_out = sec(row.get("time_out"))
+        overnight = time_in is not None and time_out is not None and time_out < time_in
+        if not overnight:
+            win_in = sec(row.get("in_window_start"))
+            win_out = sec(row.get("out_window_end"))
+            overnight = win_in is not None and win_out is not None and win_out < win_in
+
+        shift_id = row.get("id")
+        try:
+            shift_id = int(shift_id) if shift_id is not None else None
+        except Exception:
+            shift_id = None
+
+        try:
+            total_minutes = int(row["total_minutes"]) if row.get("total_minutes") else None
+        except (TypeError, ValueError):
+            total_minutes = None
+        try:
+            work_count = (
+                float(row["work_count"]) if row.get("work_count") is not None else None
+            )
+        except (TypeError, ValueError):
+            work_count = None
+        try:
+            ot_round = max(0, int(row.get("overtime_round_minutes") or 0))
+        except (TypeError, ValueError):
+            ot_round = 0
+
+        return cls(
+            shift_id=shift_id,
+            shift_code=str(row.get("shift_code") or ""),
+            # `or`: khung 00:00 (timedelta(0)) cũng coi như không khai báo, như trước đây
+            in_start=sec(row.get("in_window_start") or row.get("time_in")),
+            in_end=sec(row.get("in_window_end") or row.get("time_in")),
+            out_start=sec(row.get("out_window_start") or row.get("time_out")),
+            out_end=sec(row.get("out_window_end") or row.get("time_out")),
+            time_in=time_in,
+            time_out=time_out,
+            lunch_start=sec(row.get("lunch_start")),
+            lunch_end=sec(row.get("lunch_end")),
+            overnight=bool(overnight),
+            total_minutes=total_minutes,
+            work_count=work_count,
+            overtime_round_minutes=ot_round,
+        )
+
+
+class CompiledShiftCache:
+    """Cache CompiledShift theo id, dùng chung mọi instance / mọi thread.
+
+    Hợp lệ theo phiên bản bảng work_shifts (repo.get_work_shifts_version()); sửa ca trong
+    phần mềm (DeclareWorkShiftService) thì invalidate() ngay.
+    """
+
+    _lock = threading.Lock()
+    _version: object | None = None
+    # None: id không còn trong work_shifts (lịch trỏ tới ca đã xóa), không đọc lại
+    _shifts: dict[int, CompiledShift | None] = {}
+
+    @classmethod
+    def invalidate(cls) -> None:
+        with cls._lock:
+            cls._version = None
+            cls._shifts = {}
+
+    @classmethod
+    def get_shifts(cls, repo, shift_ids: Iterable[int]) -> dict[int, CompiledShift]:
+        """Ca đã compile theo id; repo cần get_work_shifts_version + get_work_shifts_by_ids."""
+
+        ids: list[int] = []
+        for v in shift_ids or []:
+            try:
+                ids.append(int(v))
+            except Exception:
+                continue
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+
+        try:
+            version = repo.get_work_shifts_version()
+        except Exception:
+            logger.warning("Không đọc được phiên bản work_shifts, bỏ qua cache ca")
+            version = None
+
+        with cls._lock:
+            if version is None or version != cls._version:
+                cls._shifts = {}
+                cls._version = version
+            shifts = cls._shifts
+            missing = [i for i in ids if i not in shifts]
+
+        if missing:
+            rows = repo.get_work_shifts_by_ids(missing) or {}
+            compiled: dict[int, CompiledShift | None] = dict.fromkeys(missing)
+            for sid, row in rows.items():
+                compiled[int(sid)] = CompiledShift.from_row(row)
+            with cls._lock:
+                # Phiên bản đổi trong lúc đọc: chỉ dùng cho lượt này, không lưu cache
+                if version is not None and cls._version == version:
+                    cls._shifts.update(compiled)
+            shifts = {**shifts, **compiled}
+
+        out: dict[int, CompiledShift] = {}
+        for i in ids:
+            sh = shifts.get(i)
+            if sh is not None:
+                out[i] = sh
+        return out
+
+
+class ShiftMatchingEngine:
+    """Ghép giờ theo ca; 1 instance cho 1 lượt tính (kết quả khớp ca nhớ theo bộ ca)."""
+
+    def __init__(self) -> None:
+        self._sec_cache: dict[object, int | None] = {}
+        # bộ ca (tuple CompiledShift, giữ tham chiếu nên không bị trùng id sau khi giải phóng)
+        # -> ({giây: ca khớp khung vào}, {giây: ca khớp khung ra})
+        self._match_memo: dict[
+            tuple[CompiledShift, ...],
+            tuple[dict[int, CompiledShift | None], dict[int, CompiledShift | None]],
+        ] = {}
+
+    def seconds(self, value: object | None) -> int | None:
+        if value is None:
+            return None
+        try:
+            return self._sec_cache[value]
+        except KeyError:
+            sec = time_to_seconds(value)
+            self._sec_cache[value] = sec
+            return sec
+        except TypeError:
+            return time_to_seconds(value)
+
+    def sorted_punches(self, row: dict[str, Any]) -> tuple[list[int], list[object]]:
+        """(số giây, giá trị gốc) các giờ chấm của dòng, sắp theo (giây, thứ tự cột)."""
+
+        items: list[tuple[int, int, object]] = []
+        for idx, k in enumerate(PAIR_KEYS):
+            v = row.get(k)
+            s = self.seconds(v)
+            if s is None:
+                continue
+            items.append((s, idx, v))
+        items.sort(key=lambda t: (t[0], t[1]))
+        return [t[0] for t in items], [t[2] for t in items]
+
+    @staticmethod
+    def _remove(secs: list[int], vals: list[object], target: object, target_sec: int) -> None:
+        """Như list.remove(target); không có thì bỏ phần tử đầu tiên cùng số giây."""
+
+        for i, v in enumerate(vals):
+            if v is target or v == target:
+                del secs[i]
+                del vals[i]
+                return
+        for i, s in enumerate(secs):
+            if s == target_sec:
+                del secs[i]
+                del vals[i]
+                return
+
+    @staticmethod
+    def _pick_out_relaxed(secs: list[int], w: CompiledShift) -> int | None:
+        """Vị trí giờ ra để HIỂN THỊ (cho phép ngoài out_window_end => tăng ca).
+
+        - Ca ngày: lần chấm MUỘN NHẤT từ out_window_start trở đi.
+        - Ca đêm: chỉ lấy giờ buổi sáng (mặc định tới 15:00) để không ăn nhầm punch buổi tối.
+        """
+
+        start = w.out_start
+        if w.overnight:
+            upper = NIGHT_OUT_UPPER_SEC
+            if w.out_end is not None:
+                upper = max(upper, w.out_end)
+            if start is None:
+                start = 0
+        else:
+            upper = None
+
+        best: int | None = None
+        for i, s in enumerate(secs):
+            if start is not None and s < start:
+                continue
+            if upper is not None and s > upper:
+                continue
+            if best is None or s > secs[best]:
+                best = i
+        return best
+
+    def apply_auto(self, row: dict[str, Any], shifts: Sequence[CompiledShift]) -> None:
+        """Auto mode dựa trên danh sách ca (work_shifts) theo thứ tự."""
+
+        secs, vals = self.sorted_punches(row)
+        for k in PAIR_KEYS:
+            row[k] = None
+
+        used_any = False
+        used_night = False
+        pair_idx = 0
+        for w in shifts:
+            if pair_idx >= 3:
+                break
+
+            # Strict match để XÁC ĐỊNH ca: vào = sớm nhất, ra = muộn nhất trong khung
+            in_i: int | None = None
+            if w.in_start is not None or w.in_end is not None:
+                for i, s in enumerate(secs):
+                    if sec_in_range(s, w.in_start, w.in_end):
+                        in_i = i
+                        break
+
+            out_i: int | None = None
+            if w.out_start is not None or w.out_end is not None:
+                for i in range(len(secs) - 1, -1, -1):
+                    if sec_in_range(secs[i], w.out_start, w.out_end):
+                        out_i = i
+                        break
+
+            # Nếu không match được gì trong window thì KHÔNG coi là ca này
+            if in_i is None and out_i is None:
+                continue
+
+            in_val = None
+            if in_i is not None:
+                in_val = vals[in_i]
+            out_val = None
+            out_sec = 0
+            if out_i is not None:
+                out_val, out_sec = vals[out_i], secs[out_i]
+            if in_i is not None:
+                self._remove(secs, vals, in_val, secs[in_i])
+
+            # Out hiển thị: ưu tiên out strict, nếu không có thì lấy overtime (relaxed)
+            if out_i is None:
+                relaxed = self._pick_out_relaxed(secs, w)
+                if relaxed is not None:
+                    out_val, out_sec = vals[relaxed], secs[relaxed]
+            if out_val is not None:
+                self._remove(secs, vals, out_val, out_sec)
+
+            row[f"in_{pair_idx + 1}"] = in_val
+            row[f"out_{pair_idx + 1}"] = out_val
+
+            if in_val is not None or out_val is not None:
+                used_any = True
+                if w.overnight:
+                    used_night = True
+
+            pair_idx += 1
+
+        if used_any:
+            row["shift_code"] = SHIFT_CODE_NIGHT if used_night else SHIFT_CODE_DAY
+
+    def _match_memo_for(
+        self, shifts: Sequence[CompiledShift]
+    ) -> tuple[dict[int, CompiledShift | None], dict[int, CompiledShift | None]]:
+        key = shifts if isinstance(shifts, tuple) else tuple(shifts)
+        memo = self._match_memo.get(key)
+        if memo is None:
+            memo = ({}, {})
+            self._match_memo[key] = memo
+        return memo
+
+    def match_shift(
+        self, s: int, shifts: Sequence[CompiledShift], *, for_in: bool
+    ) -> CompiledShift | None:
+        """Như _match_shift, nhớ kết quả theo (bộ ca, số giây)."""
+
+        in_memo, out_memo = self._match_memo_for(shifts)
+        memo = in_memo if for_in else out_memo
+        if s in memo:
+            return memo[s]
+        sh = memo[s] = self._match_shift(s, shifts, for_in=for_in)
+        return sh
+
+    @staticmethod
+    def _match_shift(
+        s: int, shifts: Sequence[CompiledShift], *, for_in: bool
+    ) -> CompiledShift | None:
+        """Ca có khung vào (hoặc ra) chứa s và gần giờ vào (ra) chuẩn nhất."""
+
+        best: CompiledShift | None = None
+        best_score: int | None = None
+        for w in shifts:
+            if for_in:
+                start, end, base = w.in_start, w.in_end, w.time_in
+            else:
+                start, end, base = w.out_start, w.out_end, w.time_out
+            # Không cho match nếu window/time không có (tránh match nhầm mọi punch)
+            if start is None and end is None:
+                continue
+            if not sec_in_range(s, start, end):
+                continue
+            score = 0 if base is None else abs(s - base)
+            if best_score is None or score < best_score:
+                best = w
+                best_score = score
+        return best
+
+    def apply_first_last(self, row: dict[str, Any], shifts: Sequence[CompiledShift]) -> None:
+        secs, vals = self.sorted_punches(row)
+        for k in PAIR_KEYS:
+            row[k] = None
+        if not secs:
+            return
+
+        in_memo, out_memo = self._match_memo_for(shifts)
+
+        # IN: lần chấm sớm nhất khớp khung vào của 1 ca bất kỳ
+        in_val = None
+        in_shift: CompiledShift | None = None
+        for i, s in enumerate(secs):
+            if s in in_memo:
+                sh = in_memo[s]
+            else:
+                sh = in_memo[s] = self._match_shift(s, shifts, for_in=True)
+            if sh is not None:
+                in_val, in_shift = vals[i], sh
+                self._remove(secs, vals, in_val, s)
+                break
+
+        # OUT strict: lần chấm muộn nhất khớp khung ra của 1 ca bất kỳ
+        out_val = None
+        out_sec = 0
+        out_shift: CompiledShift | None = None
+        for i in sorted(range(len(secs)), key=lambda j: -secs[j]):
+            s = secs[i]
+            if s in out_memo:
+                sh = out_memo[s]
+            else:
+                sh = out_memo[s] = self._match_shift(s, shifts, for_in=False)
+            if sh is not None:
+                out_val, out_sec, out_shift = vals[i], s, sh
+                break
+
+        if out_val is None and in_shift is not None:
+            # Relax overtime display theo ca đã match IN
+            relaxed = self._pick_out_relaxed(secs, in_shift)
+            if relaxed is not None:
+                out_val, out_sec = vals[relaxed], secs[relaxed]
+        if out_val is not None:
+            self._remove(secs, vals, out_val, out_sec)
+
+        row["in_1"] = in_val
+        row["out_1"] = out_val
+
+        # Chỉ set ca khi có match trong window
+        base = in_shift or out_shift
+        if shifts and base is not None:
+            row["shift_code"] = SHIFT_CODE_NIGHT if base.overnight else SHIFT_CODE_DAY
+
+    def shift_label(
+        self, row: dict[str, Any], shifts: Sequence[CompiledShift]
+    ) -> str | None:
+        """Ca (HC/Đêm) theo giờ chấm giữ nguyên (device mode)."""
+
+        secs, _vals = self.sorted_punches(row)
+        if not secs or not shifts:
+            return None
+
+        used_any = False
+        used_night = False
+        for w in shifts:
+            hit = False
+            if w.in_start is not None or w.in_end is not None:
+                hit = any(sec_in_range(s, w.in_start, w.in_end) for s in secs)
+            if not hit and (w.out_start is not None or w.out_end is not None):
+                hit = any(sec_in_range(s, w.out_start, w.out_end) for s in secs)
+            if not hit:
+                continue
+            used_any = True
+            if w.overnight:
+                used_night = True
+
+        if not used_any:
+            return None
+        return SHIFT_CODE_NIGHT if used_night else SHIFT_CODE_DAY
+
+    def apply_auto_plain(self, row: dict[str, Any]) -> None:
+        """Auto không có ca: sắp giờ tăng dần rồi ghép lần lượt."""
+
+        _secs, vals = self.sorted_punches(row)
+        for i, k in enumerate(PAIR_KEYS):
+            row[k] = vals[i] if i < len(vals) else None
+
+    def apply_first_last_plain(self, row: dict[str, Any]) -> None:
+        """First_last không có ca: giờ đầu tiên là vào, giờ cuối cùng là ra."""
+
+        _secs, vals = self.sorted_punches(row)
+        for k in PAIR_KEYS:
+            row[k] = None
+        if not vals:
+            return
+        row["in_1"] = vals[0]
+        if len(vals) >= 2:
+            row["out_1"] = vals[-1]
+
+    def arrange(
+        self,
+        rows: Sequence[dict[str, Any]],
+        modes: Sequence[str],
+        shifts_by_row: Sequence[Sequence[CompiledShift]],
+    ) -> None:
+        """Ghép giờ cho cả tập dòng (mode + bộ ca đã compile của từng dòng).
+
+        Dòng cùng lịch + cùng thứ nên dùng chung 1 tuple bộ ca để dùng lại kết quả khớp ca.
+        """
+
+        for r, mode, shifts in zip(rows, modes, shifts_by_row):
+            if mode == "auto":
+                if shifts:
+                    # Không dùng lại giá trị DB cũ vì có thể đã bị lưu sai.
+                    r["shift_code"] = None
+                    self.apply_auto(r, shifts)
+                else:
+                    self.apply_auto_plain(r)
+            elif mode == "first_last":
+                if shifts:
+                    r["shift_code"] = None
+                    self.apply_first_last(r, shifts)
+                else:
+                    self.apply_first_last_plain(r)
+            elif shifts:
+                # device: giữ nguyên giờ nhưng vẫn tính Ca (HC/Đêm) theo work_shifts nếu có
+                r["shift_code"] = self.shift_label(r, shifts)
@@ -0,0 +1,269 @@
+"""services.timesheet_services
+
+Tính công cho cả tập dòng attendance_audit đã ghép giờ (MainContent2):
+late, early, hours, work, hours_plus, work_plus, tc1..tc3.
+
+Đầu vào mỗi dòng: các cặp giờ vào/ra đã ghép (in_k/out_k, sau xử lý ca Đêm qua ngày) +
+bộ ca của lịch theo thứ/ngày lễ (CompiledShift, services.shift_matching_services).
+
+Quy tắc (mọi mốc giờ là số giây, ca Đêm dời giờ ra sang ngày hôm sau):
+- Ca của cặp k: ca có khung vào chứa giờ vào (không có thì khung ra chứa giờ ra), không khớp
+  thì ca thứ k của bộ ca.
+- late / early: số phút vào sau time_in / ra trước time_out (chuỗi, cộng các cặp; 0 = NULL).
+- hours: giờ làm trong khoảng time_in..time_out trừ giờ nghỉ trưa (lunch_start..lunch_end).
+- work: work_count x tỉ lệ giờ làm / giờ chuẩn của ca (total_minutes, không khai báo thì
+  time_in..time_out trừ nghỉ trưa), tối đa work_count.
+- hours_plus / work_plus: giờ làm sau time_out, làm tròn xuống bội số overtime_round_minutes;
+  công tăng ca quy đổi như work.
+- tc1..tc3: ký hiệu chấm công (attendance_symbols) của cặp 1..3: thiếu giờ vào (C06), thiếu
+  giờ ra (C05), đi trễ (C01), về sớm (C02), đúng giờ (C03, ca qua đêm C08); ngày có chấm công
+  nhưng không xếp ca: C09 (ngày lễ C10).
+- Dòng đã chỉnh bằng "Import dữ liệu chấm công" (import_locked = 1) giữ nguyên giá trị.
+
+Đầu vào tính công (context(), shift_signature()) nằm trong fingerprint kết quả ghép đã lưu
+(attendance_audit.arranged_fingerprint): công chỉ tính lại + lưu cho dòng có fingerprint đổi.
+"""
+
+from __future__ import annotations
+
+import logging
+from decimal import Decimal
+from typing import Any, Sequence
+
+from services.shift_matching_services import CompiledShift, ShiftMatchingEngine
+
+
+logger = logging.getLogger(__name__)
+
+# Cột công do TimesheetEngine tính (thứ tự lưu của update_timesheet)
+TIMESHEET_COLUMNS = (
+    "late", "early", "hours", "work", "hours_plus", "work_plus", "tc1", "tc2", "tc3",
+)
+
+_DAY_SEC = 86400
+_HALF_DAY_SEC = 43200
+
+
+def _overlap(a_start: int, a_end: int, b_start: int, b_end: int) -> int:
+    return max(0, min(a_end, b_end) - max(a_start, b_start))
+
+
+def _round2(value: float) -> Decimal:
+    return Decimal(str(round(value, 2))).quantize(Decimal("0.01"))
+
+
+class TimesheetEngine:
+    """Tính công; 1 instance cho 1 lượt tính (dùng chung số giây / kết quả khớp ca)."""
+
+    # Tăng khi đổi quy tắc tính công để công đã lưu được tính lại
+    VERSION = 1
+
+    def __init__(
+        self,
+        symbols: dict[str, str] | None = None,
+        engine: ShiftMatchingEngine | None = None,
+    ) -> None:
+        # code (C01..C10) -> ký hiệu hiển thị (chỉ ký hiệu đang bật)
+        self._symbols = symbols or {}
+        self._engine = engine or ShiftMatchingEngine()
+
+    @staticmethod
+    def symbols_from_rows(rows_by_code: dict[str, dict]) -> dict[str, str]:
+        """AttendanceSymbolService.list_rows_by_code() -> {code: symbol} (ký hiệu đang bật)."""
+
+        out: dict[str, str] = {}
+        for code, r in (rows_by_code or {}).items():
+            symbol = str(r.get("symbol") or "").strip()
+            if symbol and int(r.get("is_visible") or 0):
+                out[str(code)] = symbol
+        return out
+
+    def context(self) -> tuple[Any, ...]:
+        """Đầu vào tính công chung cho mọi dòng (phiên bản + ký hiệu), dùng cho fingerprint."""
+
+        return (self.VERSION, tuple(sorted(self._symbols.items())))
+
+    @staticmethod
+    def shift_signature(sh: CompiledShift) -> tuple[Any, ...]:
+        """Trường ca chỉ dùng khi tính công (ngoài CompiledShift.signature())."""
+
+        return (sh.total_minutes, sh.work_count, sh.overtime_round_minutes)
+
+    def _symbol(self, *codes: str) -> str | None:
+        parts = [self._symbols[c] for c in codes if c in self._symbols]
+        return " ".join(parts) if parts else None
+
+    def _pick_shift(
+        self,
+        idx: int,
+        in_sec: int | None,
+        out_sec: int | None,
+        shifts: Sequence[CompiledShift],
+    ) -> CompiledShift | None:
+        sh = None
+        if in_sec is not None:
+            sh = self._engine.match_shift(in_sec, shifts, for_in=True)
+        if sh is None and out_sec is not None:
+            sh = self._engine.match_shift(out_sec, shifts, for_in=False)
+        if sh is None and idx < len(shifts):
+            sh = shifts[idx]
+        return sh
+
+    @staticmethod
+    def _shift_span(sh: CompiledShift) -> tuple[int, int, int, int] | None:
+        """(vào, ra, nghỉ trưa từ, nghỉ trưa đến) của ca, ca Đêm: ra + 1 ngày."""
+
+        if sh.time_in is None or sh.time_out is None:
+            return None
+        t_in, t_out = sh.time_in, sh.time_out
+        if t_out <= t_in:
+            t_out += _DAY_SEC
+
+        l_start, l_end = sh.lunch_start, sh.lunch_end
+        if l_start is None or l_end is None:
+            return t_in, t_out, 0, 0
+        if l_start < t_in:
+            l_start += _DAY_SEC
+        if l_end < l_start:
+            l_end += _DAY_SEC
+        return t_in, t_out, l_start, l_end
+
+    def compute(
+        self, row: dict[str, Any], shifts: Sequence[CompiledShift]
+    ) -> dict[str, Any]:
+        """Giá trị công của 1 dòng (đủ key TIMESHEET_COLUMNS, None = để trống)."""
+
+        out: dict[str, Any] = dict.fromkeys(TIMESHEET_COLUMNS)
+        sec = self._engine.seconds
+        pairs: list[tuple[int | None, int | None]] = []
+        for k in (1, 2, 3):
+            s_in, s_out = sec(row.get(f"in_{k}")), sec(row.get(f"out_{k}"))
+            if s_in is not None or s_out is not None:
+                pairs.append((s_in, s_out))
+        if not pairs:
+            return out
+
+        if not shifts:
+            code = "C10" if row.get("day_key") == "holiday" else "C09"
+            out["tc1"] = self._symbol(code)
+            return out
+
+        late_sec = early_sec = 0
+        regular_sec = ot_sec = 0
+        work = work_plus = 0.0
+        complete = False
+        has_work_count = False
+        tcs: list[str | None] = []
+
+        for idx, (s_in, s_out) in enumerate(pairs):
+            sh = self._pick_shift(idx, s_in, s_out, shifts)
+            span = self._shift_span(sh) if sh is not None else None
+            if span is None:
+                tcs.append(None)
+                continue
+            t_in, t_out, l_start, l_end = span
+
+            if sh.overnight:
+                # Chấm sau nửa đêm của ca Đêm: thuộc ngày hôm sau
+                if s_in is not None and s_in < t_in - _HALF_DAY_SEC:
+                    s_in += _DAY_SEC
+                if s_out is not None and s_out < t_in - _HALF_DAY_SEC:
+                    s_out += _DAY_SEC
+            if s_in is not None and s_out is not None and s_out < s_in:
+                # Ca ngày mà giờ ra trước giờ vào: dữ liệu lỗi, coi như thiếu giờ ra
+                s_out = None
+
+            codes: list[str] = []
+            if s_in is None:
+                codes.append("C06")
+            elif s_in > t_in:
+                late_sec += s_in - t_in
+                codes.append("C01")
+            if s_out is None:
+                codes.append("C05")
+            elif s_out < t_out:
+                early_sec += t_out - s_out
+                codes.append("C02")
+
+            if s_in is not None and s_out is not None:
+                complete = True
+                worked = _overlap(s_in, s_out, t_in, t_out)
+                worked -= _overlap(
+                    max(s_in, t_in), min(s_out, t_out), l_start, l_end
+                )
+                worked = max(0, worked)
+                extra = max(0, s_out - max(s_in, t_out))
+                round_sec = int(sh.overtime_round_minutes or 0) * 60
+                if round_sec > 0:
+                    extra -= extra % round_sec
+                regular_sec += worked
+                ot_sec += extra
+
+                standard = (
+                    int(sh.total_minutes) * 60
+                    if sh.total_minutes
+                    else (t_out - t_in) - _overlap(t_in, t_out, l_start, l_end)
+                )
+                if sh.work_count is not None and standard > 0:
+                    has_work_count = True
+                    work += sh.work_count * min(1.0, worked / standard)
+                    work_plus += sh.work_count * extra / standard
+
+            if not codes:
+                codes.append("C08" if sh.overnight else "C03")
+            tcs.append(self._symbol(*codes))
+
+        if late_sec // 60:
+            out["late"] = str(late_sec // 60)
+        if early_sec // 60:
+            out["early"] = str(early_sec // 60)
+        if complete:
+            out["hours"] = _round2(regular_sec / 3600)
+            if has_work_count:
+                out["work"] = _round2(work)
+        if ot_sec:
+            out["hours_plus"] = _round2(ot_sec / 3600)
+            if has_work_count and work_plus:
+                out["work_plus"] = _round2(work_plus)
+        for k, tc in enumerate(tcs[:3], start=1):
+            out[f"tc{k}"] = tc
+        return out
+
+    @staticmethod
+    def _same(a: object, b: object) -> bool:
+        if a is None or b is None:
+            return a is None and b is None
+        if isinstance(a, Decimal) or isinstance(b, Decimal):
+            try:
+                return Decimal(str(a)) == Decimal(str(b))
+            except Exception:
+                return False
+        return str(a).strip() == str(b).strip()
+
+    def apply(
+        self,
+        rows: Sequence[dict[str, Any]],
+        shifts_by_row: Sequence[Sequence[CompiledShift]],
+    ) -> list[tuple[Any, ...]]:
+        """Tính công cho cả tập dòng (ghi vào row), return các dòng có giá trị đổi để lưu.
+
+        Item lưu: (audit_id, *TIMESHEET_COLUMNS). Dòng import_locked giữ nguyên, không lưu.
+        """
+
+        changed: list[tuple[Any, ...]] = []
+        for r, shifts in zip(rows, shifts_by_row):
+            if int(r.get("import_locked") or 0):
+                continue
+            values = self.compute(r, shifts)
+            is_changed = any(not self._same(r.get(c), values[c]) for c in TIMESHEET_COLUMNS)
+            r.update(values)
+            if r.get("work") is None and r.get("work_plus") is None:
+                r["total"] = None
+            else:
+                r["total"] = (r.get("work") or Decimal(0)) + (r.get("work_plus") or Decimal(0))
+            if is_changed and r.get("id") is not None:
+                try:
+                    changed.append((int(r["id"]), *(values[c] for c in TIMESHEET_COLUMNS)))
+                except Exception:
+                    continue
+        return changed
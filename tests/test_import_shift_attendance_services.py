@@ -0,0 +1,114 @@
+"""Kiểm tra lượt chấm ghi vào attendance_punches khi import dữ liệu chấm công."""
+
+from __future__ import annotations
+
+import contextlib
+import unittest
+from datetime import datetime, time
+from unittest import mock
+
+from core.database import Database
+from services.attendance_punch_services import AttendancePunchService
+from services.import_shift_attendance_services import ImportShiftAttendanceService
+
+
+class _FakeImportRepo:
+    def __init__(self, existing: dict | None = None) -> None:
+        self.existing = existing or {}
+        self.upserted: list[dict] = []
+
+    def get_existing_by_employee_code_date(self, pairs):
+        return self.existing
+
+    def get_employees_by_codes(self, codes):
+        return {"nv01": {"id": 7, "mcc_code": "101", "full_name": "Nguyễn Văn A"}}
+
+    def upsert_import_rows(self, payloads):
+        self.upserted.extend(payloads)
+
+
+class _FakePunchRepo:
+    def __init__(self) -> None:
+        self.rows: list[dict] = []
+
+    def insert_punches(self, rows):
+        self.rows.extend(rows)
+        return len(rows)
+
+
+class ImportPunchRowsTest(unittest.TestCase):
+    def _run(self, repo: _FakeImportRepo) -> list[dict]:
+        svc = ImportShiftAttendanceService(repo)
+        svc._punch_repo = _FakePunchRepo()
+        with mock.patch.object(
+            Database, "transaction", lambda: contextlib.nullcontext()
+        ):
+            result = svc.import_shift_attendance_rows(
+                [
+                    {
+                        "employee_code": "NV01",
+                        "work_date": "2026-03-02",
+                        "in_1": time(8, 0),
+                        "out_1": time(17, 5),
+                    }
+                ]
+            )
+        self.assertTrue(result.ok, result.message)
+        return svc._punch_repo.rows
+
+    def test_new_row_keeps_merged_device_no(self) -> None:
+        rows = self._run(_FakeImportRepo())
+
+        self.assertEqual(
+            rows,
+            [
+                {
+                    "attendance_code": "101",
+                    "punched_at": datetime(2026, 3, 2, 8, 0),
+                    "device_no": AttendancePunchService.MERGED_DEVICE_NO,
+                    "device_id": None,
+                },
+                {
+                    "attendance_code": "101",
+                    "punched_at": datetime(2026, 3, 2, 17, 5),
+                    "device_no": AttendancePunchService.MERGED_DEVICE_NO,
+                    "device_id": None,
+                },
+            ],
+        )
+
+    def test_payload_device_no_zero_is_not_device_one(self) -> None:
+        rows = ImportShiftAttendanceService._punch_rows_from_payloads(
+            [
+                {
+                    "attendance_code": "101",
+                    "work_date": "2026-03-02",
+                    "device_no": 0,
+                    "in_1": "22:00:00",
+                    "out_1": "06:00:00",
+                }
+            ]
+        )
+
+        self.assertEqual([r["device_no"] for r in rows], [0, 0])
+        # Giờ ra nhỏ hơn giờ vào: sang ngày hôm sau
+        self.assertEqual(rows[1]["punched_at"], datetime(2026, 3, 3, 6, 0))
+
+    def test_existing_device_row_keeps_its_device_no(self) -> None:
+        repo = _FakeImportRepo(
+            {
+                ("NV01", "2026-03-02"): {
+                    "attendance_code": "101",
+                    "device_no": 3,
+                    "device_id": 5,
+                    "import_locked": 0,
+                }
+            }
+        )
+        rows = self._run(repo)
+
+        self.assertEqual({(r["device_no"], r["device_id"]) for r in rows}, {(3, 5)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Kiểm tra ShiftMatchingEngine dùng lại qua nhiều bộ ca (không cần MySQL)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import unittest
+
+from services.shift_matching_services import CompiledShift, ShiftMatchingEngine
+
+
+def _shift(shift_id: int, code: str, time_in: int, time_out: int) -> CompiledShift:
+    return CompiledShift.from_row(
+        {
+            "id": shift_id,
+            "shift_code": code,
+            "time_in": dt.timedelta(hours=time_in),
+            "time_out": dt.timedelta(hours=time_out),
+            "in_window_start": dt.timedelta(hours=time_in - 2),
+            "in_window_end": dt.timedelta(hours=time_in + 2),
+            "out_window_start": dt.timedelta(hours=time_out - 2),
+            "out_window_end": dt.timedelta(hours=time_out + 2),
+        }
+    )
+
+
+class MatchMemoTest(unittest.TestCase):
+    def test_engine_reused_across_freed_shift_sets(self) -> None:
+        # Bộ ca tạm bị giải phóng sau mỗi vòng: id() có thể bị dùng lại cho bộ ca sau,
+        # kết quả khớp ca không được lẫn giữa các bộ
+        engine = ShiftMatchingEngine()
+        eight = 8 * 3600
+        for i in range(50):
+            code = f"S{i}"
+            shifts = (_shift(i, code, 8, 17),)
+            matched = engine.match_shift(eight, shifts, for_in=True)
+            self.assertIsNotNone(matched)
+            self.assertEqual(matched.shift_code, code)
+            del shifts, matched
+
+    def test_list_and_tuple_share_memo(self) -> None:
+        engine = ShiftMatchingEngine()
+        day = _shift(1, "HC", 8, 17)
+
+        self.assertIs(engine.match_shift(8 * 3600, [day], for_in=True), day)
+        self.assertIs(engine.match_shift(8 * 3600, (day,), for_in=True), day)
+        self.assertIsNone(engine.match_shift(3 * 3600, (day,), for_in=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
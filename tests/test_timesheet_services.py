@@ -0,0 +1,210 @@
+"""Kiểm tra TimesheetEngine.compute / apply (không cần MySQL)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import unittest
+from decimal import Decimal
+
+from services.shift_matching_services import CompiledShift
+from services.timesheet_services import TIMESHEET_COLUMNS, TimesheetEngine
+
+
+SYMBOLS = {
+    "C01": "T",
+    "C02": "S",
+    "C03": "X",
+    "C05": "KR",
+    "C06": "KV",
+    "C08": "Đ",
+    "C09": "KC",
+    "C10": "L",
+}
+
+
+def _t(hours: int, minutes: int = 0) -> dt.timedelta:
+    return dt.timedelta(hours=hours, minutes=minutes)
+
+
+DAY_SHIFT = CompiledShift.from_row(
+    {
+        "id": 1,
+        "shift_code": "HC",
+        "time_in": _t(8),
+        "time_out": _t(17),
+        "in_window_start": _t(6),
+        "in_window_end": _t(10),
+        "out_window_start": _t(15),
+        "out_window_end": _t(21),
+        "lunch_start": _t(12),
+        "lunch_end": _t(13),
+        "total_minutes": 480,
+        "work_count": 1,
+        "overtime_round_minutes": 30,
+    }
+)
+
+NIGHT_SHIFT = CompiledShift.from_row(
+    {
+        "id": 2,
+        "shift_code": "Đêm",
+        "time_in": _t(22),
+        "time_out": _t(6),
+        "in_window_start": _t(20),
+        "in_window_end": _t(23, 59),
+        "out_window_start": _t(5),
+        "out_window_end": _t(9),
+        "lunch_start": _t(2),
+        "lunch_end": _t(2, 30),
+        "total_minutes": 450,
+        "work_count": 1,
+        "overtime_round_minutes": 15,
+    }
+)
+
+
+def _row(*punches: dt.timedelta | None, **extra) -> dict:
+    row = dict.fromkeys(("in_1", "out_1", "in_2", "out_2", "in_3", "out_3"))
+    for key, value in zip(("in_1", "out_1", "in_2", "out_2", "in_3", "out_3"), punches):
+        row[key] = value
+    row.update(extra)
+    return row
+
+
+class TimesheetComputeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = TimesheetEngine(SYMBOLS)
+
+    def test_on_time_day_shift(self) -> None:
+        out = self.engine.compute(_row(_t(7, 55), _t(17)), [DAY_SHIFT])
+
+        self.assertIsNone(out["late"])
+        self.assertIsNone(out["early"])
+        self.assertEqual(out["hours"], Decimal("8.00"))
+        self.assertEqual(out["work"], Decimal("1.00"))
+        self.assertIsNone(out["hours_plus"])
+        self.assertEqual(out["tc1"], "X")
+
+    def test_late_and_early(self) -> None:
+        out = self.engine.compute(_row(_t(8, 10), _t(16, 50)), [DAY_SHIFT])
+
+        self.assertEqual(out["late"], "10")
+        self.assertEqual(out["early"], "10")
+        # 08:10..16:50 trừ 1 giờ nghỉ trưa = 7 giờ 40 phút
+        self.assertEqual(out["hours"], Decimal("7.67"))
+        self.assertEqual(out["work"], Decimal("0.96"))
+        self.assertEqual(out["tc1"], "T S")
+
+    def test_lunch_overlap_is_not_worked(self) -> None:
+        # Vào giữa giờ nghỉ trưa: chỉ trừ phần nghỉ trưa nằm trong giờ làm (12:30..13:00)
+        out = self.engine.compute(_row(_t(12, 30), _t(17)), [DAY_SHIFT])
+
+        self.assertEqual(out["late"], "270")
+        self.assertEqual(out["hours"], Decimal("4.00"))
+        self.assertEqual(out["work"], Decimal("0.50"))
+
+    def test_overtime_rounded_down(self) -> None:
+        # Ra 18:50: tăng ca 1 giờ 50 phút, làm tròn xuống bội số 30 phút = 1.5 giờ
+        out = self.engine.compute(_row(_t(8), _t(18, 50)), [DAY_SHIFT])
+
+        self.assertEqual(out["hours"], Decimal("8.00"))
+        self.assertEqual(out["work"], Decimal("1.00"))
+        self.assertEqual(out["hours_plus"], Decimal("1.50"))
+        self.assertEqual(out["work_plus"], Decimal("0.19"))
+
+    def test_overtime_below_round_step_is_dropped(self) -> None:
+        out = self.engine.compute(_row(_t(8), _t(17, 20)), [DAY_SHIFT])
+
+        self.assertIsNone(out["hours_plus"])
+        self.assertIsNone(out["work_plus"])
+
+    def test_overnight_shift(self) -> None:
+        # Giờ ra 06:20 thuộc ngày hôm sau; nghỉ 02:00..02:30 trừ vào giờ làm
+        out = self.engine.compute(_row(_t(21, 55), _t(6, 20)), [NIGHT_SHIFT])
+
+        self.assertIsNone(out["late"])
+        self.assertIsNone(out["early"])
+        self.assertEqual(out["hours"], Decimal("7.50"))
+        self.assertEqual(out["work"], Decimal("1.00"))
+        # 20 phút sau 06:00, làm tròn xuống bội số 15 phút
+        self.assertEqual(out["hours_plus"], Decimal("0.25"))
+        self.assertEqual(out["tc1"], "Đ")
+
+    def test_overnight_shift_left_early(self) -> None:
+        out = self.engine.compute(_row(_t(22), _t(5, 30)), [NIGHT_SHIFT])
+
+        self.assertEqual(out["early"], "30")
+        self.assertEqual(out["hours"], Decimal("7.00"))
+        self.assertEqual(out["tc1"], "S")
+
+    def test_missing_out_c05(self) -> None:
+        out = self.engine.compute(_row(_t(8)), [DAY_SHIFT])
+
+        self.assertEqual(out["tc1"], "KR")
+        self.assertIsNone(out["hours"])
+        self.assertIsNone(out["work"])
+
+    def test_missing_in_c06(self) -> None:
+        out = self.engine.compute(_row(None, _t(17)), [DAY_SHIFT])
+
+        self.assertEqual(out["tc1"], "KV")
+        self.assertIsNone(out["late"])
+        self.assertIsNone(out["hours"])
+
+    def test_punches_without_shift_c09(self) -> None:
+        out = self.engine.compute(_row(_t(8), _t(17), day_key="mon"), [])
+
+        self.assertEqual(out["tc1"], "KC")
+        self.assertIsNone(out["hours"])
+
+    def test_punches_on_holiday_without_shift_c10(self) -> None:
+        out = self.engine.compute(_row(_t(8), _t(17), day_key="holiday"), [])
+
+        self.assertEqual(out["tc1"], "L")
+
+    def test_hidden_symbol_is_blank(self) -> None:
+        symbols = TimesheetEngine.symbols_from_rows(
+            {
+                "C03": {"symbol": "X", "is_visible": 0},
+                "C05": {"symbol": "KR", "is_visible": 1},
+            }
+        )
+        out = TimesheetEngine(symbols).compute(_row(_t(8), _t(17)), [DAY_SHIFT])
+
+        self.assertIsNone(out["tc1"])
+
+    def test_no_punches(self) -> None:
+        out = self.engine.compute(_row(), [DAY_SHIFT])
+
+        self.assertEqual(out, dict.fromkeys(TIMESHEET_COLUMNS))
+
+    def test_two_pairs_use_their_own_shift(self) -> None:
+        out = self.engine.compute(
+            _row(_t(8), _t(17), _t(22, 5), _t(6)), [DAY_SHIFT, NIGHT_SHIFT]
+        )
+
+        self.assertEqual(out["late"], "5")
+        # 8 giờ ca ngày + 7 giờ 25 phút ca Đêm (trừ 30 phút nghỉ)
+        self.assertEqual(out["hours"], Decimal("15.42"))
+        self.assertEqual(out["tc1"], "X")
+        self.assertEqual(out["tc2"], "T")
+
+
+class TimesheetApplyTest(unittest.TestCase):
+    def test_returns_only_changed_rows_and_skips_import_locked(self) -> None:
+        engine = TimesheetEngine(SYMBOLS)
+        unchanged = _row(_t(8), _t(17), id=1)
+        unchanged.update(engine.compute(dict(unchanged), [DAY_SHIFT]))
+        changed = _row(_t(8), _t(17), id=2)
+        locked = _row(_t(8), _t(17), id=3, import_locked=1, hours=Decimal("5.00"))
+
+        items = engine.apply([unchanged, changed, locked], [[DAY_SHIFT]] * 3)
+
+        self.assertEqual([item[0] for item in items], [2])
+        self.assertEqual(len(items[0]), 1 + len(TIMESHEET_COLUMNS))
+        self.assertEqual(changed["total"], Decimal("1.00"))
+        self.assertEqual(locked["hours"], Decimal("5.00"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""tools/bench_download.py
+
+Đo thời gian luồng tải dữ liệu chấm công (DownloadAttendanceService) trên máy
+chấm công giả lập (tools/zk_simulator.py), tách theo giai đoạn:
+- connect : kết nối + lấy user + nhận dạng thiết bị
+- transfer: tải log (get_attendance)
+- group   : lọc + gom lượt chấm theo (mã, ngày)
+- persist : dựng dòng theo lô + ghi CSDL (chỉ khi có --persist; ghi vào CSDL trong
+            database/db_config.json); --bulk ghi qua bảng tạm + câu SQL tập hợp,
+            --no-bulk ghi từng dòng (mặc định: tự chọn theo số dòng)
+--trace-memory in thêm đỉnh RAM (tracemalloc) của bước group, chạy chậm hơn.
+
+Ví dụ:
+  python -m tools.bench_download
+  python -m tools.bench_download --records 10000 100000 1000000 --users 500
+  python -m tools.bench_download --records 100000 --records-per-second 20000 --persist
+  python -m tools.bench_download --records 1000000 --persist --bulk
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+
+from services.download_attendance_services import (
+    DownloadAttendanceService,
+    _DeviceSyncResult,
+)
+from tools.zk_simulator import SimulatedDeviceConfig, SimulatedZKFactory
+
+
+def _bench_device() -> dict:
+    return {
+        "id": 0,
+        "device_no": 0,
+        "device_name": "Máy giả lập",
+        "device_type": "SENSEFACE_A4",
+        "ip_address": "127.0.0.1",
+        "port": 4370,
+        "password": "",
+    }
+
+
+def run_once(
+    config: SimulatedDeviceConfig,
+    persist: bool = False,
+    trace_memory: bool = False,
+    bulk: bool | None = None,
+) -> dict[str, float | int]:
+    ZK = SimulatedZKFactory(config)
+    service = DownloadAttendanceService(zk_class=ZK)
+    device = _bench_device()
+
+    from_date = config.start_date
+    last = ZK.attendance[-1].timestamp.date() if ZK.attendance else from_date
+    to_date = max(from_date, last)
+
+    marks: dict[str, float] = {}
+
+    def progress_cb(phase: str, done: int, total: int, _message: str) -> None:
+        if phase == "connect" and done == total and total > 0:
+            marks.setdefault("connected", time.perf_counter())
+
+    t0 = time.perf_counter()
+    user_name_by_id, logs, record_count, err, _users = service._fetch_device_logs(
+        ZK, device, progress_cb
+    )
+    t_fetch = time.perf_counter()
+    if err:
+        raise RuntimeError(err)
+    t_connect = marks.get("connected", t0)
+
+    if trace_memory:
+        tracemalloc.start()
+    groups, _sync_state, _incremental = service._select_punches(
+        device, logs, record_count, None, False, from_date, to_date
+    )
+    t_group = time.perf_counter()
+    peak_mb = float("nan")
+    if trace_memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    persist_s = float("nan")
+    if persist:
+        service._persist_rows(
+            [_DeviceSyncResult(device, groups, user_name_by_id)], bulk=bulk
+        )
+        persist_s = time.perf_counter() - t_group
+
+    return {
+        "records": len(logs or []),
+        "rows": len(groups),
+        "group_peak_mb": peak_mb,
+        "connect": t_connect - t0,
+        "transfer": t_fetch - t_connect,
+        "group": t_group - t_fetch,
+        "persist": persist_s,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark luồng tải dữ liệu chấm công trên máy giả lập"
+    )
+    parser.add_argument(
+        "--records",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000],
+        help="Số bản ghi log (có thể nhiều giá trị)",
+    )
+    parser.add_argument("--users", type=int, default=500, help="Số user trên máy")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--connect-latency", type=float, default=0.0, help="Độ trễ kết nối (giây)"
+    )
+    parser.add_argument(
+        "--records-per-second",
+        type=float,
+        default=0.0,
+        help="Tốc độ truyền log giả lập (0 = không giới hạn)",
+    )
+    parser.add_argument(
+        "--persist",
+        action="store_true",
+        help="Ghi kết quả vào CSDL (cấu hình trong database/db_config.json)",
+    )
+    parser.add_argument(
+        "--bulk",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Ghi qua bảng tạm + câu SQL tập hợp (mặc định: tự chọn theo số dòng)",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Đo đỉnh RAM của bước group (tracemalloc)",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'records':>10} {'rows':>9} {'connect':>9} {'transfer':>9} "
+        f"{'group':>9} {'persist':>9} {'group MB':>9}"
+    )
+    for n in args.records:
+        cfg = SimulatedDeviceConfig(
+            users=args.users,
+            records=n,
+            seed=args.seed,
+            connect_latency=args.connect_latency,
+            records_per_second=args.records_per_second,
+        )
+        r = run_once(
+            cfg,
+            persist=bool(args.persist),
+            trace_memory=bool(args.trace_memory),
+            bulk=args.bulk,
+        )
+        persist = "-" if r["persist"] != r["persist"] else f"{r['persist']:.3f}s"
+        peak = (
+            "-"
+            if r["group_peak_mb"] != r["group_peak_mb"]
+            else f"{r['group_peak_mb']:.1f}"
+        )
+        print(
+            f"{r['records']:>10} {r['rows']:>9} {r['connect']:>8.3f}s "
+            f"{r['transfer']:>8.3f}s {r['group']:>8.3f}s {persist:>9} {peak:>9}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
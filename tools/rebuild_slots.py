@@ -0,0 +1,62 @@
+"""tools/rebuild_slots.py
+
+Dựng lại 6 cột giờ (attendance_raw + attendance_audit) từ kho lượt chấm attendance_punches
+(AttendancePunchService.rebuild_slots), không cần tải lại từ máy chấm công.
+Dùng sau khi đổi quy tắc chiếu lượt chấm -> 6 cột giờ, hoặc khi bảng 6 cột bị ghi sai.
+
+Ghi vào CSDL trong database/db_config.json. Dòng audit đã import (import_locked = 1)
+giữ nguyên; kết quả ghép giờ / công của dòng đổi được tính lại khi mở màn hình
+(fingerprint đổi theo giờ chấm).
+
+Ví dụ:
+  python -m tools.rebuild_slots --from 2026-01-01 --to 2026-01-31
+  python -m tools.rebuild_slots --from 2026-01-01 --to 2026-01-31 --device-no 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from datetime import date
+
+from services.attendance_punch_services import AttendancePunchService
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m tools.rebuild_slots",
+        description="Dựng lại dữ liệu chấm công 6 cột giờ từ attendance_punches",
+    )
+    parser.add_argument(
+        "--from",
+        dest="from_date",
+        type=date.fromisoformat,
+        required=True,
+        help="Từ ngày (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--to",
+        dest="to_date",
+        type=date.fromisoformat,
+        required=True,
+        help="Đến ngày (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--device-no",
+        type=int,
+        default=None,
+        help="Chỉ dựng lại lượt chấm của 1 máy (mặc định: mọi máy)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+
+    ok, msg, _written = AttendancePunchService().rebuild_slots(
+        args.from_date, args.to_date, device_no=args.device_no
+    )
+    print(msg)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,266 @@
+"""tools/zk_simulator.py
+
+Máy chấm công giả lập (thay cho ZKTeco thật) để chạy thử / đo hiệu năng
+DownloadAttendanceService mà không cần thiết bị trên mạng.
+
+Giả lập đúng phần API của pyzk mà service dùng:
+- ZK(ip, port=..., timeout=..., password=...).connect() -> conn
+- conn.get_users() / get_attendance() / get_device_name() / get_platform() /
+  get_serialnumber() / get_firmware_version() / read_sizes() + conn.records
+- conn.live_capture(new_timeout=...) (sự kiện chấm công trực tiếp) + conn.end_live_capture
+- conn.disable_device() / enable_device() / clear_attendance() (xóa log sau khi tải)
+- conn.disconnect()
+
+Có thể cấu hình số user, số bản ghi, độ trễ kết nối/truyền và số lần kết nối
+đầu tiên bị timeout (để thử nhánh retry).
+
+Ví dụ:
+  from tools.zk_simulator import SimulatedDeviceConfig, SimulatedZKFactory
+  ZK = SimulatedZKFactory(SimulatedDeviceConfig(users=200, records=100_000))
+  service = DownloadAttendanceService(zk_class=ZK)
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+
+class SimulatedZKError(Exception):
+    """Lỗi mạng giả lập (cùng thông điệp 'timed out' như ZKNetworkError)."""
+
+
+@dataclass(frozen=True)
+class SimulatedDeviceConfig:
+    users: int = 100
+    records: int = 10_000
+    start_date: date = date(2026, 1, 1)
+    # Số ngày mà log trải ra; mặc định tự tính để mỗi user ~4 lượt chấm/ngày
+    days: int | None = None
+    seed: int = 1
+    device_name: str = "ZKTeco SenseFace A4"
+    serial_number: str = "SIM0000000001"
+    # Độ trễ (giây)
+    connect_latency: float = 0.0
+    users_latency: float = 0.0
+    # Tốc độ truyền log; 0 = không giới hạn
+    records_per_second: float = 0.0
+    # N lần connect() đầu tiên bị timeout
+    fail_connects: int = 0
+
+
+class SimulatedUser:
+    __slots__ = ("uid", "user_id", "name", "privilege", "password")
+
+    def __init__(self, uid: int, user_id: str, name: str) -> None:
+        self.uid = uid
+        self.user_id = user_id
+        self.name = name
+        self.privilege = 0
+        self.password = ""
+
+
+class SimulatedAttendance:
+    __slots__ = ("uid", "user_id", "timestamp", "status", "punch")
+
+    def __init__(self, uid: int, user_id: str, timestamp: datetime, punch: int) -> None:
+        self.uid = uid
+        self.user_id = user_id
+        self.timestamp = timestamp
+        self.status = 1
+        self.punch = punch
+
+
+def generate_users(config: SimulatedDeviceConfig) -> list[SimulatedUser]:
+    return [
+        SimulatedUser(i, str(i), f"NV {i:05d}") for i in range(1, max(0, config.users) + 1)
+    ]
+
+
+def generate_attendance(config: SimulatedDeviceConfig) -> list[SimulatedAttendance]:
+    """Sinh log chấm công theo thứ tự thời gian (log máy chỉ ghi nối thêm).
+
+    Mỗi ngày, mỗi user có tối đa 4 lượt chấm quanh 07:30 / 11:30 / 13:00 / 17:00;
+    phân bố cố định theo seed để các lần chạy benchmark so sánh được.
+    """
+
+    total = max(0, int(config.records))
+    n_users = max(1, int(config.users))
+    if total == 0:
+        return []
+
+    rng = random.Random(config.seed)
+    days = config.days or max(1, -(-total // (n_users * 4)))
+    per_day = -(-total // days)
+    base_minutes = (7 * 60 + 30, 11 * 60 + 30, 13 * 60, 17 * 60)
+
+    logs: list[SimulatedAttendance] = []
+    for offset in range(days):
+        day_start = datetime.combine(
+            config.start_date + timedelta(days=offset), datetime.min.time()
+        )
+        day_punches: list[tuple[datetime, int]] = []
+        for k in range(min(per_day, total - len(logs))):
+            user = k % n_users + 1
+            slot = (k // n_users) % len(base_minutes)
+            seconds = base_minutes[slot] * 60 + rng.randint(-900, 900)
+            day_punches.append((day_start + timedelta(seconds=seconds), user))
+        day_punches.sort()
+        for ts, user in day_punches:
+            logs.append(SimulatedAttendance(user, str(user), ts, 0))
+        if len(logs) >= total:
+            break
+    return logs
+
+
+class SimulatedConnection:
+    def __init__(self, device: "SimulatedZKFactory", timeout: float) -> None:
+        self._device = device
+        self._timeout = float(timeout or 0)
+        self.records = 0
+        self.users = 0
+        self.is_connect = True
+        self.end_live_capture = False
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        if self._timeout and seconds > self._timeout:
+            time.sleep(self._timeout)
+            raise SimulatedZKError("timed out")
+        time.sleep(seconds)
+
+    def get_users(self) -> list[SimulatedUser]:
+        cfg = self._device.config
+        self._sleep(cfg.users_latency)
+        return list(self._device.users)
+
+    def get_attendance(self) -> list[SimulatedAttendance]:
+        cfg = self._device.config
+        logs = self._device.attendance
+        if cfg.records_per_second > 0:
+            self._sleep(len(logs) / cfg.records_per_second)
+        return list(logs)
+
+    def read_sizes(self) -> bool:
+        self.users = len(self._device.users)
+        self.records = len(self._device.attendance)
+        return True
+
+    def disable_device(self) -> bool:
+        self._device.disabled = True
+        return True
+
+    def enable_device(self) -> bool:
+        self._device.disabled = False
+        return True
+
+    def clear_attendance(self) -> bool:
+        self._device.clear_attendance()
+        return True
+
+    def live_capture(self, new_timeout: float = 10):
+        """Như pyzk: yield bản ghi mới (append_records) khi có; None mỗi new_timeout giây."""
+
+        self.end_live_capture = False
+        seen = len(self._device.attendance)
+        while not self.end_live_capture and self.is_connect:
+            if not self._device.wait_for_records(seen, new_timeout):
+                yield None
+                continue
+            logs = self._device.attendance
+            new, seen = logs[seen:], len(logs)
+            for a in new:
+                yield a
+
+    def get_device_name(self) -> str:
+        return self._device.config.device_name
+
+    def get_platform(self) -> str:
+        return "SIMULATOR"
+
+    def get_serialnumber(self) -> str:
+        return self._device.config.serial_number
+
+    def get_firmware_version(self) -> str:
+        return "Ver 0.0.0 (simulator)"
+
+    def disconnect(self) -> bool:
+        self.is_connect = False
+        return True
+
+
+class SimulatedZK:
+    def __init__(self, device: "SimulatedZKFactory", ip: str, port: int, timeout: float) -> None:
+        self._device = device
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+
+    def connect(self) -> SimulatedConnection:
+        self._device.note_connect()
+        cfg = self._device.config
+        conn = SimulatedConnection(self._device, self.timeout)
+        if self._device.should_fail_connect():
+            conn._sleep(min(cfg.connect_latency, self.timeout or cfg.connect_latency))
+            raise SimulatedZKError("timed out")
+        conn._sleep(cfg.connect_latency)
+        return conn
+
+
+class SimulatedZKFactory:
+    """Dùng thay class ZK của pyzk: ZK(ip, port=..., timeout=..., password=...).
+
+    Dữ liệu user/log sinh 1 lần và dùng chung cho mọi kết nối; append_records()
+    ghi thêm log mới để thử tải tăng dần.
+    """
+
+    def __init__(self, config: SimulatedDeviceConfig | None = None) -> None:
+        self.config = config or SimulatedDeviceConfig()
+        self.users = generate_users(self.config)
+        self.attendance = generate_attendance(self.config)
+        self.connect_calls = 0
+        self.disabled = False
+        self._lock = threading.Lock()
+        self._new_records = threading.Condition(self._lock)
+
+    def __call__(
+        self, ip: str, port: int = 4370, timeout: float = 60, password: int = 0, **_kwargs
+    ) -> SimulatedZK:
+        return SimulatedZK(self, ip, port, timeout)
+
+    def note_connect(self) -> None:
+        with self._lock:
+            self.connect_calls += 1
+
+    def should_fail_connect(self) -> bool:
+        with self._lock:
+            return self.connect_calls <= int(self.config.fail_connects or 0)
+
+    def wait_for_records(self, seen: int, timeout: float) -> bool:
+        """Chờ tới khi log có hơn seen bản ghi; False nếu hết timeout."""
+
+        with self._new_records:
+            return self._new_records.wait_for(
+                lambda: len(self.attendance) > seen, timeout=max(0.0, float(timeout))
+            )
+
+    def clear_attendance(self) -> None:
+        with self._new_records:
+            self.attendance = []
+
+    def append_records(self, count: int, start: datetime | None = None) -> None:
+        """Ghi nối thêm count lượt chấm (1 phút/lượt) sau bản ghi cuối."""
+
+        with self._new_records:
+            last = self.attendance[-1].timestamp if self.attendance else None
+            ts = start or (last + timedelta(minutes=1) if last else datetime.now())
+            n_users = max(1, len(self.users))
+            for k in range(max(0, int(count))):
+                user = k % n_users + 1
+                self.attendance.append(SimulatedAttendance(user, str(user), ts, 0))
+                ts += timedelta(minutes=1)
+            self._new_records.notify_all()
@@ -5,6 +5,8 @@ Controller cho màn "Thêm Máy chấm công":
 - Làm mới (reload + clear form)
 - Lưu (thêm mới nếu chưa chọn dòng; cập nhật nếu đang chọn)
 - Xóa (xóa theo dòng đang chọn)
+- Trạng thái từng máy: kiểm tra song song tất cả máy ở thread nền khi mở màn hình /
+  Làm mới (DeviceService.probe_devices, có cache)
 
 Không dùng QMessageBox; dùng MessageDialog (dialog dùng chung).
 """
@@ -12,14 +14,46 @@ Không dùng QMessageBox; dùng MessageDialog (dialog dùng chung).
 from __future__ import annotations
 
 import logging
+from datetime import datetime
 
-from services.device_services import DeviceService
+from PySide6.QtCore import QObject, QThread, QTimer, Signal, Slot
+
+from services.device_services import DeviceHealth, DeviceService
 from ui.dialog.title_dialog import MessageDialog
 
 
 logger = logging.getLogger(__name__)
 
 
+class _ProbeWorker(QObject):
+    finished = Signal(object)  # dict[int, DeviceHealth]
+
+    def __init__(self, service: DeviceService) -> None:
+        super().__init__()
+        self._service = service
+
+    @Slot()
+    def run(self) -> None:
+        try:
+            result = self._service.probe_devices()
+        except Exception:
+            logger.exception("Không thể kiểm tra trạng thái thiết bị")
+            result = {}
+        self.finished.emit(result)
+
+
+class _UiProxy(QObject):
+    """Slot chạy trên UI thread; parent = view nên đóng màn hình thì tự ngắt kết nối."""
+
+    def __init__(self, controller: "DeviceController", parent=None) -> None:
+        super().__init__(parent)
+        self._controller = controller
+
+    @Slot(object)
+    def on_probe_finished(self, result) -> None:
+        self._controller._on_probe_finished_ui(result or {})
+
+
 class DeviceController:
     def __init__(
         self, parent_window, title_bar2, content, service: DeviceService | None = None
@@ -31,6 +65,10 @@ class DeviceController:
 
         self._selected_device_id: int | None = None
 
+        self._probe_thread: QThread | None = None
+        self._probe_worker: _ProbeWorker | None = None
+        self._ui_proxy = _UiProxy(self, parent=self._content)
+
     def bind(self) -> None:
         self._title_bar2.refresh_clicked.connect(self.on_refresh)
         self._title_bar2.save_clicked.connect(self.on_save)
@@ -51,11 +89,62 @@ class DeviceController:
             rows = [(m.id, m.device_name, m.ip_address) for m in models]
             self._content.set_devices(rows)
             self._title_bar2.set_total(len(rows))
+            # Hiển thị ngay trạng thái còn trong cache, rồi kiểm tra lại ở nền
+            cached: dict[int, DeviceHealth] = {}
+            for m in models:
+                h = self._service.get_cached_health(m.id, m.ip_address, m.port)
+                if h is not None:
+                    cached[m.id] = h
+            self._apply_statuses(cached)
+            self.start_probe()
         except Exception:
             logger.exception("Không thể tải danh sách thiết bị")
             self._content.set_devices([])
             self._title_bar2.set_total(0)
 
+    def start_probe(self) -> None:
+        """Kiểm tra song song tất cả máy ở thread nền (không chặn UI)."""
+
+        if self._probe_thread is not None:
+            return
+
+        thread = QThread(self._parent_window)
+        worker = _ProbeWorker(self._service)
+        worker.moveToThread(thread)
+        worker.finished.connect(self._ui_proxy.on_probe_finished)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        thread.started.connect(worker.run)
+
+        self._probe_thread = thread
+        self._probe_worker = worker
+        QTimer.singleShot(0, thread.start)
+
+    def _on_probe_finished_ui(self, result: dict[int, DeviceHealth]) -> None:
+        self._probe_thread = None
+        self._probe_worker = None
+        self._apply_statuses(result)
+
+    def _apply_statuses(self, result: dict[int, DeviceHealth]) -> None:
+        if not hasattr(self._content, "set_device_statuses"):
+            return
+        statuses: dict[int, tuple[str, bool | None]] = {}
+        for device_id, h in (result or {}).items():
+            at = datetime.fromtimestamp(h.checked_wall).strftime("%H:%M:%S")
+            if h.reachable:
+                text = "Hoạt động"
+                if h.latency_ms is not None:
+                    text += f" ({h.latency_ms:.0f} ms)"
+            else:
+                text = "Không phản hồi"
+            statuses[int(device_id)] = (f"{text} - {at}", bool(h.reachable))
+        try:
+            self._content.set_device_statuses(statuses)
+        except RuntimeError:
+            # view already destroyed
+            return
+
     def on_refresh(self) -> None:
         self._selected_device_id = None
         self._content.table.clearSelection()
@@ -160,6 +249,13 @@ class DeviceController:
                 ok=ok,
             )
 
+        # Form đang hiển thị máy đã lưu: cập nhật luôn trạng thái (cache + bảng)
+        if self._selected_device_id is not None:
+            h = self._service.record_health(
+                int(self._selected_device_id), ip_address, port, ok, msg
+            )
+            self._apply_statuses({h.device_id: h})
+
         if not ok:
             # Hiển thị lý do (chi tiết) bằng dialog
             MessageDialog.info(self._parent_window, "Không thể kết nối", msg)
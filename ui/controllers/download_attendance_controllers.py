@@ -2,8 +2,10 @@
 
 Controller cho màn "Tải dữ liệu Máy chấm công":
 - Load danh sách thiết bị vào combobox
-- Click "Tải dữ liệu chấm công" -> tải log từ máy, hiển thị tiến trình
+- Click "Tải dữ liệu chấm công" -> tải log từ máy (hoặc tất cả máy song song), hiển thị tiến trình
+- Click "Nhập file USB" -> chọn file log xuất từ máy đang chọn, nhập như khi tải từ máy
 - Sau khi tải: hiển thị data trong bảng (download_attendance)
+- Lượt tự động tải chạy nền (AutoSyncService) xong: tải lại bảng đang hiển thị
 
 Không dùng QMessageBox; dùng MessageDialog.
 """
@@ -16,9 +18,15 @@ from datetime import date, datetime
 
 from PySide6.QtCore import QObject, QThread, Signal, Slot, Qt
 from PySide6.QtCore import QTimer
-from PySide6.QtWidgets import QProgressDialog
-
-from services.download_attendance_services import DownloadAttendanceService
+from PySide6.QtWidgets import QFileDialog, QProgressDialog
+
+from core.auto_sync_bus import auto_sync_bus
+from services.attlog_import_services import AttlogImportService
+from services.download_attendance_services import (
+    ALL_DEVICES_ID,
+    DOWNLOAD_LOCK,
+    DownloadAttendanceService,
+)
 from ui.dialog.title_dialog import MessageDialog
 
 
@@ -44,19 +52,30 @@ class _UiProxy(QObject):
     def on_finished(self, ok: bool, msg: str, count: int) -> None:
         self._controller._on_worker_finished_ui(ok, msg, count)
 
+    @Slot(bool, str, int)
+    def on_auto_sync_finished(self, ok: bool, _msg: str, count: int) -> None:
+        if ok and count:
+            self._controller.refresh_table()
+
 
 class _Worker(QObject):
     progress = Signal(str, int, int, str)  # phase, done, total, message
     finished = Signal(bool, str, int)  # ok, msg, count
 
     def __init__(
-        self, service: DownloadAttendanceService, device_id: int, d1: date, d2: date
+        self,
+        service: DownloadAttendanceService,
+        device_id: int,
+        d1: date,
+        d2: date,
+        full_resync: bool = False,
     ) -> None:
         super().__init__()
         self._service = service
         self._device_id = int(device_id)
         self._d1 = d1
         self._d2 = d2
+        self._full_resync = bool(full_resync)
 
     @Slot()
     def run(self) -> None:
@@ -67,18 +86,71 @@ class _Worker(QObject):
                     str(phase), int(done), int(total), str(message or "")
                 )
 
-            ok, msg, count = self._service.download_from_device(
-                device_id=self._device_id,
-                from_date=self._d1,
-                to_date=self._d2,
-                progress_cb=cb,
-            )
+            # Chờ lượt tự động tải chạy nền (nếu có) xong
+            if not DOWNLOAD_LOCK.acquire(blocking=False):
+                cb("connect", 0, 0, "Đang chờ lượt tự động tải hoàn tất...")
+                DOWNLOAD_LOCK.acquire()
+            try:
+                if self._device_id == ALL_DEVICES_ID:
+                    ok, msg, count = self._service.download_from_devices(
+                        None,
+                        from_date=self._d1,
+                        to_date=self._d2,
+                        progress_cb=cb,
+                        full_resync=self._full_resync,
+                    )
+                else:
+                    ok, msg, count = self._service.download_from_device(
+                        device_id=self._device_id,
+                        from_date=self._d1,
+                        to_date=self._d2,
+                        progress_cb=cb,
+                        full_resync=self._full_resync,
+                    )
+            finally:
+                DOWNLOAD_LOCK.release()
             self.finished.emit(bool(ok), str(msg or ""), int(count or 0))
         except Exception as exc:
             # Không để exception trong thread làm app thoát
             self.finished.emit(False, f"Không thể tải dữ liệu: {exc}", 0)
 
 
+class _ImportFileWorker(QObject):
+    progress = Signal(str, int, int, str)  # phase, done, total, message
+    finished = Signal(bool, str, int)  # ok, msg, count
+
+    def __init__(
+        self, service: AttlogImportService, device_id: int, file_path: str
+    ) -> None:
+        super().__init__()
+        self._service = service
+        self._device_id = int(device_id)
+        self._file_path = str(file_path)
+
+    @Slot()
+    def run(self) -> None:
+        try:
+
+            def cb(phase: str, done: int, total: int, message: str) -> None:
+                self.progress.emit(
+                    str(phase), int(done), int(total), str(message or "")
+                )
+
+            # Ghi chung các bảng với lượt tải từ máy: chờ lượt đang chạy xong
+            if not DOWNLOAD_LOCK.acquire(blocking=False):
+                cb("connect", 0, 0, "Đang chờ lượt tự động tải hoàn tất...")
+                DOWNLOAD_LOCK.acquire()
+            try:
+                ok, msg, count = self._service.import_file(
+                    self._device_id, self._file_path, progress_cb=cb
+                )
+            finally:
+                DOWNLOAD_LOCK.release()
+            self.finished.emit(bool(ok), str(msg or ""), int(count or 0))
+        except Exception as exc:
+            self.finished.emit(False, f"Không thể nhập file: {exc}", 0)
+
+
 @dataclass
 class _UiRow:
     code: str
@@ -105,9 +177,10 @@ class DownloadAttendanceController:
         self._title_bar2 = title_bar2
         self._content = content
         self._service = service or DownloadAttendanceService()
+        self._import_service = AttlogImportService(self._service)
 
         self._thread: QThread | None = None
-        self._worker: _Worker | None = None
+        self._worker: _Worker | _ImportFileWorker | None = None
         self._progress: QProgressDialog | None = None
         self._progress_update_timer: QTimer | None = None
         self._pending_progress: tuple[str, int, int, str] | None = None
@@ -126,6 +199,8 @@ class DownloadAttendanceController:
 
         # Proxy QObject để slot chạy đúng UI thread
         self._ui_proxy = _UiProxy(self, parent=self._parent_window)
+        # Proxy riêng cho auto_sync_bus, sống theo view: đóng màn hình thì tự ngắt kết nối
+        self._auto_sync_proxy = _UiProxy(self, parent=self._content)
 
         self._all_rows: list[_UiRow] = []
         self._search_by: str = "attendance_code"
@@ -134,10 +209,13 @@ class DownloadAttendanceController:
 
     def bind(self) -> None:
         self._title_bar2.download_clicked.connect(self.on_download)
+        if hasattr(self._title_bar2, "import_file_clicked"):
+            self._title_bar2.import_file_clicked.connect(self.on_import_file)
         if hasattr(self._title_bar2, "search_changed"):
             self._title_bar2.search_changed.connect(self.on_search_changed)
         if hasattr(self._title_bar2, "time_format_changed"):
             self._title_bar2.time_format_changed.connect(self.on_time_format_changed)
+        auto_sync_bus.finished.connect(self._auto_sync_proxy.on_auto_sync_finished)
         self.refresh_devices()
         self.refresh_table()
 
@@ -150,7 +228,7 @@ class DownloadAttendanceController:
 
     def refresh_devices(self) -> None:
         try:
-            devices = self._service.list_devices_for_combo()
+            devices = self._service.list_devices_for_combo(include_all=True)
             self._title_bar2.set_devices(devices)
         except Exception:
             logger.exception("Không thể tải danh sách máy")
@@ -327,11 +405,48 @@ class DownloadAttendanceController:
             # Nếu preflight lỗi, vẫn cho chạy luồng bình thường
             pass
 
-        # Progress dialog
-        progress = QProgressDialog(
-            "Đang kết nối tới máy...", None, 0, 100, self._parent_window
+        full_resync = False
+        try:
+            full_resync = self._title_bar2.is_full_resync()
+        except Exception:
+            full_resync = False
+        self._start_worker(
+            _Worker(self._service, int(device_id), d1, d2, full_resync),
+            "Tải dữ liệu Máy chấm công",
+            "Đang kết nối tới máy...",
         )
-        progress.setWindowTitle("Tải dữ liệu Máy chấm công")
+
+    def on_import_file(self) -> None:
+        device_id = self._title_bar2.get_selected_device_id()
+        if not device_id or int(device_id) == ALL_DEVICES_ID:
+            MessageDialog.info(
+                self._parent_window,
+                "Thông báo",
+                "Vui lòng chọn đúng máy chấm công đã xuất file log.",
+            )
+            return
+
+        file_path, _ = QFileDialog.getOpenFileName(
+            self._parent_window,
+            "Chọn file log chấm công",
+            "",
+            AttlogImportService.FILE_FILTER,
+        )
+        if not file_path:
+            return
+
+        self._start_worker(
+            _ImportFileWorker(self._import_service, int(device_id), file_path),
+            "Nhập file log chấm công",
+            "Đang đọc file...",
+        )
+
+    def _start_worker(
+        self, worker: _Worker | _ImportFileWorker, title: str, first_message: str
+    ) -> None:
+        # Progress dialog
+        progress = QProgressDialog(first_message, None, 0, 100, self._parent_window)
+        progress.setWindowTitle(title)
         progress.setFixedHeight(150)
         progress.setFixedWidth(400)
         progress.setWindowModality(Qt.WindowModality.WindowModal)
@@ -345,7 +460,7 @@ class DownloadAttendanceController:
 
         # Reset smooth progress state
         self._progress_phase = None
-        self._progress_base_text = "Đang kết nối tới máy..."
+        self._progress_base_text = first_message
         self._progress_anim_value = 0
         self._progress_target_value = 0
         self._progress_auto_mode = True
@@ -362,7 +477,6 @@ class DownloadAttendanceController:
         # Worker thread
         # Giữ reference để tránh worker bị GC (có thể làm app crash/thoát)
         thread = QThread(self._parent_window)
-        worker = _Worker(self._service, int(device_id), d1, d2)
         worker.moveToThread(thread)
 
         worker.progress.connect(self._ui_proxy.on_progress)
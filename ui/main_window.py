@@ -11,7 +11,7 @@ Theo .copilot_instructions:
 
 import logging
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtWidgets import (
     QApplication,
     QHBoxLayout,
@@ -23,12 +23,16 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
+from core.database import Database
 from core.resource import (
     CONTAINER_MIN_HEIGHT,
     MIN_MAINWINDOW_HEIGHT,
     MIN_MAINWINDOW_WIDTH,
     set_window_icon,
 )
+from services.arranged_recompute_services import ArrangedRecomputeJob
+from services.auto_sync_services import AutoSyncService
+from services.live_capture_services import LiveCaptureService
 from ui.controllers.company_controllers import CompanyController
 from ui.controllers.declare_work_shift_controllers import DeclareWorkShiftController
 from ui.controllers.device_controllers import DeviceController
@@ -78,6 +82,7 @@ from ui.widgets.arrange_schedule_widgets import ArrangeScheduleView
 from ui.widgets.schedule_work_widgets import ScheduleWorkView
 from ui.dialog.attendance_symbol_dialog import AttendanceSymbolDialog
 from ui.dialog.settings_dialog import SettingsDialog
+from ui.dialog.title_dialog import MessageDialog
 
 
 class Header(CommonHeader):
@@ -308,7 +313,17 @@ class MainWindow(QMainWindow):
         self._csdl_controller: CSDLController | None = None
         self._backup_controller: BackupController | None = None
         self._absence_restore_controller: AbsenceRestoreController | None = None
+        self._auto_sync_service: AutoSyncService | None = None
+        self._live_capture_service: LiveCaptureService | None = None
         self._init_ui()
+        self._start_auto_sync()
+
+        # Lỗi migrate schema xảy ra khi pool tạo kết nối (có thể ở thread nền):
+        # kiểm tra định kỳ trên thread UI, mỗi lỗi chỉ hiện 1 lần
+        self._migration_timer = QTimer(self)
+        self._migration_timer.setInterval(3000)
+        self._migration_timer.timeout.connect(self._show_migration_error)
+        self._migration_timer.start()
 
     def _init_ui(self) -> None:
         """Khởi tạo giao diện người dùng."""
@@ -434,6 +449,31 @@ class MainWindow(QMainWindow):
             dlg.exec()
             return
 
+    def _start_auto_sync(self) -> None:
+        """Bật tự động tải dữ liệu chấm công chạy nền (database/auto_sync_settings.json).
+
+        live_capture=true: nhận lượt chấm trực tiếp; ngược lại tải định kỳ.
+        """
+
+        try:
+            auto_sync = AutoSyncService()
+            settings = auto_sync.load_settings()
+            if settings.live_capture:
+                self._live_capture_service = LiveCaptureService()
+                self._live_capture_service.start()
+            else:
+                self._auto_sync_service = auto_sync
+                self._auto_sync_service.start()
+        except Exception:
+            logging.getLogger(__name__).exception("Không thể bật tự động tải dữ liệu")
+            self._auto_sync_service = None
+            self._live_capture_service = None
+
+    def _show_migration_error(self) -> None:
+        message = Database.take_migration_error()
+        if message:
+            MessageDialog.info(self, "Lỗi cập nhật CSDL", message)
+
     def _center_window(self) -> None:
         """Căn giữa cửa sổ trên màn hình."""
         screen_geometry = self.screen().geometry()
@@ -443,7 +483,15 @@ class MainWindow(QMainWindow):
         self.move(window_geometry.topLeft())
 
     def closeEvent(self, event) -> None:
-        """Khi đóng phần mềm: tự động xóa dữ liệu tải tạm trong download_attendance."""
+        """Khi đóng phần mềm: dừng tự động tải + tính lại ghép giờ nền, xóa dữ liệu tải tạm trong download_attendance."""
+
+        if self._auto_sync_service is not None:
+            self._auto_sync_service.stop()
+            self._auto_sync_service = None
+        if self._live_capture_service is not None:
+            self._live_capture_service.stop()
+            self._live_capture_service = None
+        ArrangedRecomputeJob.stop()
 
         try:
             from services.download_attendance_services import DownloadAttendanceService
@@ -5,14 +5,14 @@ Widget cho màn "Thêm Máy chấm công".
 - Copy TitleBar1 / TitleBar2 theo pattern các module khác.
 - TitleBar2 gồm 3 nút: Làm mới / Lưu / Xóa và hiển thị Tổng.
 - MainContent chia 2 phần:
-  - Trái: bảng danh sách thiết bị (ID, STT, Tên máy, Địa chỉ IP)
+  - Trái: bảng danh sách thiết bị (ID, STT, Tên máy, Địa chỉ IP, Trạng thái)
   - Phải: form nhập Số máy, Tên máy, IP (4 ô xxx.xxx.xxx.xxx), Mật mã, Cổng kết nối
 """
 
 from __future__ import annotations
 
 from PySide6.QtCore import QTimer, QSize, Qt, Signal
-from PySide6.QtGui import QFont, QIcon, QIntValidator
+from PySide6.QtGui import QColor, QFont, QIcon, QIntValidator
 from PySide6.QtWidgets import (
     QAbstractItemView,
     QComboBox,
@@ -214,8 +214,10 @@ class MainContent(QWidget):
         except Exception:
             pass
         self.table.setFocusPolicy(Qt.FocusPolicy.NoFocus)
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["ID", "STT", "Tên máy", "Địa chỉ IP"])
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(
+            ["ID", "STT", "Tên máy", "Địa chỉ IP", "Trạng thái"]
+        )
         self.table.setColumnHidden(0, True)
 
         self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
@@ -253,10 +255,12 @@ class MainContent(QWidget):
         header.setSectionResizeMode(1, QHeaderView.ResizeMode.Interactive)  # STT
         header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)  # Name
         header.setSectionResizeMode(3, QHeaderView.ResizeMode.Interactive)  # IP
+        header.setSectionResizeMode(4, QHeaderView.ResizeMode.Interactive)  # Trạng thái
 
-        self._min_column_widths: dict[int, int] = {1: 120, 3: 200}
+        self._min_column_widths: dict[int, int] = {1: 120, 3: 200, 4: 160}
         self.table.setColumnWidth(1, self._min_column_widths[1])
         self.table.setColumnWidth(3, self._min_column_widths[3])
+        self.table.setColumnWidth(4, self._min_column_widths[4])
 
         def _enforce_min_width(logical_index: int, _old: int, new: int) -> None:
             min_w = self._min_column_widths.get(int(logical_index))
@@ -489,7 +493,7 @@ class MainContent(QWidget):
         self._last_selected_row = current_row
 
     def _apply_row_font(self, row: int, font: QFont) -> None:
-        for col in (0, 1, 2, 3):
+        for col in (0, 1, 2, 3, 4):
             item = self.table.item(row, col)
             if item is not None:
                 item.setFont(font)
@@ -540,6 +544,35 @@ class MainContent(QWidget):
             else:
                 self._set_row_data(r, None, None, "", "")
 
+    def set_device_statuses(self, statuses: dict[int, tuple[str, bool | None]]) -> None:
+        """statuses: {device_id: (text, ok)}; ok: None=neutral, True=success, False=error
+
+        Chỉ cập nhật các máy có trong statuses (set_devices xóa trạng thái cũ).
+        """
+
+        for row in range(self.table.rowCount()):
+            id_item = self.table.item(row, 0)
+            status_item = self.table.item(row, 4)
+            if id_item is None or status_item is None:
+                continue
+            raw_id = (id_item.text() or "").strip()
+            if not raw_id:
+                continue
+            try:
+                status = statuses.get(int(raw_id))
+            except Exception:
+                continue
+            if status is None:
+                continue
+            text, ok = status
+            status_item.setText(text or "")
+            if ok is True:
+                status_item.setForeground(QColor(COLOR_SUCCESS))
+            elif ok is False:
+                status_item.setForeground(QColor(COLOR_ERROR))
+            else:
+                status_item.setForeground(QColor(COLOR_TEXT_SECONDARY))
+
     def get_selected_device(self) -> tuple[int, str, str] | None:
         row = self.table.currentRow()
         if row < 0:
@@ -700,6 +733,7 @@ class MainContent(QWidget):
         self.table.item(row, 1).setText("" if stt is None else str(int(stt)))
         self.table.item(row, 2).setText(device_name or "")
         self.table.item(row, 3).setText(ip_address or "")
+        self.table.item(row, 4).setText("")
 
     def _init_row_items(self, row: int) -> None:
         # ID (ẩn)
@@ -720,4 +754,8 @@ class MainContent(QWidget):
         ip_item.setFont(self._font_normal)
         self.table.setItem(row, 3, ip_item)
 
+        status_item = QTableWidgetItem("")
+        status_item.setFont(self._font_normal)
+        self.table.setItem(row, 4, status_item)
+
         self.table.setRowHeight(row, ROW_HEIGHT)
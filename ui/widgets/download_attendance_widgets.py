@@ -5,7 +5,7 @@ Các widget dùng cho layout phần "Tải dữ liệu Máy chấm công".
 Yêu cầu:
 - TitleBar1: sao chép từ ui.widgets.title_widgets
 - TitleBar2: input chọn Từ ngày / Đến ngày, combobox chọn Máy chấm công,
-  button "Tải dữ liệu chấm công"
+  button "Tải dữ liệu chấm công", button "Nhập file USB" (log xuất từ máy không có mạng)
 - MainContent: bảng các cột:
   Mã chấm công, Ngày tháng năm, Giờ vào 1, Giờ ra 1, Giờ vào 2, Giờ ra 2,
   Giờ vào 3, Giờ ra 3, Tên máy
@@ -23,6 +23,7 @@ from PySide6.QtGui import QFont, QIcon
 from PySide6.QtWidgets import (
     QAbstractItemView,
     QCalendarWidget,
+    QCheckBox,
     QComboBox,
     QDateEdit,
     QFrame,
@@ -147,6 +148,7 @@ class TitleBar1(QWidget):
 
 class TitleBar2(QWidget):
     download_clicked = Signal()
+    import_file_clicked = Signal()
     search_changed = Signal()
     time_format_changed = Signal(bool)  # show_seconds
 
@@ -332,6 +334,36 @@ class TitleBar2(QWidget):
         )
         self.btn_download.clicked.connect(self.download_clicked.emit)
 
+        self.btn_import_file = QPushButton("Nhập file USB")
+        self.btn_import_file.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_import_file.setFixedHeight(28)
+        self.btn_import_file.setToolTip(
+            "Nhập file log chấm công (attlog .dat/.txt) xuất ra USB từ máy đang chọn"
+        )
+        try:
+            self.btn_import_file.setIcon(QIcon(resource_path("assets/images/import.svg")))
+            self.btn_import_file.setIconSize(QSize(18, 18))
+        except Exception:
+            pass
+        self.btn_import_file.setStyleSheet(
+            "\n".join(
+                [
+                    f"QPushButton {{ border: 1px solid {COLOR_BORDER}; background: transparent; padding: 0 12px; border-radius: 6px; }}",
+                    "QPushButton::icon { margin-right: 10px; }",
+                    f"QPushButton:hover {{ background: {COLOR_BUTTON_PRIMARY_HOVER}; color: {COLOR_TEXT_LIGHT}; }}",
+                ]
+            )
+        )
+        self.btn_import_file.clicked.connect(self.import_file_clicked.emit)
+
+        # Mặc định chỉ tải bản ghi mới so với lần tải trước; tick để xử lý lại toàn bộ log
+        self.chk_full_resync = QCheckBox("Tải lại toàn bộ", self)
+        self.chk_full_resync.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.chk_full_resync.setToolTip(
+            "Bỏ qua mốc đồng bộ lần trước, xử lý lại toàn bộ log trên máy trong khoảng ngày đã chọn "
+            "và tải lại danh sách nhân viên trên máy"
+        )
+
         # Time format buttons
         def _mk_time_btn(text: str) -> QPushButton:
             b = QPushButton(text, self)
@@ -437,7 +469,12 @@ class TitleBar2(QWidget):
             self.cbo_search_by.setFixedWidth(int(ui.search_by_width))
             self.inp_search_text.setMinimumWidth(int(ui.search_text_min_width))
 
-            for b in (self.btn_hhmm, self.btn_hhmmss, self.btn_download):
+            for b in (
+                self.btn_hhmm,
+                self.btn_hhmmss,
+                self.btn_download,
+                self.btn_import_file,
+            ):
                 b.setFixedHeight(bh)
             self.btn_download.setFixedWidth(int(ui.download_button_width))
             self.btn_hhmm.setFixedWidth(int(ui.time_button_width))
@@ -463,6 +500,7 @@ class TitleBar2(QWidget):
             self.cbo_device,
             self.cbo_search_by,
             self.inp_search_text,
+            self.chk_full_resync,
         ):
             try:
                 w.setFont(f)
@@ -549,7 +587,9 @@ class TitleBar2(QWidget):
             self._layout.addWidget(self.inp_search_text, 1)
             self._layout.addWidget(self.btn_hhmm)
             self._layout.addWidget(self.btn_hhmmss)
+            self._layout.addWidget(self.chk_full_resync)
             self._layout.addWidget(self.btn_download)
+            self._layout.addWidget(self.btn_import_file)
 
         if m == "space_between":
             _add_core_controls()
@@ -577,6 +617,9 @@ class TitleBar2(QWidget):
         except Exception:
             return None
 
+    def is_full_resync(self) -> bool:
+        return bool(self.chk_full_resync.isChecked())
+
     def get_date_range(self) -> tuple[date, date]:
         d1 = self.date_from.date().toPython()
         d2 = self.date_to.date().toPython()